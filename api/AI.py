@@ -1,187 +1,243 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import MinMaxScaler
-from .utils import Preprocess,get_all_recipes,get_recipe_info_by_id_or_user
+from .recipe_index import get_recipe_index,open_saved_index,refresh_recipes
+from .collaborative import get_item_item_model
+from .candidates import preference_candidates
+from .streaming import stream_profile,stream_similar
+from .taste_profiles import get_taste_profile,profile_vector
+from .models import CustomUser,Like,Recipe,SavedRecipe
 from .serializers import RecipeSerializer
+from django.conf import settings
 import pandas as pd
 import numpy as np
 
-def recommend_similar_recipes(base_recipe_id, top_n=5,min_similarity=0.3):
-    p=Preprocess()
-
-    all_recipes_df = get_all_recipes()
-    all_recipes_df = p.preprocess_recipes(all_recipes_df)
-
-
-
-    base_df = get_recipe_info_by_id_or_user(recipe_id=base_recipe_id)
-    if base_df.empty:
-        return pd.DataFrame()
-    base_df = p.preprocess_recipes(base_df)
- 
-    def combine_fields(row):
-        return " ".join([
-            row["Description"],
-            " ".join(row["Ingredients"]),
-            " ".join(row["Ingredients"]),
-            row["Cuisine"],
-            row["Dietary Restrictions"],
-            " ".join(row["Instructions"]),
-            " ".join(row["Equipment"]),
-            " ".join(row["Course"]),
-            " ".join(row["Course"])
-        ])
-
-    all_recipes_df["combined"] = all_recipes_df.apply(combine_fields, axis=1)
-    base_combined = base_df.apply(combine_fields, axis=1).values[0]
-
-
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(all_recipes_df["combined"])
-    base_vector = vectorizer.transform([base_combined])
-
-
-    cosine_sim = cosine_similarity(base_vector, tfidf_matrix).flatten()
-
-  
-    all_recipes_df["similarity"] = cosine_sim
-    all_recipes_df = all_recipes_df[all_recipes_df["ID"] != base_recipe_id]
-    all_recipes_df = all_recipes_df[all_recipes_df["similarity"] >= min_similarity]
-
-    if all_recipes_df.empty:
+def search_index(search):
+    """
+    The index a search runs on. Streaming reads the recipes themselves from
+    RecipeFeatures and only needs a saved index's fitted vectorizers, so it
+    never builds or refreshes one; it finds nothing until an index is saved.
+    """
+    return open_saved_index() if search == "stream" else get_recipe_index()
+
+
+def recommend_similar_recipes(base_recipe_id, top_n=5,min_similarity=0.3,search=None):
+    search = search or settings.RECOMMENDER_SEARCH['similar']
+    index = search_index(search)
+    if index is not None and search != "stream" and int(base_recipe_id) not in index.positions:
+        # Recipe written since the index was last refreshed
+        refresh_recipes([base_recipe_id])
+        index = get_recipe_index()
+    if index is None:
         return pd.DataFrame()
 
-    if len(all_recipes_df)<1:
+    if search == "stream":
+        ids, scores = stream_similar(index, base_recipe_id, top_n=top_n, min_similarity=min_similarity)
+    else:
+        ids, scores = index.similar(base_recipe_id, top_n=top_n, min_similarity=min_similarity, search=search)
+    if len(ids) == 0:
         return pd.DataFrame()
 
+    return pd.DataFrame({"ID": ids, "score": scores})
+
+
+def recommend_similar_batch(recipe_ids, top_n=5, min_similarity=0.3, search=None):
+    """
+    recommend_similar_recipes for several seed recipes at once: returns
+    {recipe_id: [neighbour ids]}, with an empty list for unknown recipes.
+    Exact and dense search score every seed in one matrix product.
+    """
+    search = search or settings.RECOMMENDER_SEARCH['similar']
+    recipe_ids = [int(rid) for rid in recipe_ids]
+    index = search_index(search)
+    if index is not None and search != "stream":
+        missing = [rid for rid in recipe_ids if rid not in index.positions]
+        if missing:
+            # Recipes written since the index was last refreshed
+            refresh_recipes(missing)
+            index = get_recipe_index()
+    if index is None:
+        return {rid: [] for rid in recipe_ids}
+
+    if search == "stream":
+        return {
+            rid: stream_similar(index, rid, top_n=top_n, min_similarity=min_similarity)[0].tolist()
+            for rid in recipe_ids
+        }
+    seeds = [rid for rid in dict.fromkeys(recipe_ids) if rid in index.positions]
+    positions = [index.positions[rid] for rid in seeds]
+    neighbours = index.neighbours(positions, top_n, min_similarity, search) if positions else []
+    results = {rid: [] for rid in recipe_ids}
+    for rid, (best, _) in zip(seeds, neighbours):
+        results[rid] = index.ids[best].tolist()
+    return results
+
+
+def recommend_for_profile(index, vector, saved_ids, avg_total_time, avg_difficulty,
+                          min_similarity=0.3, search="exact", candidate_ids=None):
+    """
+    Rank the catalog against a user profile vector: cosine similarity first,
+    then closeness to the user's average difficulty and total time. With
+    search="ann" only recipes sharing an LSH bucket with the profile are
+    scored, with search="dense" similarity is measured on the profile
+    embeddings (exact search if they are disabled), and with candidate_ids
+    only those recipes are scored. search="stream" returns the top
+    USER_RECOMMENDATIONS_TOP_K of the exact ranking with bounded memory
+    (streaming.stream_profile).
+    """
+    if search == "stream":
+        return stream_profile(index, vector, saved_ids, avg_total_time, avg_difficulty,
+                              min_similarity=min_similarity, candidate_ids=candidate_ids)
+    norm = np.sqrt(vector.multiply(vector).sum())
+    if norm == 0:
+        return pd.DataFrame()
 
-    base_info = base_df.iloc[0]
-    base_time = base_info["Total_time"]
-    base_nutrition = base_info["Nutritional Info"]
-
-    def extract_nutrition_fields(df):
-        df["calories"] = [info["calories"] for info in df["Nutritional Info"]]
-        df["protein"] = [info["protein"] for info in df["Nutritional Info"]]
-        df["carbs"] = [info["carbs"] for info in df["Nutritional Info"]]
-        df["fat"] = [info["fat"] for info in df["Nutritional Info"]]
-        return df
-
-    all_recipes_df = extract_nutrition_fields(all_recipes_df)
-
- 
-    scaler = MinMaxScaler()
-    all_recipes_df[["Total_time", "calories", "protein", "carbs", "fat"]] = scaler.fit_transform(
-        all_recipes_df[["Total_time", "calories", "protein", "carbs", "fat"]]
-    )
+    allowed = None if candidate_ids is None else index.positions_of(candidate_ids)
+    if search == "ann":
+        candidates = index.ann("profile_matrix").query(vector, settings.RECOMMENDER_ANN['PROBES'])
+        if allowed is not None:
+            candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+    elif allowed is not None and 2 * len(allowed) < len(index):
+        candidates = allowed
+    else:
+        # Slicing out most of the matrix costs more than scoring all of it
+        candidates = np.arange(len(index))
+    full = len(candidates) == len(index)
+
+    dense = index.embeddings.get("profile_matrix") if search == "dense" else None
+    if dense is not None:
+        similarity = dense.similarity(dense.project(vector), None if full else candidates)[0]
+    else:
+        matrix = index.profile_matrix if full else index.profile_matrix[candidates]
+        similarity = (matrix @ vector.T).toarray().ravel() / norm
+    mask = (similarity >= min_similarity) & ~np.isin(index.ids[candidates], list(saved_ids))
+    if allowed is not None and full:
+        mask &= np.isin(candidates, allowed, assume_unique=True)
+    candidates, similarity = candidates[mask], similarity[mask]
+    if len(candidates) == 0:
+        return pd.DataFrame()
 
+    time_distance = np.abs(index.corpus.total_time[candidates] - avg_total_time)
+    difficulty_distance = np.abs(index.corpus.difficulty[candidates] - avg_difficulty)
+    order = np.lexsort((time_distance, difficulty_distance, -similarity))
 
-    base_time_scaled = scaler.transform([[base_time, base_nutrition["calories"],
-                                          base_nutrition["protein"],
-                                          base_nutrition["carbs"],
-                                          base_nutrition["fat"]]])[0]
+    return pd.DataFrame({
+        "ID": index.ids[candidates][order],
+        "Similarity": similarity[order],
+        "difficulty_distance": difficulty_distance[order],
+        "time_distance": time_distance[order],
+    })
 
-    all_recipes_df["score"] = (
-        all_recipes_df["similarity"] * 0.7
-        + (1 - abs(all_recipes_df["Total_time"] - base_time_scaled[0])) * 0.1
-        + (1 - abs(all_recipes_df["calories"] - base_time_scaled[1])) * 0.1
-        + (1 - abs(all_recipes_df["protein"] - base_time_scaled[2])) * 0.1
-        + (1 - abs(all_recipes_df["carbs"] - base_time_scaled[3])) * 0.1
-        + (1 - abs(all_recipes_df["fat"] - base_time_scaled[4])) * 0.1
-    )
 
-    top_matches = all_recipes_df.sort_values(by="score", ascending=False).head(top_n)
+def start(username,min_similarity=0.3,search=None):
+    search = search or settings.RECOMMENDER_SEARCH['recommendations']
+    index = search_index(search)
+    user = CustomUser.objects.filter(username=username).first()
+    if index is None or user is None:
+        return pd.DataFrame()
 
-    return top_matches.drop(columns=["combined", "similarity", "score"])
+    profile = get_taste_profile(user, index)
+    if profile.saved_count == 0:
+        return pd.DataFrame()
 
+    # Candidate generation: only recipes matching the user's preferences are scored
+    candidate_ids = preference_candidates(user)
+    if candidate_ids is not None and not candidate_ids:
+        return pd.DataFrame()
 
-def get_combined_text(df):
-    return (
-        df['Ingredients'].astype(str) + ' ' +
-        df['Ingredients'].astype(str) + ' ' +
-        df['Dietary Restrictions'].astype(str) + ' ' +
-        df['Dietary Restrictions'].astype(str) + ' ' +  
-        df['Cuisine'].astype(str)  
+    saved_ids = SavedRecipe.objects.filter(user=user).values_list('recipe_id', flat=True)
+    return recommend_for_profile(
+        index,
+        profile_vector(profile, index),
+        saved_ids,
+        profile.total_time_sum / profile.saved_count,
+        profile.difficulty_sum / profile.saved_count,
+        min_similarity=min_similarity,
+        search=search,
+        candidate_ids=candidate_ids,
     )
 
 
-def start(username,min_similarity=0.3):
-    p=Preprocess()
-    df=get_all_recipes()
-    if get_recipe_info_by_id_or_user(username=username).empty:
+def start_hybrid(username,min_similarity=0.3,search=None,cf_weight=None):
+    """
+    start() blended with item-item collaborative filtering:
+    score = (1 - cf_weight) * content similarity + cf_weight * CF score.
+    Recipes qualify with a content similarity of at least min_similarity or
+    any CF score; recipes the user saved or liked are left out. Ties keep
+    start()'s order.
+    """
+    cf_weight = settings.RECOMMENDER_CF['HYBRID_WEIGHT'] if cf_weight is None else cf_weight
+    user = CustomUser.objects.filter(username=username).first()
+    if user is None:
         return pd.DataFrame()
-    userdf=get_recipe_info_by_id_or_user(username=username)
-    df=p.preprocess_recipes(df)
-    userdf=p.preprocess_recipes(userdf)
-    
-   
-    df['combined_text'] = get_combined_text(df)
-    userdf['combined_text'] = get_combined_text(userdf)
-        
-    all_texts = pd.concat([df['combined_text'], userdf['combined_text']])
-    vectorizer = TfidfVectorizer(stop_words='english')
-    vectorizer.fit(all_texts)
-
-    all_vecs = vectorizer.transform(df['combined_text'])
-    user_vecs = vectorizer.transform(userdf['combined_text'])
-
-    user_profile = np.asarray(user_vecs.mean(axis=0)).reshape(1, -1)
 
-    similarities = cosine_similarity(all_vecs, user_profile).flatten()
-
-    df['Similarity'] = similarities
-    recommended_df = df.sort_values(by='Similarity', ascending=False).reset_index(drop=True)
-
-    saved_ids = set(userdf['ID'])  
-    recommended_df = recommended_df[~recommended_df['ID'].isin(saved_ids)].reset_index(drop=True)
-
-    recommended_df = recommended_df[recommended_df['Similarity'] >= min_similarity].reset_index(drop=True)
-
-
-    avg_total_time = userdf["Total_time"].mean()
-    avg_difficulty = userdf["Difficulty Level"].mean()
-
-    recommended_df["time_distance"] = (recommended_df["Total_time"] - avg_total_time).abs()
-    recommended_df["difficulty_distance"] = (recommended_df["Difficulty Level"] - avg_difficulty).abs()
-
-    final_recommendations = recommended_df.sort_values(
-        by=["Similarity", "difficulty_distance", "time_distance"],
-        ascending=[False, True, True] 
-    ).reset_index(drop=True)
-
-    return final_recommendations
-
-
-def generate_recipe_by_ings(ings: list[str], request=None):
-    p = Preprocess()
-    all_recipes_df = get_all_recipes()
-    
-    # Preprocess ingredients
-    processed_df = p.preprocess_recipes(all_recipes_df)
-    all_ingredients = processed_df['Ingredients']  # List of strings
-
-    # TF-IDF vectorization
-    vectorizer = TfidfVectorizer()
-    all_vecs = vectorizer.fit_transform(all_ingredients)  # All recipes
-    user_vec = vectorizer.transform(ings)  # User input
-
-    # Compute cosine similarity
-    cosine_sim = cosine_similarity(all_vecs, user_vec).flatten()
+    content = start(username, min_similarity=0, search=search)
+    if content.empty:
+        content = pd.DataFrame({"ID": [], "Similarity": []})
+    content = content[["ID", "Similarity"]].assign(content_rank=np.arange(len(content)))
+
+    model = get_item_item_model()
+    cf = model.scores(user.id) if model is not None else None
+    if cf is not None:
+        cf = pd.DataFrame({"ID": model.recipe_ids, "cf": cf})
+        cf = cf[cf["cf"] > 0]
+        candidate_ids = preference_candidates(user)
+        if candidate_ids is not None:
+            cf = cf[cf["ID"].isin(candidate_ids)]
+    else:
+        cf = pd.DataFrame({"ID": [], "cf": []})
+
+    df = content.merge(cf, on="ID", how="outer")
+    interacted = set(Like.objects.filter(user=user).values_list('recipe_id', flat=True))
+    interacted.update(SavedRecipe.objects.filter(user=user).values_list('recipe_id', flat=True))
+    df = df[~df["ID"].isin(interacted)]
+    df[["Similarity", "cf"]] = df[["Similarity", "cf"]].fillna(0)
+    df = df[(df["Similarity"] >= min_similarity) | (df["cf"] > 0)]
+    if df.empty:
+        return pd.DataFrame()
 
-    # Sort recipes by similarity
-    sorted_indices = cosine_sim.argsort()[::-1]
-    matching_ids = [processed_df.iloc[i]['ID'] for i in sorted_indices if cosine_sim[i] > 0]
+    df["score"] = (1 - cf_weight) * df["Similarity"] + cf_weight * df["cf"]
+    order = np.lexsort((df["content_rank"].fillna(len(content)).to_numpy(), -df["score"].to_numpy()))
+    df = df.iloc[order]
+    return pd.DataFrame({
+        "ID": df["ID"].astype(np.int64).to_numpy(),
+        "score": df["score"].to_numpy(),
+        "Similarity": df["Similarity"].to_numpy(),
+        "cf": df["cf"].to_numpy(),
+    })
+
+
+def rank_recipes_by_ings(ings: list[str], limit=20, offset=0):
+    index = get_recipe_index()
+    if index is None:
+        return []
+
+    # Only the posting lists of the query terms are scored
+    matching_ids, _ = index.match_ingredients(" ".join(ings), limit=limit, offset=offset)
+    return matching_ids.tolist()
+
+
+def serialize_recipes(recipe_ids, request=None):
+    recipe_qs = Recipe.objects.filter(id__in=recipe_ids).select_related(
+        'cuisine', 'course', 'nutritional_information'
+    ).prefetch_related(
+        'ingredients', 'instructions', 'equipment', 'tags', 'substitutes', 'dietary_restrictions',
+        'major_ingredients'
+    )
 
-    # Get actual Recipe queryset in correct order
-    from .models import Recipe  # Adjust as needed
-    recipe_qs = Recipe.objects.filter(id__in=matching_ids)
-    
     # Maintain the sorted order
     id_to_recipe = {recipe.id: recipe for recipe in recipe_qs}
-    sorted_recipes = [id_to_recipe[recipe_id] for recipe_id in matching_ids if recipe_id in id_to_recipe]
+    sorted_recipes = [id_to_recipe[recipe_id] for recipe_id in recipe_ids if recipe_id in id_to_recipe]
+
+    context = {"request": request}
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        # One query for is_liked instead of one per recipe
+        context["liked_ids"] = set(
+            Like.objects.filter(user=user, recipe_id__in=recipe_ids).values_list('recipe_id', flat=True)
+        )
 
     # Serialize
-    serializer = RecipeSerializer(sorted_recipes, many=True, context={"request": request})
+    serializer = RecipeSerializer(sorted_recipes, many=True, context=context)
     return serializer.data
 
 
-
+def generate_recipe_by_ings(ings: list[str], request=None, limit=20, offset=0):
+    return serialize_recipes(rank_recipes_by_ings(ings, limit=limit, offset=offset), request=request)
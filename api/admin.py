@@ -1,9 +1,11 @@
 # Register your models here.
 from django.contrib import admin
 from django.core.exceptions import PermissionDenied
+from .recipe_index import refresh_recipes
 from .models import (Recipe, Ingredient, Instruction, NutritionalInformation, Equipment,
                       Tag, SubstituteIngredient,CustomUser,SavedRecipe,ProfileImage,
-                      UserPreference,DietaryRestriction,Cuisine,MajorIngredient,Course,Like)
+                      UserPreference,DietaryRestriction,Cuisine,MajorIngredient,Course,Like,
+                      SimilarRecipe)
 
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('title', 'cuisine', 'course')
@@ -14,11 +16,43 @@ class RecipeAdmin(admin.ModelAdmin):
             raise PermissionDenied("Only superusers can add recipes.")
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        # Many-to-many fields are saved here, after save_model
+        super().save_related(request, form, formsets, change)
+        refresh_recipes([form.instance.id])
+
+    def delete_model(self, request, obj):
+        recipe_id = obj.id
+        super().delete_model(request, obj)
+        refresh_recipes([recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('id', flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_recipes(recipe_ids)
+
+
+class RecipePartAdmin(admin.ModelAdmin):
+    """Keeps the recipe index in sync when a recipe's parts are edited directly."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_recipes([obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        refresh_recipes(recipe_ids)
+
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Ingredient)
-admin.site.register(Instruction)
-admin.site.register(NutritionalInformation)
-admin.site.register(Equipment)
+admin.site.register(Ingredient, RecipePartAdmin)
+admin.site.register(Instruction, RecipePartAdmin)
+admin.site.register(NutritionalInformation, RecipePartAdmin)
+admin.site.register(Equipment, RecipePartAdmin)
 admin.site.register(Tag)
 admin.site.register(SubstituteIngredient)
 admin.site.register(CustomUser)
@@ -29,4 +63,5 @@ admin.site.register(Cuisine)
 admin.site.register(UserPreference)
 admin.site.register(MajorIngredient)
 admin.site.register(Course)
-admin.site.register(Like)
\ No newline at end of file
+admin.site.register(Like)
+admin.site.register(SimilarRecipe)
\ No newline at end of file
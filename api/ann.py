@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH over the rows of a sparse matrix, for approximate
+    cosine nearest-neighbour search.
+
+    Each of `n_tables` tables hashes a row to the signs of its projections on
+    `n_bits` random hyperplanes, so rows with a small angle between them tend
+    to share a bucket. More tables or probes raise recall at the cost of more
+    candidates to rerank exactly; more bits make buckets smaller.
+    """
+
+    def __init__(self, matrix, n_tables=16, n_bits=8, seed=0):
+        rng = np.random.default_rng(seed)
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.planes = rng.standard_normal((matrix.shape[1], n_tables * n_bits)).astype(np.float32)
+        self.weights = (1 << np.arange(n_bits, dtype=np.int64))
+
+        codes = self._codes(matrix)
+        # Per table: the rows sorted by bucket code, so a bucket is one
+        # contiguous slice found with searchsorted
+        self.order = np.argsort(codes, axis=0, kind="stable")
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=0)
+
+    def _codes(self, matrix):
+        projections = np.asarray(matrix @ self.planes)
+        bits = (projections > 0).reshape(len(projections), self.n_tables, self.n_bits)
+        return bits.astype(np.int64) @ self.weights
+
+    def _probe_codes(self, code, n_probes):
+        # The bucket itself plus the buckets one bit flip away
+        flips = self.weights[:min(n_probes, self.n_bits)]
+        return np.concatenate([[code], code ^ flips])
+
+    def query(self, vector, n_probes=0):
+        """Return the sorted row positions sharing a (probed) bucket with `vector`."""
+        codes = self._codes(vector)[0]
+        found = []
+        for table, code in enumerate(codes):
+            column = self.sorted_codes[:, table]
+            for probe in self._probe_codes(code, n_probes):
+                start, end = np.searchsorted(column, [probe, probe + 1])
+                if end > start:
+                    found.append(self.order[start:end, table])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
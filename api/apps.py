@@ -1,6 +1,27 @@
+import os
 from django.apps import AppConfig
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import executor, signals  # noqa: F401
+        from .artifacts import start_artifact_sync
+        from .recipe_index import open_saved_index
+
+        if executor.in_pool_worker or not os.environ.get('RECIPE_API_WEB_WORKER'):
+            # Recommender pool workers open the index on their first call and
+            # follow the swaps their web process makes; manage.py commands
+            # and cron jobs only open it if they use it
+            return
+
+        # Map the saved index before serving, so each worker shares the same
+        # pages instead of unpickling its own copy on the first request
+        try:
+            open_saved_index()
+        except Exception as e:
+            print(f"Error opening recipe index: {str(e)}")
+        # Follow the artifacts published by other instances, if enabled
+        start_artifact_sync()
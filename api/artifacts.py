@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .recipe_index import (RecipeIndex, _writing, get_recipe_index, open_saved_index, point_current,
+                           saved_index_name)
+
+
+# Index artifacts: a saved index directory packed as
+# `recipe-index-<timestamp>-<id>.tar.gz` in the RECIPE_INDEX_ARTIFACTS
+# storage, next to a .json manifest with its checksum. The manifest is written
+# last and names sort by time, so the newest manifest is always a complete
+# artifact. Workers download it into RECIPE_INDEX_DIR and switch CURRENT to
+# it, which every process picks up on its next request.
+PREFIX = "recipe-index-"
+
+
+def artifact_storage():
+    options = settings.RECIPE_INDEX_ARTIFACTS
+    return import_string(options['BACKEND'])(**options['OPTIONS'])
+
+
+def served_path():
+    """File naming the artifact RECIPE_INDEX_DIR was last synced to."""
+    return os.path.join(settings.RECIPE_INDEX_DIR, "ARTIFACT")
+
+
+def served_artifact():
+    try:
+        with open(served_path()) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _sha256(f):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def publish_index_artifact(keep=None):
+    """
+    Upload the current saved index (built first if there is none) as a new
+    artifact and drop all but the `keep` newest (at least 1, the new one;
+    default RECIPE_INDEX_ARTIFACTS['KEEP']). Returns its manifest.
+    """
+    keep = settings.RECIPE_INDEX_ARTIFACTS['KEEP'] if keep is None else keep
+    if keep < 1:
+        raise ValueError("keep must be at least 1, the artifact being published.")
+    index = get_recipe_index()
+    directory = saved_index_name()
+    if index is None or directory is None:
+        raise ValueError("There is no recipe index to publish.")
+
+    storage = artifact_storage()
+    name = f"{PREFIX}{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    with tempfile.TemporaryFile() as f:
+        with tarfile.open(fileobj=f, mode="w:gz") as tar:
+            tar.add(os.path.join(settings.RECIPE_INDEX_DIR, directory), arcname=directory)
+        size = f.tell()
+        f.seek(0)
+        checksum = _sha256(f)
+        f.seek(0)
+        storage.save(f"{name}.tar.gz", File(f))
+
+    manifest = {
+        "name": name,
+        "index": directory,
+        "version": index.version,
+        "format_version": index.format_version,
+        "mode": index.mode,
+        "recipes": len(index),
+        "sha256": checksum,
+        "size": size,
+        "created": timezone.now().isoformat(),
+    }
+    storage.save(f"{name}.json", ContentFile(json.dumps(manifest).encode()))
+    _remove_old_artifacts(storage, keep)
+    return manifest
+
+
+def _manifest_names(storage):
+    try:
+        _, files = storage.listdir("")
+    except FileNotFoundError:
+        # FileSystemStorage before anything was published
+        return []
+    return sorted(f[:-len(".json")] for f in files if f.startswith(PREFIX) and f.endswith(".json"))
+
+
+def _remove_old_artifacts(storage, keep):
+    for name in _manifest_names(storage)[:-keep]:
+        # Manifest first, so the artifact is never listed without its archive
+        storage.delete(f"{name}.json")
+        storage.delete(f"{name}.tar.gz")
+
+
+def latest_artifact(storage=None):
+    """Manifest of the newest published artifact, or None."""
+    storage = storage or artifact_storage()
+    names = _manifest_names(storage)
+    if not names:
+        return None
+    with storage.open(f"{names[-1]}.json") as f:
+        return json.loads(f.read())
+
+
+def sync_index_artifact():
+    """
+    Download the newest artifact if this node has not synced to it yet,
+    verify its checksum and make it the current index. Returns the manifest
+    of the artifact switched to, or None if there was nothing to do.
+    """
+    storage = artifact_storage()
+    manifest = latest_artifact(storage)
+    if manifest is None or manifest["name"] == served_artifact():
+        return None
+    if manifest["format_version"] != RecipeIndex.FORMAT_VERSION or manifest["mode"] != settings.RECIPE_INDEX_VECTORIZER:
+        print(f"Error syncing recipe index: {manifest['name']} was built by another release or vectorizer")
+        return None
+
+    # Under the index lock, so a refresh in another worker cannot save an
+    # update of the pre-sync index over the switch, and CURRENT and the
+    # ARTIFACT marker change together
+    with _writing():
+        if manifest["name"] == served_artifact():
+            # Another worker synced it while this one waited
+            return None
+        root = settings.RECIPE_INDEX_DIR
+        os.makedirs(root, exist_ok=True)
+        target = os.path.join(root, manifest["index"])
+        if not os.path.isdir(target):
+            with tempfile.TemporaryFile() as f:
+                with storage.open(f"{manifest['name']}.tar.gz") as archive:
+                    shutil.copyfileobj(archive, f, 1024 * 1024)
+                f.seek(0)
+                if _sha256(f) != manifest["sha256"]:
+                    print(f"Error syncing recipe index: checksum mismatch for {manifest['name']}")
+                    return None
+                f.seek(0)
+                # Unpack next to the target and rename, so the directory appears
+                # complete; another worker may have won the race meanwhile
+                staging = tempfile.mkdtemp(dir=root, prefix=".sync-")
+                try:
+                    with tarfile.open(fileobj=f, mode="r:gz") as tar:
+                        tar.extractall(staging, filter="data")
+                    try:
+                        os.rename(os.path.join(staging, manifest["index"]), target)
+                    except OSError:
+                        if not os.path.isdir(target):
+                            raise
+                finally:
+                    shutil.rmtree(staging, ignore_errors=True)
+
+        point_current(manifest["index"])
+        tmp_path = f"{served_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(manifest["name"])
+        os.replace(tmp_path, served_path())
+        return manifest
+
+
+def open_published_index():
+    """
+    Sync to the newest artifact and open it, for jobs that should score with
+    the index the web service serves instead of building their own. Returns
+    None if nothing has been published.
+    """
+    sync_index_artifact()
+    if served_artifact() is None:
+        return None
+    return open_saved_index()
+
+
+def _poll(interval):
+    while True:
+        try:
+            sync_index_artifact()
+        except Exception as e:
+            # Keep serving the index we have
+            print(f"Error syncing recipe index: {str(e)}")
+        time.sleep(interval)
+
+
+def start_artifact_sync():
+    """Sync to new artifacts every POLL_SECONDS in a background thread; off when it is 0."""
+    interval = settings.RECIPE_INDEX_ARTIFACTS['POLL_SECONDS']
+    if interval:
+        threading.Thread(target=_poll, args=(interval,), name="recipe-index-sync", daemon=True).start()
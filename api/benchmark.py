@@ -0,0 +1,196 @@
+import random
+import time
+import tracemalloc
+import pandas as pd
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    Course, CustomUser, Cuisine, DietaryRestriction, Equipment, Ingredient, IngredientName, Instruction,
+    Like, NutritionalInformation, Recipe, SavedRecipe,
+)
+from .parsing import ingredient_pieces, parse_difficulty, parse_first_int, parse_minutes
+
+
+CUISINES = ["Italian", "Indian", "Mexican", "Chinese", "Thai", "French", "Japanese", "Greek", "American", "Spanish"]
+COURSES = ["Breakfast", "Lunch", "Dinner", "Dessert", "Snack", "Appetizer"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+DIETARY_RESTRICTIONS = ["Vegetarian", "Vegan", "Gluten Free", "Dairy Free", "Nut Free", "Keto"]
+EQUIPMENT = ["Oven", "Pan", "Pot", "Blender", "Whisk", "Baking Tray", "Grill", "Knife", "Mixing Bowl"]
+INGREDIENTS = [
+    "tomatoes", "onions", "garlic cloves", "chicken breasts", "basmati rice", "black beans", "cheddar cheese",
+    "basil leaves", "all-purpose flour", "sugar", "eggs", "whole milk", "green chilies", "potatoes", "carrots",
+    "olive oil", "butter", "lemons", "ginger", "soy sauce", "coconut milk", "spinach leaves", "mushrooms",
+    "bell peppers", "chickpeas", "lentils", "paneer cubes", "shrimps", "salmon fillets", "tofu", "cumin seeds",
+    "coriander leaves", "yogurt", "honey", "oats", "almonds", "cinnamon sticks", "bay leaves", "noodles", "pasta",
+]
+VERBS = ["Chop", "Stir", "Boil", "Simmer", "Bake", "Fry", "Mix", "Whisk", "Grill", "Season", "Serve", "Blend"]
+
+
+def synthetic_recipe_rows(n, seed=0):
+    """
+    Yield `n` dicts of realistic recipe fields (free-text times, nutrition
+    strings, ingredient lists, several instruction steps) for seeding
+    benchmarks.
+    """
+    rnd = random.Random(seed)
+    for i in range(n):
+        ingredients = rnd.sample(INGREDIENTS, rnd.randint(4, 12))
+        minutes = rnd.choice([10, 15, 20, 25, 30, 40, 45, 50, 60, 75, 90, 120, 150, 180])
+        if minutes >= 60 and minutes % 60:
+            total_time = f"{minutes // 60} hour {minutes % 60} minutes"
+        elif minutes >= 60:
+            total_time = f"{minutes // 60} hours"
+        else:
+            total_time = f"{minutes} minutes"
+        yield {
+            "title": f"Recipe {i}",
+            "description": f"A {rnd.choice(['quick', 'hearty', 'light', 'spicy', 'classic'])} dish with "
+                           f"{ingredients[0]} and {ingredients[1]}, ready in {total_time}.",
+            "total_time": total_time,
+            "difficulty_level": rnd.choice(DIFFICULTIES),
+            "cuisine": rnd.choice(CUISINES),
+            "course": rnd.choice(COURSES),
+            "dietary_restrictions": rnd.sample(DIETARY_RESTRICTIONS, rnd.randint(0, 2)),
+            "ingredients": [
+                f"{ingredient} (about {rnd.randint(1, 4)} cups, chopped)" if rnd.random() < 0.2 else ingredient
+                for ingredient in ingredients
+            ],
+            "instructions": [
+                f"{rnd.choice(VERBS)} the {rnd.choice(ingredients)} for {rnd.randint(2, 20)} minutes."
+                for _ in range(rnd.randint(3, 10))
+            ],
+            "equipment": rnd.sample(EQUIPMENT, rnd.randint(1, 4)),
+            "nutrition": {
+                "calories": f"{rnd.randint(80, 1200)} kcal",
+                "protein": f"{rnd.randint(1, 80)}g",
+                "carbs": f"{rnd.randint(1, 150)}g",
+                "fat": f"{rnd.randint(1, 70)}g",
+            },
+        }
+
+
+def synthetic_recipe_frame(n, seed=0):
+    """
+    Raw recipe rows in the columns Preprocess.preprocess_recipes takes (those
+    of features._raw_frame() plus Total_time and Nutritional Info), without
+    touching the database.
+    """
+    cuisines = {name: Cuisine(name=name) for name in CUISINES}
+    courses = {name: Course(name=name) for name in COURSES}
+    return pd.DataFrame([
+        {
+            "ID": i + 1,
+            "Title": row["title"],
+            "Description": row["description"],
+            "Total_time": row["total_time"],
+            "Difficulty Level": row["difficulty_level"],
+            "Cuisine": cuisines[row["cuisine"]],
+            "Course": courses[row["course"]],
+            "Dietary Restrictions": row["dietary_restrictions"],
+            "Ingredients": ",".join(row["ingredients"]),
+            "Instructions": row["instructions"],
+            "Equipment": row["equipment"],
+            "Nutritional Info": row["nutrition"],
+        }
+        for i, row in enumerate(synthetic_recipe_rows(n, seed))
+    ])
+
+
+def best_time(fn, repeat=3):
+    """Best wall time of `repeat` calls, in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(fn, calls=1, repeat=1):
+    """
+    Time `fn(i)` for i in range(calls): best total wall time of `repeat`
+    untraced passes, then one more pass under tracemalloc and a query counter.
+    Returns (results of the traced pass, stats per call).
+    """
+    seconds = best_time(lambda: [fn(i) for i in range(calls)], repeat)
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            results = [fn(i) for i in range(calls)]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return results, {
+        "calls": calls,
+        "ms_per_call": round(seconds * 1000 / calls, 3),
+        "peak_kb": round(peak / 1024, 1),
+        "queries_per_call": round(len(queries) / calls, 2),
+    }
+
+
+def seed_synthetic_catalog(n, users=50, interactions=10, seed=0, batch_size=1000):
+    """
+    Write `n` synthetic recipes (synthetic_recipe_rows) with their ingredients,
+    instructions, equipment and nutrition, plus `users` users who each like
+    and save `interactions` random recipes. Bypasses save() and signals, so
+    RecipeFeatures and the indexes are left for the caller. Returns
+    (recipe ids, usernames).
+    """
+    rnd = random.Random(seed)
+    rows = list(synthetic_recipe_rows(n, seed))
+    cuisines = {name: Cuisine.objects.get_or_create(name=name)[0] for name in CUISINES}
+    courses = {name: Course.objects.get_or_create(name=name)[0] for name in COURSES}
+    restrictions = {name: DietaryRestriction.objects.get_or_create(name=name)[0] for name in DIETARY_RESTRICTIONS}
+
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            title=row["title"], description=row["description"],
+            preparation_time="10 minutes", cooking_time=row["total_time"], total_time=row["total_time"],
+            servings="4", difficulty_level=row["difficulty_level"],
+            cuisine=cuisines[row["cuisine"]], course=courses[row["course"]],
+            total_minutes=parse_minutes(row["total_time"]), difficulty_rank=parse_difficulty(row["difficulty_level"]),
+        )
+        for row in rows
+    ], batch_size=batch_size)
+
+    Ingredient.objects.bulk_create([
+        Ingredient(recipe=recipe, ingredient=ingredient, quantity="1")
+        for recipe, row in zip(recipes, rows) for ingredient in row["ingredients"]
+    ], batch_size=batch_size)
+    IngredientName.record({piece for row in rows for text in row["ingredients"] for piece in ingredient_pieces(text)})
+    Instruction.objects.bulk_create([
+        Instruction(recipe=recipe, step=step) for recipe, row in zip(recipes, rows) for step in row["instructions"]
+    ], batch_size=batch_size)
+    Equipment.objects.bulk_create([
+        Equipment(recipe=recipe, name=name) for recipe, row in zip(recipes, rows) for name in row["equipment"]
+    ], batch_size=batch_size)
+    NutritionalInformation.objects.bulk_create([
+        NutritionalInformation(
+            recipe=recipe, **row["nutrition"],
+            **{f"{field}_{unit}": parse_first_int(row["nutrition"][field])
+               for field, unit in [("calories", "kcal"), ("protein", "g"), ("carbs", "g"), ("fat", "g")]},
+        )
+        for recipe, row in zip(recipes, rows)
+    ], batch_size=batch_size)
+    Through = Recipe.dietary_restrictions.through
+    Through.objects.bulk_create([
+        Through(recipe_id=recipe.id, dietaryrestriction_id=restrictions[name].id)
+        for recipe, row in zip(recipes, rows) for name in row["dietary_restrictions"]
+    ], batch_size=batch_size)
+
+    prefix = f"benchmark-{seed}-{n}"
+    accounts = CustomUser.objects.bulk_create([
+        CustomUser(username=f"{prefix}-{i}", email=f"{prefix}-{i}@example.com", password="!")
+        for i in range(users)
+    ])
+    recipe_ids = [recipe.id for recipe in recipes]
+    likes, saves = [], []
+    for user in accounts:
+        for recipe_id in rnd.sample(recipe_ids, min(interactions, n)):
+            likes.append(Like(user=user, recipe_id=recipe_id))
+        for recipe_id in rnd.sample(recipe_ids, min(interactions, n)):
+            saves.append(SavedRecipe(user=user, recipe_id=recipe_id))
+    Like.objects.bulk_create(likes, batch_size=batch_size)
+    SavedRecipe.objects.bulk_create(saves, batch_size=batch_size)
+    return recipe_ids, [user.username for user in accounts]
@@ -0,0 +1,43 @@
+from .models import Recipe, UserPreference
+
+
+def _preference_ids(preferences):
+    restriction_ids = list(preferences.dietary_restrictions.values_list('id', flat=True))
+    cuisine_ids = list(preferences.preferred_cuisines.values_list('id', flat=True))
+    return restriction_ids, cuisine_ids
+
+
+def _filter(queryset, restriction_ids, cuisine_ids):
+    if restriction_ids:
+        queryset = queryset.filter(dietary_restrictions__in=restriction_ids)
+    if cuisine_ids:
+        queryset = queryset.filter(cuisine_id__in=cuisine_ids)
+    return queryset.distinct()
+
+
+def filter_by_preferences(queryset, preferences):
+    """
+    Narrow a Recipe queryset to the recipes with any of the preferred dietary
+    restrictions and any of the preferred cuisines. Unset preferences don't
+    filter.
+    """
+    return _filter(queryset, *_preference_ids(preferences))
+
+
+def preference_ids(user):
+    """(dietary restriction ids, cuisine ids) of the user's UserPreference; empty lists if unset."""
+    preferences = UserPreference.objects.filter(user=user).first()
+    if preferences is None:
+        return [], []
+    return _preference_ids(preferences)
+
+
+def preference_candidates(user):
+    """
+    Ids of the recipes that satisfy the user's UserPreference, selected in
+    SQL, or None when the user set no preferences (every recipe qualifies).
+    """
+    restriction_ids, cuisine_ids = preference_ids(user)
+    if not restriction_ids and not cuisine_ids:
+        return None
+    return set(_filter(Recipe.objects.all(), restriction_ids, cuisine_ids).values_list('id', flat=True))
@@ -0,0 +1,329 @@
+import copy
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.db import connection, transaction
+from .locks import file_lock
+from .models import Like, SavedRecipe
+
+
+def interaction_weights(likes, saves):
+    """Sum {(user_id, recipe_id): weight} over Like and SavedRecipe (user_id, recipe_id) pairs."""
+    options = settings.RECOMMENDER_CF
+    weights = {}
+    for pair in likes:
+        weights[pair] = weights.get(pair, 0.0) + options['LIKE_WEIGHT']
+    for pair in saves:
+        weights[pair] = weights.get(pair, 0.0) + options['SAVE_WEIGHT']
+    return weights
+
+
+def _top_k_rows(dots, items, norms, k):
+    """
+    Cosine top-k per row of `dots` (the dot products of `items` with every
+    item), without the item itself. Returns the rows as a CSR matrix.
+    """
+    dots = dots.tocsr()
+    indptr, indices, data = [0], [], []
+    for row, item in enumerate(items):
+        start, end = dots.indptr[row], dots.indptr[row + 1]
+        cols, values = dots.indices[start:end], dots.data[start:end]
+        mask = (cols != item) & (values > 0)
+        cols = cols[mask]
+        values = values[mask] / (norms[item] * norms[cols])
+        if len(cols) > k:
+            part = np.argpartition(-values, k - 1)[:k]
+            cols, values = cols[part], values[part]
+        indices.append(cols)
+        data.append(values)
+        indptr.append(indptr[-1] + len(cols))
+    return sp.csr_matrix(
+        (np.concatenate(data) if data else [], np.concatenate(indices) if indices else [], indptr),
+        shape=(len(items), dots.shape[1]),
+    )
+
+
+class ItemItemModel:
+    """
+    Item-item collaborative filtering over implicit feedback.
+
+    `interactions` is the users x recipes matrix of like/save weights and
+    `similarity` the recipes x recipes cosine similarity of its columns,
+    keeping the `top_k` most similar recipes per row. A user's CF scores are
+    their interaction row times `similarity`.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, user_ids, recipe_ids, interactions, top_k, chunk_size=1024):
+        self.format_version = self.FORMAT_VERSION
+        self.version = uuid.uuid4().hex
+        self.top_k = top_k
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.interactions = sp.csr_matrix(interactions, dtype=np.float64)
+        self._reindex()
+
+        n_items = len(self.recipe_ids)
+        blocks = [
+            self._similarity_rows(np.arange(start, min(start + chunk_size, n_items)))
+            for start in range(0, n_items, chunk_size)
+        ]
+        self.similarity = sp.vstack(blocks, format="csr") if blocks else sp.csr_matrix((0, 0))
+
+    def _reindex(self):
+        self.user_positions = {int(uid): pos for pos, uid in enumerate(self.user_ids)}
+        self.recipe_positions = {int(rid): pos for pos, rid in enumerate(self.recipe_ids)}
+
+    @classmethod
+    def build(cls, top_k=None):
+        weights = interaction_weights(
+            Like.objects.values_list('user_id', 'recipe_id'),
+            SavedRecipe.objects.values_list('user_id', 'recipe_id'),
+        )
+        if not weights:
+            return None
+        user_ids = sorted({user_id for user_id, _ in weights})
+        recipe_ids = sorted({recipe_id for _, recipe_id in weights})
+        users = {uid: pos for pos, uid in enumerate(user_ids)}
+        recipes = {rid: pos for pos, rid in enumerate(recipe_ids)}
+        interactions = sp.csr_matrix(
+            (list(weights.values()),
+             ([users[u] for u, _ in weights], [recipes[r] for _, r in weights])),
+            shape=(len(user_ids), len(recipe_ids)),
+        )
+        return cls(user_ids, recipe_ids, interactions, top_k or settings.RECOMMENDER_CF['TOP_K'])
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def _norms(self):
+        return np.sqrt(np.asarray(self.interactions.multiply(self.interactions).sum(axis=0)).ravel())
+
+    def _similarity_rows(self, items):
+        # Column slices of a CSC matrix are cheap; X[:, items].T @ X is the
+        # block of item-item dot products for `items`
+        columns = self.interactions.tocsc()[:, items]
+        dots = columns.T.tocsr() @ self.interactions
+        return _top_k_rows(dots, items, self._norms(), self.top_k)
+
+    def _grow(self, user_ids, recipe_ids):
+        new_users = [uid for uid in dict.fromkeys(user_ids) if uid not in self.user_positions]
+        new_recipes = [rid for rid in dict.fromkeys(recipe_ids) if rid not in self.recipe_positions]
+        if not new_users and not new_recipes:
+            return
+        self.user_ids = np.concatenate([self.user_ids, np.asarray(new_users, dtype=np.int64)])
+        self.recipe_ids = np.concatenate([self.recipe_ids, np.asarray(new_recipes, dtype=np.int64)])
+        n_users, n_items = len(self.user_ids), len(self.recipe_ids)
+        self.interactions = sp.csr_matrix(
+            (self.interactions.data, self.interactions.indices, np.concatenate([
+                self.interactions.indptr,
+                np.full(n_users - self.interactions.shape[0], self.interactions.indptr[-1]),
+            ])),
+            shape=(n_users, n_items),
+        )
+        self.similarity = sp.csr_matrix(
+            (self.similarity.data, self.similarity.indices, np.concatenate([
+                self.similarity.indptr,
+                np.full(n_items - self.similarity.shape[0], self.similarity.indptr[-1]),
+            ])),
+            shape=(n_items, n_items),
+        )
+        self._reindex()
+
+    def update(self, weights):
+        """
+        Set the interaction weights of the given {(user_id, recipe_id): weight}
+        pairs (0 removes one) and recompute only the similarity rows they can
+        change: the recipes sharing a user with a changed recipe, before or
+        after the change. Returns False if nothing changed.
+        """
+        self._grow([u for u, _ in weights], [r for _, r in weights])
+        rows = np.asarray([self.user_positions[u] for u, _ in weights], dtype=np.int64)
+        cols = np.asarray([self.recipe_positions[r] for _, r in weights], dtype=np.int64)
+        old = np.asarray(self.interactions[rows, cols]).ravel()
+        delta = np.asarray(list(weights.values()), dtype=np.float64) - old
+        if not np.any(delta):
+            return False
+
+        changed = np.unique(cols)
+        users_before = self.interactions.tocsc()[:, changed].nonzero()[0]
+        self.interactions = self.interactions + sp.csr_matrix(
+            (delta, (rows, cols)), shape=self.interactions.shape
+        )
+        self.interactions.eliminate_zeros()
+        users_after = self.interactions.tocsc()[:, changed].nonzero()[0]
+
+        users = np.union1d(users_before, users_after)
+        affected = np.union1d(changed, self.interactions[users].nonzero()[1])
+        self._replace_rows(affected, self._similarity_rows(affected))
+        return True
+
+    def _replace_rows(self, items, rows):
+        n_items = len(self.recipe_ids)
+        keep = np.ones(n_items)
+        keep[items] = 0
+        place = sp.csr_matrix((np.ones(len(items)), (items, np.arange(len(items)))), shape=(n_items, len(items)))
+        self.similarity = (sp.diags(keep) @ self.similarity + place @ rows).tocsr()
+        self.similarity.eliminate_zeros()
+
+    def scores(self, user_id):
+        """CF score of every recipe in the model for a user, scaled to [0, 1]; None for unknown users."""
+        pos = self.user_positions.get(int(user_id))
+        if pos is None:
+            return None
+        scores = (self.interactions[pos] @ self.similarity).toarray().ravel()
+        top = scores.max() if len(scores) else 0
+        return scores / top if top > 0 else scores
+
+
+_lock = threading.RLock()
+_loaded = {"model": None, "mtime": None}
+
+
+def model_path():
+    return os.path.join(settings.RECIPE_INDEX_DIR, "item_item.joblib")
+
+
+@contextmanager
+def _writing():
+    # Read-modify-write of the saved model: this process's lock first, then
+    # the lock file shared with every other worker
+    with _lock, file_lock("item_item"):
+        yield
+
+
+def save_model(model):
+    path = model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+    _loaded["model"] = model
+    _loaded["mtime"] = os.stat(path).st_mtime_ns
+
+
+def rebuild_model(top_k=None):
+    with _writing():
+        model = ItemItemModel.build(top_k=top_k)
+        if model is not None:
+            save_model(model)
+        return model
+
+
+def open_saved_model():
+    """Load the saved CF model, or the newer one another worker saved since; None if there is none."""
+    with _lock:
+        try:
+            mtime = os.stat(model_path()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if _loaded["mtime"] != mtime:
+            model = joblib.load(model_path())
+            if getattr(model, "format_version", None) != ItemItemModel.FORMAT_VERSION:
+                return None
+            _loaded["model"] = model
+            _loaded["mtime"] = mtime
+        return _loaded["model"]
+
+
+def get_item_item_model():
+    """Return the CF model, loading it from disk or building it on first use (see get_recipe_index)."""
+    model = open_saved_model()
+    if model is not None:
+        return model
+    with _writing():
+        # Another worker may have built it while this one waited for the lock
+        model = open_saved_model()
+        if model is None:
+            model = ItemItemModel.build()
+            if model is not None:
+                save_model(model)
+        return model
+
+
+def refresh_interactions(pairs):
+    """
+    Bring the saved CF model up to date after likes or saves of these
+    (user_id, recipe_id) pairs changed. Does nothing until a model has been
+    built; the nightly build_item_item_model run or the first hybrid request
+    builds it from every like and save.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+    try:
+        with _writing():
+            model = open_saved_model()
+            if model is None:
+                return
+            # Read under the lock, so whichever worker saves last has seen
+            # the latest likes and saves of these pairs
+            user_ids = {u for u, _ in pairs}
+            recipe_ids = {r for _, r in pairs}
+            current = interaction_weights(
+                Like.objects.filter(user_id__in=user_ids, recipe_id__in=recipe_ids).values_list('user_id', 'recipe_id'),
+                SavedRecipe.objects.filter(user_id__in=user_ids, recipe_id__in=recipe_ids).values_list('user_id', 'recipe_id'),
+            )
+            model = copy.copy(model)
+            if model.update({pair: current.get(pair, 0.0) for pair in pairs}):
+                save_model(model)
+    except Exception as e:
+        # Keep the refresher thread alive for the next batch
+        print(f"Error refreshing item-item model: {str(e)}")
+
+
+# Committed like/save changes wait here for the refresher thread, so the
+# request that made them never loads or saves the model. Pairs queued while a
+# refresh runs are applied together, in one save, by the next one.
+_queued = threading.Condition()
+_queue = {"pairs": set(), "thread": None}
+
+
+def _refresh_queued():
+    while True:
+        with _queued:
+            while not _queue["pairs"]:
+                _queued.wait()
+            pairs, _queue["pairs"] = _queue["pairs"], set()
+        try:
+            refresh_interactions(pairs)
+        finally:
+            connection.close()
+
+
+def queue_interactions_refresh(pairs):
+    """refresh_interactions() in this process's background refresher thread."""
+    with _queued:
+        _queue["pairs"].update(pairs)
+        thread = _queue["thread"]
+        # Not alive in a process forked after it started
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_refresh_queued, name="item-item-refresh", daemon=True)
+            _queue["thread"] = thread
+            thread.start()
+        _queued.notify()
+
+
+_pending = threading.local()
+
+
+def _flush_pending():
+    pairs = getattr(_pending, "pairs", None)
+    if not pairs:
+        return
+    _pending.pairs = set()
+    queue_interactions_refresh(pairs)
+
+
+def schedule_interactions_refresh(pairs):
+    """Queue a refresh_interactions() once the current transaction commits, batching the pairs it touched."""
+    if not hasattr(_pending, "pairs"):
+        _pending.pairs = set()
+    _pending.pairs.update(pairs)
+    transaction.on_commit(_flush_pending)
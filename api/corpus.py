@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+from .utils import NUTRITION_FIELDS
+
+
+INT16_MAX = np.iinfo(np.int16).max
+
+
+def _encode(values):
+    codes, categories = pd.factorize(pd.Series(values, dtype=object))
+    return codes.astype(np.int16), [str(c) for c in categories]
+
+
+class RecipeCorpus:
+    """
+    The per-recipe columns the recommenders use, as compact NumPy arrays:
+    int64 `ids`, int16 codes into `cuisines` / `courses`, int8 difficulty
+    rank, int16 total minutes and float32 nutrition (NUTRITION_FIELDS order).
+    The text is kept as CSR matrices by RecipeIndex.
+    """
+
+    def __init__(self, ids, cuisine_codes, cuisines, course_codes, courses, difficulty, total_time, nutrition):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.cuisine_codes = np.asarray(cuisine_codes, dtype=np.int16)
+        self.cuisines = list(cuisines)
+        self.course_codes = np.asarray(course_codes, dtype=np.int16)
+        self.courses = list(courses)
+        self.difficulty = np.asarray(difficulty, dtype=np.int8)
+        total_time = np.asarray(total_time)
+        if total_time.dtype != np.int16:
+            total_time = np.clip(total_time.astype(np.int64), 0, INT16_MAX).astype(np.int16)
+        self.total_time = total_time
+        self.nutrition = np.asarray(nutrition, dtype=np.float32).reshape(-1, len(NUTRITION_FIELDS))
+
+    @classmethod
+    def from_frame(cls, df):
+        """From a preprocessed recipe DataFrame (Preprocess.preprocess_recipes output)."""
+        cuisine_codes, cuisines = _encode(df["Cuisine"])
+        course_codes, courses = _encode(df["Course"])
+        return cls(
+            df["ID"].to_numpy(),
+            cuisine_codes, cuisines,
+            course_codes, courses,
+            df["Difficulty Level"].to_numpy(),
+            df["Total_time"].to_numpy(),
+            [[info[field] for field in NUTRITION_FIELDS] for info in df["Nutritional Info"]],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def cuisine(self):
+        return np.asarray(self.cuisines, dtype=object)[self.cuisine_codes]
+
+    @property
+    def course(self):
+        return np.asarray(self.courses, dtype=object)[self.course_codes]
+
+    @property
+    def numeric(self):
+        """Total time then nutrition, as one float32 (n, 5) array."""
+        return np.column_stack([self.total_time.astype(np.float32), self.nutrition])
+
+    def take(self, rows):
+        return RecipeCorpus(
+            self.ids[rows],
+            self.cuisine_codes[rows], self.cuisines,
+            self.course_codes[rows], self.courses,
+            self.difficulty[rows], self.total_time[rows], self.nutrition[rows],
+        )
+
+    @classmethod
+    def concat(cls, corpora):
+        cuisine_codes, cuisines = _encode(np.concatenate([c.cuisine for c in corpora]))
+        course_codes, courses = _encode(np.concatenate([c.course for c in corpora]))
+        return cls(
+            np.concatenate([c.ids for c in corpora]),
+            cuisine_codes, cuisines,
+            course_codes, courses,
+            np.concatenate([c.difficulty for c in corpora]),
+            np.concatenate([c.total_time for c in corpora]),
+            np.concatenate([c.nutrition for c in corpora]),
+        )
+
+    ARRAYS = ["ids", "cuisine_codes", "course_codes", "difficulty", "total_time", "nutrition"]
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays, cuisines, courses):
+        """Inverse of arrays(); arrays of the right dtype (e.g. memory-mapped) are used without copying."""
+        return cls(
+            arrays["ids"],
+            arrays["cuisine_codes"], cuisines,
+            arrays["course_codes"], courses,
+            arrays["difficulty"], arrays["total_time"], arrays["nutrition"],
+        )
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays().values())
+
+
+class RecipePositions:
+    """
+    Read-only {recipe_id: row} lookup over an id array, kept as a sorted copy
+    of the ids instead of a dict entry per recipe.
+    """
+
+    def __init__(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.order = np.argsort(ids, kind="stable")
+        self.sorted_ids = ids[self.order]
+
+    @classmethod
+    def from_arrays(cls, order, sorted_ids):
+        positions = cls.__new__(cls)
+        positions.order, positions.sorted_ids = order, sorted_ids
+        return positions
+
+    def __len__(self):
+        return len(self.sorted_ids)
+
+    def lookup(self, recipe_ids):
+        """Row of each of `recipe_ids`, -1 where missing."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64).reshape(-1)
+        rows = np.full(len(recipe_ids), -1, dtype=np.int64)
+        if len(self.sorted_ids) == 0:
+            return rows
+        found = np.searchsorted(self.sorted_ids, recipe_ids).clip(max=len(self.sorted_ids) - 1)
+        hit = self.sorted_ids[found] == recipe_ids
+        rows[hit] = self.order[found[hit]]
+        return rows
+
+    def get(self, recipe_id, default=None):
+        row = self.lookup([recipe_id])[0]
+        return default if row < 0 else int(row)
+
+    def __contains__(self, recipe_id):
+        return self.get(recipe_id) is not None
+
+    def __getitem__(self, recipe_id):
+        row = self.get(recipe_id)
+        if row is None:
+            raise KeyError(recipe_id)
+        return row
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.sorted_ids.nbytes
@@ -0,0 +1,90 @@
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+
+class Embeddings:
+    """
+    Dense LSA vectors of one sparse TF-IDF space: every row projected on the
+    `components` of a TruncatedSVD fit and L2 normalised, so a dot product is
+    the cosine similarity in the reduced space.
+
+    Vectors are float32, or int8 with a float32 scale per row (a quarter of
+    the size, at a small loss of precision).
+    """
+
+    def __init__(self, components, vectors, scales=None):
+        self.components = components
+        self.vectors = vectors
+        self.scales = scales
+
+    @classmethod
+    def fit(cls, matrix, dimensions, dtype="float32", seed=0):
+        """Fit on the rows of a sparse matrix; None if it is too small for a single component."""
+        dimensions = min(dimensions, matrix.shape[1] - 1, matrix.shape[0])
+        if dimensions < 1:
+            return None
+        svd = TruncatedSVD(n_components=dimensions, random_state=seed).fit(matrix)
+        embeddings = cls(svd.components_.astype(np.float32), None)
+        embeddings.vectors, embeddings.scales = cls._encode(embeddings.project(matrix), dtype)
+        return embeddings
+
+    @staticmethod
+    def _encode(vectors, dtype):
+        if dtype == "float32":
+            return vectors, None
+        if dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+
+    @property
+    def dtype(self):
+        return "int8" if self.vectors.dtype == np.int8 else "float32"
+
+    @property
+    def nbytes(self):
+        return self.components.nbytes + self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def project(self, matrix):
+        """float32 unit vectors of sparse rows of the same space."""
+        return normalize(np.asarray(matrix @ self.components.T, dtype=np.float32))
+
+    def decode(self, rows):
+        """The stored vectors of `rows` as float32."""
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def similarity(self, queries, rows=None):
+        """Cosine similarity of float32 unit `queries` with the stored vectors (or those of `rows`)."""
+        vectors, scales = self.vectors, self.scales
+        if rows is not None:
+            vectors = vectors[rows]
+            scales = scales[rows] if scales is not None else None
+        similarity = queries @ vectors.T
+        if scales is not None:
+            similarity *= scales[None, :]
+        return similarity
+
+    def replace_rows(self, keep, matrix):
+        """
+        New Embeddings with the rows not in `keep` dropped and the sparse rows
+        of `matrix` appended, projected on the existing components.
+        """
+        if matrix.shape[0] == 0:
+            # Deletions only; there is nothing to project
+            return Embeddings(
+                self.components, self.vectors[keep], self.scales[keep] if self.scales is not None else None
+            )
+        vectors, scales = self._encode(self.project(matrix), self.dtype)
+        return Embeddings(
+            self.components,
+            np.concatenate([self.vectors[keep], vectors]),
+            np.concatenate([self.scales[keep], scales]) if scales is not None else None,
+        )
@@ -0,0 +1,106 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+
+class RecommenderBusy(Exception):
+    """Too many recommender calls are already queued."""
+
+
+class RecommenderTimeout(Exception):
+    """A recommender call did not finish within its timeout."""
+
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+# True in the pool's worker processes, which skip the web process's start-up
+# work in ApiConfig.ready()
+in_pool_worker = False
+
+
+def _init_worker():
+    global in_pool_worker
+    in_pool_worker = True
+    # Workers are spawned, not forked, so they never share the parent's
+    # database connections; each sets Django up on its own.
+    import django
+    django.setup()
+
+
+def _get_pool():
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            options = settings.RECOMMENDER_POOL
+            _pool = ProcessPoolExecutor(
+                max_workers=options['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            _slots = threading.BoundedSemaphore(options['WORKERS'] + options['MAX_PENDING'])
+        return _pool, _slots
+
+
+def _reset_pool(broken):
+    global _pool
+    with _lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+def run_recommender(fn, *args, timeout=None, **kwargs):
+    """
+    Run a recommender function from api/AI.py in the worker process pool and
+    return its result. `fn` must be a module level function and its arguments
+    and result picklable.
+
+    Raises RecommenderBusy when RECOMMENDER_POOL['MAX_PENDING'] calls are
+    already waiting for a worker, and RecommenderTimeout when the call takes
+    longer than `timeout` seconds (default RECOMMENDER_POOL['TIMEOUT']).
+    With RECOMMENDER_POOL['WORKERS'] = 0 the function runs inline.
+    """
+    options = settings.RECOMMENDER_POOL
+    if not options['WORKERS']:
+        return fn(*args, **kwargs)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise RecommenderBusy()
+    try:
+        future = pool.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        slots.release()
+        _reset_pool(pool)
+        raise
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda f: slots.release())
+
+    try:
+        return future.result(timeout=timeout or options['TIMEOUT'])
+    except TimeoutError:
+        # Drops the call if it is still queued. A call already running cannot
+        # be interrupted; its result is discarded and its slot freed when done.
+        future.cancel()
+        raise RecommenderTimeout()
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM killed); start a fresh pool next call
+        _reset_pool(pool)
+        raise
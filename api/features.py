@@ -0,0 +1,175 @@
+import threading
+import pandas as pd
+from django.db import transaction
+from .models import Course, Cuisine, IngredientName, Recipe, RecipeFeatures
+from .parsing import ingredient_pieces
+from .utils import VectorizedPreprocess
+
+
+# RecipeFeatures column -> column of the preprocessed recipe DataFrame
+# (Preprocess.preprocess_recipes output) it stores
+FEATURE_COLUMNS = {
+    "recipe_id": "ID",
+    "description": "Description",
+    "ingredients": "Ingredients",
+    "total_minutes": "Total_time",
+    "cuisine": "Cuisine",
+    "course": "Course",
+    "difficulty_rank": "Difficulty Level",
+    "dietary_restrictions": "Dietary Restrictions",
+    "instructions": "Instructions",
+    "equipment": "Equipment",
+}
+NUTRITION_COLUMNS = {"calories_kcal": "calories", "protein_g": "protein", "carbs_g": "carbs", "fat_g": "fat"}
+
+
+def _raw_frame(recipes):
+    # The raw recipe columns Preprocess.preprocess_recipes takes, minus the
+    # numeric fields the models already store parsed
+    return pd.DataFrame([
+        {
+            "ID": recipe.id,
+            "Title": recipe.title,
+            "Description": recipe.description,
+            "Cuisine": recipe.cuisine or Cuisine(name=""),
+            "Course": recipe.course or Course(name=""),
+            "Difficulty Level": recipe.difficulty_level,
+            "Dietary Restrictions": [dr.name for dr in recipe.dietary_restrictions.all()],
+            "Ingredients": ",".join(ing.ingredient for ing in recipe.ingredients.all()),
+            "Instructions": [inst.step for inst in recipe.instructions.all()],
+            "Equipment": [eq.name for eq in recipe.equipment.all()],
+        }
+        for recipe in recipes
+    ])
+
+
+def compute_recipe_features(recipe_ids, names=None):
+    """
+    Unsaved RecipeFeatures for the given recipes that still exist. Ingredient
+    names are read from `names` (IngredientName.lookup()), or else from the
+    IngredientName rows of these recipes' ingredient pieces.
+    """
+    recipes = list(
+        Recipe.objects.filter(id__in=recipe_ids)
+        .select_related("cuisine", "course", "nutritional_information")
+        .prefetch_related("dietary_restrictions", "ingredients", "instructions", "equipment")
+        .order_by("id")
+    )
+    if not recipes:
+        return []
+    if names is None:
+        names = IngredientName.lookup(
+            piece for recipe in recipes for ing in recipe.ingredients.all() for piece in ingredient_pieces(ing.ingredient)
+        )
+    df = VectorizedPreprocess(names=names).preprocess_recipes(_raw_frame(recipes))
+
+    rows = []
+    for recipe, (_, row) in zip(recipes, df.iterrows()):
+        info = getattr(recipe, "nutritional_information", None)
+        rows.append(RecipeFeatures(
+            recipe_id=recipe.id,
+            description=row["Description"],
+            ingredients=row["Ingredients"],
+            instructions=row["Instructions"],
+            equipment=row["Equipment"],
+            cuisine=row["Cuisine"],
+            course=row["Course"],
+            dietary_restrictions=row["Dietary Restrictions"],
+            total_minutes=recipe.total_minutes,
+            difficulty_rank=recipe.difficulty_rank,
+            calories_kcal=info.calories_kcal if info else None,
+            protein_g=info.protein_g if info else None,
+            carbs_g=info.carbs_g if info else None,
+            fat_g=info.fat_g if info else None,
+        ))
+    return rows
+
+
+def refresh_recipe_features(recipe_ids, names=None):
+    """Recompute and store the features of the given recipes. Returns the number of rows written."""
+    rows = compute_recipe_features(recipe_ids, names=names)
+    RecipeFeatures.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["recipe"],
+        update_fields=[f.name for f in RecipeFeatures._meta.concrete_fields if not f.primary_key],
+    )
+    return len(rows)
+
+
+def rebuild_recipe_features(chunk_size=500):
+    """Recompute the features of every recipe. Returns the number of rows written."""
+    names = IngredientName.lookup()
+    recipe_ids = list(Recipe.objects.order_by("id").values_list("id", flat=True))
+    written = 0
+    for start in range(0, len(recipe_ids), chunk_size):
+        with transaction.atomic():
+            written += refresh_recipe_features(recipe_ids[start:start + chunk_size], names=names)
+    RecipeFeatures.objects.exclude(recipe_id__in=recipe_ids).delete()
+    return written
+
+
+def _features_queryset(recipe_ids=None):
+    queryset = RecipeFeatures.objects.order_by("recipe_id")
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    return queryset.values_list(*FEATURE_COLUMNS, *NUTRITION_COLUMNS)
+
+
+def load_recipe_features(recipe_ids=None):
+    """
+    The preprocessed recipe DataFrame the recommenders use, read from
+    RecipeFeatures with one query. Missing time or nutrition reads as 0.
+    """
+    return _features_frame(list(_features_queryset(recipe_ids)))
+
+
+def iter_recipe_features(chunk_size=1000, recipe_ids=None):
+    """load_recipe_features() in DataFrames of at most chunk_size recipes, streamed from one server-side query."""
+    rows = []
+    for row in _features_queryset(recipe_ids).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield _features_frame(rows)
+            rows = []
+    if rows:
+        yield _features_frame(rows)
+
+
+def _features_frame(rows):
+    columns = list(FEATURE_COLUMNS) + list(NUTRITION_COLUMNS)
+    df = pd.DataFrame(rows, columns=columns)
+
+    nutrition = df[list(NUTRITION_COLUMNS)].fillna(0).astype(int).rename(columns=NUTRITION_COLUMNS)
+    df = df[list(FEATURE_COLUMNS)].rename(columns=FEATURE_COLUMNS)
+    df["Total_time"] = df["Total_time"].fillna(0).astype(int)
+    df["Difficulty Level"] = df["Difficulty Level"].fillna(1).astype(int)
+    df["Nutritional Info"] = nutrition.to_dict("records")
+    return df
+
+
+_pending = threading.local()
+
+
+def _flush_pending():
+    recipe_ids = getattr(_pending, "ids", None)
+    if not recipe_ids:
+        return
+    _pending.ids = set()
+    try:
+        refresh_recipe_features(recipe_ids)
+    except Exception as e:
+        # Never fail the write that triggered the refresh
+        print(f"Error refreshing recipe features: {str(e)}")
+
+
+def schedule_features_refresh(recipe_ids):
+    """
+    Refresh the features of these recipes once the current transaction
+    commits (immediately outside one), so a recipe saved together with its
+    ingredients, instructions etc. is recomputed once.
+    """
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    _pending.ids.update(rid for rid in recipe_ids if rid is not None)
+    transaction.on_commit(_flush_pending)
@@ -0,0 +1,65 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+class HashingTfidfVectorizer:
+    """
+    TF-IDF over a fixed-width hashed feature space, a drop-in for the
+    TfidfVectorizer fits in RecipeIndex.
+
+    Terms are hashed to one of `n_features` columns, so there is no
+    vocabulary to refit, and the IDF weights come from running document
+    frequency counts. Weights match TfidfVectorizer's defaults (smoothed
+    IDF, L2-normalised rows) up to hash collisions.
+    """
+
+    def __init__(self, n_features=2 ** 15, stop_words=None):
+        self.hasher = HashingVectorizer(
+            n_features=n_features, stop_words=stop_words, alternate_sign=False, norm=None, dtype=np.float32
+        )
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+
+    @property
+    def idf(self):
+        return (np.log((1 + self.n_docs) / (1 + self.df)) + 1).astype(np.float32)
+
+    def _counts(self, texts):
+        if len(texts) == 0:
+            return sp.csr_matrix((0, len(self.df)), dtype=np.float32)
+        return self.hasher.transform(texts)
+
+    def _count(self, rows, sign):
+        # Any stored entry, raw count or weight, means the term occurs
+        self.n_docs += sign * rows.shape[0]
+        self.df += sign * np.bincount(rows.indices, minlength=len(self.df))
+
+    @staticmethod
+    def _weight(rows, column_weights):
+        if rows.shape[0] == 0:
+            # normalize() rejects empty input, e.g. update() for deletions only
+            return sp.csr_matrix(rows.shape, dtype=np.float32)
+        return normalize(sp.csr_matrix(rows @ sp.diags(column_weights), dtype=np.float32))
+
+    def fit_transform(self, texts):
+        counts = self._counts(texts)
+        self._count(counts, 1)
+        return self._weight(counts, self.idf)
+
+    def transform(self, texts):
+        return self._weight(self._counts(texts), self.idf)
+
+    def update(self, kept, removed, texts):
+        """
+        Take rows this vectorizer produced out of the counts (`removed`), add
+        `texts`, and return `kept` reweighted for the new IDF with the rows of
+        `texts` appended. Rows are rescaled, never re-tokenised.
+        """
+        old_idf = self.idf
+        self._count(removed, -1)
+        counts = self._counts(texts)
+        self._count(counts, 1)
+        idf = self.idf
+        return sp.vstack([self._weight(kept, idf / old_idf), self._weight(counts, idf)], format="csr")
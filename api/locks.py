@@ -0,0 +1,48 @@
+import os
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows; the thread lock still covers a single process
+    fcntl = None
+
+
+_locks = {}
+_locks_lock = threading.Lock()
+_held = threading.local()
+
+
+@contextmanager
+def file_lock(name):
+    """
+    Exclusive lock on RECIPE_INDEX_DIR/<name>.lock, shared by every thread and
+    process using that directory, for read-modify-write cycles of the files
+    kept there. Re-entrant within a thread.
+    """
+    path = os.path.join(settings.RECIPE_INDEX_DIR, f"{name}.lock")
+    with _locks_lock:
+        lock = _locks.setdefault(path, threading.RLock())
+    with lock:
+        depth = getattr(_held, "depth", {})
+        _held.depth = depth
+        if depth.get(path):
+            depth[path] += 1
+            try:
+                yield
+            finally:
+                depth[path] -= 1
+            return
+
+        os.makedirs(settings.RECIPE_INDEX_DIR, exist_ok=True)
+        with open(path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            depth[path] = 1
+            try:
+                yield
+            finally:
+                depth[path] = 0
+                # Closing the file releases the flock
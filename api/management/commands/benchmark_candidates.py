@@ -0,0 +1,84 @@
+import itertools
+import json
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.AI import recommend_for_profile
+from api.benchmark import CUISINES, DIETARY_RESTRICTIONS, best_time, seed_synthetic_catalog
+from api.candidates import preference_candidates
+from api.features import refresh_recipe_features
+from api.models import Cuisine, CustomUser, DietaryRestriction, IngredientName, UserPreference
+from api.recipe_index import RecipeIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Time start()'s candidate selection (the preference_candidates SQL) and scoring stages together for "
+        "users with narrower and narrower preferences. Seeds a synthetic catalog inside a transaction that "
+        "is rolled back, so the database is left as it was."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50000)
+        parser.add_argument('--cuisines', type=int, nargs='+', default=[5, 2, 1],
+                            help="Preferred cuisines per synthetic user")
+        parser.add_argument('--restrictions', type=int, nargs='+', default=[0, 1],
+                            help="Dietary restrictions per synthetic user")
+        parser.add_argument('--saved', type=int, default=10, help="Saved recipes in the synthetic profile")
+        parser.add_argument('--min-similarity', type=float, default=0.3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=500, help="Recipes per RecipeFeatures write")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, options):
+        recipe_ids, usernames = seed_synthetic_catalog(options['size'], users=1)
+        names = IngredientName.lookup()
+        chunk_size = options['chunk_size']
+        for start in range(0, len(recipe_ids), chunk_size):
+            refresh_recipe_features(recipe_ids[start:start + chunk_size], names=names)
+        index = RecipeIndex.build()
+        rng = np.random.default_rng(0)
+
+        saved = rng.choice(len(index), options['saved'], replace=False)
+        vector = sp.csr_matrix(index.profile_matrix[saved].sum(axis=0))
+        saved_ids = index.ids[saved].tolist()
+        avg_time = index.corpus.total_time[saved].mean()
+        avg_difficulty = index.corpus.difficulty[saved].mean()
+
+        def run(user):
+            # What start() does per request: the preference query, then scoring
+            return recommend_for_profile(index, vector, saved_ids, avg_time, avg_difficulty,
+                                         min_similarity=options['min_similarity'],
+                                         candidate_ids=preference_candidates(user))
+
+        # A user without preferences still pays for the (empty) preference lookup
+        user = CustomUser.objects.get(username=usernames[0])
+        full = best_time(lambda: run(user), options['repeat'])
+        preferences = UserPreference.objects.create(user=user)
+        results = []
+        for n_cuisines, n_restrictions in itertools.product(options['cuisines'], options['restrictions']):
+            preferences.preferred_cuisines.set(Cuisine.objects.filter(name__in=CUISINES[:n_cuisines]))
+            preferences.dietary_restrictions.set(
+                DietaryRestriction.objects.filter(name__in=DIETARY_RESTRICTIONS[:n_restrictions])
+            )
+            candidates = len(preference_candidates(user) or index.ids)
+            sql = best_time(lambda: preference_candidates(user), options['repeat'])
+            pruned = best_time(lambda: run(user), options['repeat'])
+            results.append({
+                "recipes": len(index),
+                "cuisines": n_cuisines,
+                "restrictions": n_restrictions,
+                "candidates": candidates,
+                "selectivity": round(candidates / len(index), 4),
+                "full_catalog_ms": round(full * 1000, 2),
+                "candidates_sql_ms": round(sql * 1000, 2),
+                "pruned_ms": round(pruned * 1000, 2),
+                "speedup": round(full / pruned, 2),
+            })
+        return results
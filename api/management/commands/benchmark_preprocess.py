@@ -0,0 +1,26 @@
+import json
+from django.core.management.base import BaseCommand
+from api.benchmark import best_time, synthetic_recipe_frame
+from api.utils import Preprocess, VectorizedPreprocess
+
+
+class Command(BaseCommand):
+    help = "Compare Preprocess with VectorizedPreprocess on synthetic catalogs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            df = synthetic_recipe_frame(size)
+            row_wise = best_time(lambda: Preprocess().preprocess_recipes(df.copy()), options['repeat'])
+            vectorized = best_time(lambda: VectorizedPreprocess().preprocess_recipes(df.copy()), options['repeat'])
+            results.append({
+                "recipes": size,
+                "row_wise_seconds": round(row_wise, 4),
+                "vectorized_seconds": round(vectorized, 4),
+                "speedup": round(row_wise / vectorized, 2),
+            })
+        self.stdout.write(json.dumps(results, indent=2))
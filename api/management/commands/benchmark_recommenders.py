@@ -0,0 +1,125 @@
+import json
+import random
+import tempfile
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from api.AI import (
+    generate_recipe_by_ings, rank_recipes_by_ings, recommend_for_profile, recommend_similar_recipes,
+    serialize_recipes, start,
+)
+from api.benchmark import INGREDIENTS, measure, seed_synthetic_catalog
+from api.candidates import preference_candidates
+from api.features import load_recipe_features, refresh_recipe_features
+from api.models import CustomUser, IngredientName, SavedRecipe
+from api.recipe_index import RecipeIndex, get_recipe_index, recipe_features, save_index
+from api.taste_profiles import get_taste_profile, profile_vector
+
+
+class Command(BaseCommand):
+    help = (
+        "Time recommend_similar_recipes, start and generate_recipe_by_ings stage by stage on synthetic "
+        "catalogs. Seeds inside a transaction that is rolled back and writes the index to a temporary "
+        "directory, so the database and the saved index are left as they were."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--queries', type=int, default=20, help="Requests timed per engine")
+        parser.add_argument('--top-n', type=int, default=20, help="Recipes serialized per request")
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=500, help="Recipes per RecipeFeatures write")
+        parser.add_argument('--vectorizer', choices=['tfidf', 'hashing'], default=settings.RECIPE_INDEX_VECTORIZER)
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            with tempfile.TemporaryDirectory() as index_dir, override_settings(
+                RECIPE_INDEX_DIR=index_dir, RECIPE_INDEX_VECTORIZER=options['vectorizer']
+            ):
+                with transaction.atomic():
+                    results.append(self.run(size, options))
+                    transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, size, options):
+        repeat, queries, top_n = options['repeat'], options['queries'], options['top_n']
+        started = time.perf_counter()
+        recipe_ids, usernames = seed_synthetic_catalog(size, users=options['users'])
+        seed_seconds = time.perf_counter() - started
+
+        # Offline stages every engine shares: RecipeFeatures written by the
+        # save signals, then the index built from them
+        chunk_size = options['chunk_size']
+        names = IngredientName.lookup()
+        chunks = [recipe_ids[start:start + chunk_size] for start in range(0, len(recipe_ids), chunk_size)]
+        _, features_stats = measure(lambda i: refresh_recipe_features(chunks[i], names=names), len(chunks), repeat)
+        [df], fetch_stats = measure(lambda i: load_recipe_features(), repeat=repeat)
+        [features], preprocess_stats = measure(lambda i: recipe_features(df), repeat=repeat)
+        [index], vectorize_stats = measure(lambda i: RecipeIndex.from_features(features), repeat=repeat)
+        _, persist_stats = measure(lambda i: save_index(index), repeat=repeat)
+        report = {
+            "recipes": size,
+            "vectorizer": options['vectorizer'],
+            "seed_seconds": round(seed_seconds, 3),
+            "index": {
+                "preprocess_features": features_stats,
+                "db_fetch": fetch_stats,
+                "preprocess": preprocess_stats,
+                "vectorize": vectorize_stats,
+                "persist": persist_stats,
+            },
+        }
+
+        rnd = random.Random(0)
+        base_ids = rnd.sample(recipe_ids, min(queries, size))
+        users = [CustomUser.objects.get(username=rnd.choice(usernames)) for _ in range(queries)]
+        ingredient_lists = [rnd.sample(INGREDIENTS, 3) for _ in range(queries)]
+
+        # recommend_similar_recipes
+        neighbours, score_stats = measure(lambda i: index.similar(base_ids[i], top_n=top_n), len(base_ids), repeat)
+        _, serialize_stats = measure(lambda i: serialize_recipes(neighbours[i][0].tolist()), len(base_ids), repeat)
+        _, total_stats = measure(
+            lambda i: serialize_recipes(recommend_similar_recipes(base_ids[i], top_n=top_n).get("ID", np.zeros(0)).tolist()),
+            len(base_ids), repeat,
+        )
+        report["similar"] = {"score": score_stats, "serialize": serialize_stats, "end_to_end": total_stats}
+
+        # start
+        def fetch_profile(i):
+            user = CustomUser.objects.get(pk=users[i].pk)
+            profile = get_taste_profile(user, get_recipe_index())
+            saved_ids = list(SavedRecipe.objects.filter(user=user).values_list('recipe_id', flat=True))
+            return profile, saved_ids, preference_candidates(user)
+
+        profiles, fetch_stats = measure(fetch_profile, queries, repeat)
+
+        def score_profile(i):
+            profile, saved_ids, candidate_ids = profiles[i]
+            return recommend_for_profile(
+                index, profile_vector(profile, index), saved_ids,
+                profile.total_time_sum / profile.saved_count, profile.difficulty_sum / profile.saved_count,
+                candidate_ids=candidate_ids,
+            )
+
+        ranked, score_stats = measure(score_profile, queries, repeat)
+        _, serialize_stats = measure(
+            lambda i: serialize_recipes(ranked[i].get("ID", np.zeros(0))[:top_n].tolist()), queries, repeat
+        )
+        _, total_stats = measure(
+            lambda i: serialize_recipes(start(users[i].username).get("ID", np.zeros(0))[:top_n].tolist()), queries, repeat
+        )
+        report["start"] = {
+            "db_fetch": fetch_stats, "score": score_stats, "serialize": serialize_stats, "end_to_end": total_stats,
+        }
+
+        # generate_recipe_by_ings
+        matches, score_stats = measure(lambda i: rank_recipes_by_ings(ingredient_lists[i], limit=top_n), queries, repeat)
+        _, serialize_stats = measure(lambda i: serialize_recipes(matches[i]), queries, repeat)
+        _, total_stats = measure(lambda i: generate_recipe_by_ings(ingredient_lists[i], limit=top_n), queries, repeat)
+        report["generate"] = {"score": score_stats, "serialize": serialize_stats, "end_to_end": total_stats}
+        return report
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.precompute import build_cold_start_lists
+
+
+class Command(BaseCommand):
+    help = ("Precompute the popularity lists served to users with no saved recipes into the "
+            "ColdStartRecommendation table (run hourly)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.COLD_START_TOP_K)
+
+    def handle(self, *args, **options):
+        written = build_cold_start_lists(top_n=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} cold-start recommendation rows."))
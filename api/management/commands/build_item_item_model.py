@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.collaborative import rebuild_model
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item-item collaborative filtering model from likes and saves"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.RECOMMENDER_CF['TOP_K'],
+                            help="Similar recipes kept per recipe")
+
+    def handle(self, *args, **options):
+        model = rebuild_model(top_k=options['top_k'])
+        if model is None:
+            self.stdout.write(self.style.WARNING("No likes or saves found, model not built."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Built item-item model for {len(model)} recipes and {len(model.user_ids)} users."
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.features import rebuild_recipe_features
+
+
+class Command(BaseCommand):
+    help = "Recompute the RecipeFeatures row of every recipe (the recommenders' corpus)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Recipes recomputed per transaction")
+
+    def handle(self, *args, **options):
+        written = rebuild_recipe_features(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Stored features for {written} recipes."))
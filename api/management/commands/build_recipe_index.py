@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.recipe_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the on-disk TF-IDF recipe index used for similar-recipe lookups"
+
+    def handle(self, *args, **options):
+        index = rebuild_index()
+        if index is None:
+            self.stdout.write(self.style.WARNING("No recipes found, index not built."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(index)} recipes."))
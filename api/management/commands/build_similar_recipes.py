@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.artifacts import open_published_index
+from api.precompute import build_similar_recipes, stale_similar_recipe_ids
+
+
+class Command(BaseCommand):
+    help = "Precompute the top-K similar recipes of every recipe into the SimilarRecipe table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true',
+                            help="Only recompute recipes that have no rows yet (new or edited recipes)")
+        parser.add_argument('--top-k', type=int, default=settings.SIMILAR_RECIPES_TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=256,
+                            help="Recipes scored per matrix product")
+        parser.add_argument('--sync', action='store_true',
+                            help="Score with the newest published index artifact instead of building an index")
+
+    def handle(self, *args, **options):
+        if options['sync'] and open_published_index() is None:
+            raise CommandError("No recipe index artifact has been published; run publish_recipe_index first.")
+        recipe_ids = stale_similar_recipe_ids() if options['refresh'] else None
+        if recipe_ids == []:
+            self.stdout.write("Nothing to refresh.")
+            return
+
+        written = build_similar_recipes(
+            recipe_ids=recipe_ids,
+            top_n=options['top_k'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} similar recipe rows."))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.artifacts import open_published_index
+from api.precompute import build_user_recommendations
+
+
+class Command(BaseCommand):
+    help = "Precompute the top-K recommendations of every user into the UserRecommendation table (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.USER_RECOMMENDATIONS_TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=512,
+                            help="Users scored per matrix product")
+        parser.add_argument('--sync', action='store_true',
+                            help="Score with the newest published index artifact instead of building an index")
+
+    def handle(self, *args, **options):
+        if options['sync'] and open_published_index() is None:
+            raise CommandError("No recipe index artifact has been published; run publish_recipe_index first.")
+        written = build_user_recommendations(top_n=options['top_k'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} user recommendation rows."))
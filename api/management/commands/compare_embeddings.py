@@ -0,0 +1,85 @@
+import json
+import time
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from api.AI import recommend_for_profile
+from api.benchmark import best_time, synthetic_recipe_frame
+from api.recipe_index import RecipeIndex, recipe_features
+from api.utils import VectorizedPreprocess
+
+
+def matrix_bytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def overlap(expected, actual, k):
+    """Mean share of each expected top-k list that also appears in the actual one."""
+    return float(np.mean([len(set(e[:k]) & set(a[:k])) / max(1, min(k, len(e))) for e, a in zip(expected, actual)]))
+
+
+class Command(BaseCommand):
+    help = "Compare the dense embedding backend (search=dense) with the sparse TF-IDF path on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000)
+        parser.add_argument('--dimensions', type=int, nargs='+', default=[32, 64, 128, 256])
+        parser.add_argument('--dtypes', nargs='+', choices=['float32', 'int8'], default=['float32', 'int8'])
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--k', type=int, default=10, help="Ranking depth compared")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        df = VectorizedPreprocess().preprocess_recipes(synthetic_recipe_frame(options['size']))
+        index = RecipeIndex.from_features(recipe_features(df))
+        rng = np.random.default_rng(0)
+        k, repeat = options['k'], options['repeat']
+
+        positions = rng.choice(len(index), min(options['queries'], len(index)), replace=False)
+        profiles = []
+        for _ in range(len(positions)):
+            saved = rng.choice(len(index), 10, replace=False)
+            profiles.append((
+                sp.csr_matrix(index.profile_matrix[saved].sum(axis=0)), index.ids[saved].tolist(),
+                index.corpus.total_time[saved].mean(), index.corpus.difficulty[saved].mean(),
+            ))
+
+        # Thresholds are not comparable between the two spaces, so rankings
+        # are compared without one
+        def similar(search):
+            return [[int(p) for p in best] for best, _ in index.neighbours(positions, k, 0, search)]
+
+        def recommend(search):
+            return [
+                recommend_for_profile(index, vector, saved, avg_time, avg_difficulty, min_similarity=0,
+                                      search=search).get("ID", np.zeros(0))[:k].tolist()
+                for vector, saved, avg_time, avg_difficulty in profiles
+            ]
+
+        exact_similar, exact_recommend = similar("exact"), recommend("exact")
+        sparse = {
+            "bytes_per_recipe": round((matrix_bytes(index.matrix) + matrix_bytes(index.profile_matrix)) / len(index), 1),
+            "similar_ms_per_query": round(best_time(lambda: similar("exact"), repeat) * 1000 / len(positions), 3),
+            "profile_ms_per_query": round(best_time(lambda: recommend("exact"), repeat) * 1000 / len(profiles), 3),
+        }
+
+        results = []
+        for dimensions in options['dimensions']:
+            for dtype in options['dtypes']:
+                started = time.perf_counter()
+                index.fit_embeddings(dimensions, dtype)
+                fit_seconds = time.perf_counter() - started
+                embeddings = index.embeddings.values()
+                results.append({
+                    "dimensions": dimensions,
+                    "dtype": dtype,
+                    "fit_seconds": round(fit_seconds, 3),
+                    "bytes_per_recipe": round(sum(e.vectors.nbytes + (e.scales.nbytes if e.scales is not None else 0)
+                                                  for e in embeddings) / len(index), 1),
+                    "component_bytes": sum(e.components.nbytes for e in embeddings),
+                    "similar_ms_per_query": round(best_time(lambda: similar("dense"), repeat) * 1000 / len(positions), 3),
+                    "profile_ms_per_query": round(best_time(lambda: recommend("dense"), repeat) * 1000 / len(profiles), 3),
+                    f"similar_overlap_at_{k}": round(overlap(exact_similar, similar("dense"), k), 4),
+                    f"profile_overlap_at_{k}": round(overlap(exact_recommend, recommend("dense"), k), 4),
+                })
+        self.stdout.write(json.dumps({"recipes": len(index), "sparse": sparse, "dense": results}, indent=2))
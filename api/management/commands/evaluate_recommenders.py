@@ -0,0 +1,155 @@
+import io
+import json
+import math
+import random
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from api.AI import recommend_similar_recipes, start, start_hybrid
+from api.models import CustomUser, Like, Recipe, SavedRecipe, UserTasteProfile
+from api.precompute import (build_cold_start_lists, build_user_recommendations, cold_start_recommendations,
+                            precomputed_recommendations)
+
+
+ENGINES = ["content", "hybrid", "similar", "precomputed", "popular"]
+SEARCHES = ["exact", "ann", "dense", "stream"]
+
+
+def held_out_interactions(fraction, min_interactions, max_users, seed=0):
+    """
+    {user_id: (training recipe ids, held-out recipe ids)} over Like and
+    SavedRecipe: each user's most recent `fraction` of recipes (at least one)
+    is held out. Users with fewer than min_interactions recipes are skipped.
+    """
+    history = {}
+    for model, field in [(Like, 'liked_at'), (SavedRecipe, 'saved_at')]:
+        for user_id, recipe_id, at in model.objects.values_list('user_id', 'recipe_id', field):
+            recipes = history.setdefault(user_id, {})
+            recipes[recipe_id] = max(at, recipes.get(recipe_id, at))
+
+    users = sorted(user_id for user_id, recipes in history.items() if len(recipes) >= min_interactions)
+    if max_users and len(users) > max_users:
+        users = sorted(random.Random(seed).sample(users, max_users))
+    split = {}
+    for user_id in users:
+        ordered = [rid for rid, _ in sorted(history[user_id].items(), key=lambda item: (item[1], item[0]))]
+        held = max(1, math.ceil(len(ordered) * fraction))
+        split[user_id] = (ordered[:-held], ordered[-held:])
+    return split
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay held-out likes and saves against the recommenders and report precision@k, recall@k and "
+        "coverage next to p50/p99 latency and memory per engine and search backend. Runs inside a "
+        "transaction that is rolled back and builds the index in a temporary directory, so the database "
+        "and the saved index are left as they were."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--holdout', type=float, default=0.2,
+                            help="Share of each user's most recent interactions held out")
+        parser.add_argument('--min-interactions', type=int, default=3)
+        parser.add_argument('--users', type=int, default=500, help="Users evaluated (a sample if there are more)")
+        parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+        parser.add_argument('--searches', nargs='+', choices=SEARCHES, default=["exact", "ann", "dense"],
+                            help="Search backends tried for the content, hybrid and similar engines")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as index_dir, override_settings(RECIPE_INDEX_DIR=index_dir):
+            with transaction.atomic():
+                report = self.run(options)
+                transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, options):
+        k = options['k']
+        split = held_out_interactions(options['holdout'], options['min_interactions'], options['users'])
+        if not split:
+            return {"users": 0, "engines": []}
+
+        # Take the held-out interactions out of every input the engines read:
+        # the interaction tables, the taste profiles and the precomputed lists
+        for user_id, (_, held_out) in split.items():
+            Like.objects.filter(user_id=user_id, recipe_id__in=held_out).delete()
+            SavedRecipe.objects.filter(user_id=user_id, recipe_id__in=held_out).delete()
+        UserTasteProfile.objects.update(index_version="")
+        call_command('reconcile_recipe_counters', stdout=io.StringIO())
+        if "precomputed" in options['engines']:
+            build_user_recommendations(user_ids=list(split))
+        if "popular" in options['engines']:
+            build_cold_start_lists()
+
+        users = list(CustomUser.objects.filter(id__in=list(split)))
+        engines = {}
+        for engine in options['engines']:
+            if engine == "precomputed":
+                engines[engine] = lambda user: precomputed_recommendations(user) or []
+            elif engine == "popular":
+                engines[engine] = lambda user: cold_start_recommendations(user, top_n=k) or []
+            else:
+                for search in options['searches']:
+                    engines[f"{engine}:{search}"] = self.engine(engine, search, split, k)
+
+        catalog = Recipe.objects.count()
+        results = [self.evaluate(name, recommend, users, split, k, catalog) for name, recommend in engines.items()]
+        return {
+            "users": len(users),
+            "held_out": sum(len(held_out) for _, held_out in split.values()),
+            "catalog": catalog,
+            "k": k,
+            "engines": results,
+        }
+
+    @staticmethod
+    def engine(engine, search, split, k):
+        if engine == "content":
+            return lambda user: start(user.username, search=search).get("ID", np.zeros(0))[:k].tolist()
+        if engine == "hybrid":
+            return lambda user: start_hybrid(user.username, search=search).get("ID", np.zeros(0))[:k].tolist()
+
+        # Neighbours of the user's most recent remaining interaction
+        def similar(user):
+            training = split[user.id][0]
+            if not training:
+                return []
+            return recommend_similar_recipes(training[-1], top_n=k, search=search).get("ID", np.zeros(0)).tolist()
+        return similar
+
+    @staticmethod
+    def evaluate(name, recommend, users, split, k, catalog):
+        # Untimed first call: loads or builds the index and models
+        recommend(users[0])
+        latencies, recommended = [], []
+        for user in users:
+            started = time.perf_counter()
+            recommended.append(recommend(user)[:k])
+            latencies.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                for user in users:
+                    recommend(user)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        hits = [len(set(ids) & set(split[user.id][1])) for user, ids in zip(users, recommended)]
+        return {
+            "engine": name,
+            f"precision_at_{k}": round(float(np.mean([h / k for h in hits])), 4),
+            f"recall_at_{k}": round(float(np.mean([h / len(split[u.id][1]) for u, h in zip(users, hits)])), 4),
+            "coverage": round(len({rid for ids in recommended for rid in ids}) / max(1, catalog), 4),
+            "users_answered": round(float(np.mean([bool(ids) for ids in recommended])), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+            "peak_kb": round(peak / 1024, 1),
+            "queries_per_call": round(len(queries) / len(users), 2),
+        }
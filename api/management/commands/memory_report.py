@@ -0,0 +1,65 @@
+import gc
+import json
+import tracemalloc
+from django.core.management.base import BaseCommand
+from api.benchmark import synthetic_recipe_frame
+from api.models import Course, Cuisine
+from api.recipe_index import RecipeIndex, recipe_features
+from api.utils import VectorizedPreprocess
+
+
+def traced_bytes(build):
+    """(result of build(), bytes still allocated by it once it returns)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def matrix_bytes(matrix, data_itemsize=None):
+    data = matrix.data.size * (data_itemsize or matrix.data.itemsize)
+    return data + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+class Command(BaseCommand):
+    help = "Compare the bytes per recipe of the recipe DataFrames with the compact RecipeCorpus/RecipeIndex"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        size = options['size']
+
+        def raw_frame():
+            df = synthetic_recipe_frame(size)
+            # The ORM hands every row its own Cuisine and Course instance
+            df["Cuisine"] = [Cuisine(name=c.name) for c in df["Cuisine"]]
+            df["Course"] = [Course(name=c.name) for c in df["Course"]]
+            return df
+
+        raw, raw_bytes = traced_bytes(raw_frame)
+        preprocessed, preprocessed_bytes = traced_bytes(lambda: VectorizedPreprocess().preprocess_recipes(raw.copy()))
+        features = recipe_features(preprocessed)
+        del raw
+        index, index_bytes = traced_bytes(lambda: RecipeIndex.from_features(features))
+
+        text = [index.matrix, index.profile_matrix, index.ingredient_postings]
+        report = {
+            "recipes": size,
+            "bytes_per_recipe": {
+                "raw_recipes_dataframe": round(raw_bytes / size, 1),
+                "preprocessed_dataframe": round(preprocessed_bytes / size, 1),
+                "recipe_index_total": round(index_bytes / size, 1),
+                "corpus_columns": round(index.corpus.nbytes / size, 1),
+                "text_matrices": round(sum(matrix_bytes(m) for m in text) / size, 1),
+                "text_matrices_if_float64": round(sum(matrix_bytes(m, 8) for m in text) / size, 1),
+                "scaled_numeric": round(index.scaled.nbytes / size, 1),
+                "id_lookup": round(index.positions.nbytes / size, 1),
+            },
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.artifacts import publish_index_artifact
+from api.recipe_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = ("Upload the recipe index as a versioned, checksummed artifact to RECIPE_INDEX_ARTIFACTS, "
+            "where the web instances pick it up")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Rebuild the index from the database first")
+        parser.add_argument('--keep', type=int, default=None, help="Artifacts kept in the storage")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_index()
+        try:
+            manifest = publish_index_artifact(keep=options['keep'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {manifest['name']} ({manifest['recipes']} recipes, sha256 {manifest['sha256']})."
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from api.models import Like, Recipe, SavedRecipe
+
+
+def count_of(model):
+    counts = model.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe').annotate(n=Count('pk'))
+    return Coalesce(Subquery(counts.values('n')), 0)
+
+
+class Command(BaseCommand):
+    help = "Recount Recipe.like_count and Recipe.save_count from the Like and SavedRecipe tables"
+
+    def handle(self, *args, **options):
+        # Counters drift when likes or saves are removed without going through
+        # the views, e.g. by deleting a user; only drifted rows are rewritten
+        drifted = list(
+            Recipe.objects
+            .annotate(likes_now=count_of(Like), saves_now=count_of(SavedRecipe))
+            .exclude(like_count=F('likes_now'), save_count=F('saves_now'))
+            .values_list('id', flat=True)
+        )
+        if drifted:
+            Recipe.objects.filter(id__in=drifted).update(like_count=count_of(Like), save_count=count_of(SavedRecipe))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled counters of {len(drifted)} recipes."))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTasteProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_version', models.CharField(max_length=32)),
+                ('vector', models.JSONField(default=dict)),
+                ('saved_count', models.PositiveIntegerField(default=0)),
+                ('total_time_sum', models.FloatField(default=0)),
+                ('difficulty_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='taste_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+from api.parsing import parse_difficulty, parse_first_int, parse_minutes
+
+
+def backfill_numeric_fields(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    NutritionalInformation = apps.get_model('api', 'NutritionalInformation')
+
+    recipes = []
+    for recipe in Recipe.objects.only('id', 'total_time', 'difficulty_level').iterator(chunk_size=1000):
+        recipe.total_minutes = parse_minutes(recipe.total_time)
+        recipe.difficulty_rank = parse_difficulty(recipe.difficulty_level)
+        recipes.append(recipe)
+    Recipe.objects.bulk_update(recipes, ['total_minutes', 'difficulty_rank'], batch_size=1000)
+
+    rows = []
+    for info in NutritionalInformation.objects.all().iterator(chunk_size=1000):
+        info.calories_kcal = parse_first_int(info.calories)
+        info.protein_g = parse_first_int(info.protein)
+        info.carbs_g = parse_first_int(info.carbs)
+        info.fat_g = parse_first_int(info.fat)
+        rows.append(info)
+    NutritionalInformation.objects.bulk_update(
+        rows, ['calories_kcal', 'protein_g', 'carbs_g', 'fat_g'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_userrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nutritionalinformation',
+            name='calories_kcal',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='nutritionalinformation',
+            name='carbs_g',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='nutritionalinformation',
+            name='fat_g',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='nutritionalinformation',
+            name='protein_g',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='difficulty_rank',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_minutes',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_numeric_fields, migrations.RunPython.noop),
+    ]
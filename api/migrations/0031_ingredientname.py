@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+from api.parsing import ingredient_pieces, normalize_ingredient_name
+
+
+def backfill_ingredient_names(apps, schema_editor):
+    Ingredient = apps.get_model('api', 'Ingredient')
+    IngredientName = apps.get_model('api', 'IngredientName')
+
+    names = set()
+    for text in Ingredient.objects.values_list('ingredient', flat=True).distinct().iterator(chunk_size=1000):
+        names.update(ingredient_pieces(text))
+    IngredientName.objects.bulk_create(
+        [IngredientName(name=name, normalized=normalize_ingredient_name(name)) for name in names],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_nutritionalinformation_calories_kcal_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('normalized', models.CharField(max_length=150)),
+            ],
+        ),
+        migrations.RunPython(backfill_ingredient_names, migrations.RunPython.noop),
+    ]
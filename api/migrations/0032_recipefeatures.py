@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_ingredientname'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeFeatures',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='api.recipe')),
+                ('description', models.TextField(blank=True)),
+                ('ingredients', models.TextField(blank=True)),
+                ('instructions', models.TextField(blank=True)),
+                ('equipment', models.TextField(blank=True)),
+                ('cuisine', models.CharField(blank=True, max_length=100)),
+                ('course', models.CharField(blank=True, max_length=100)),
+                ('dietary_restrictions', models.TextField(blank=True)),
+                ('total_minutes', models.PositiveIntegerField(blank=True, null=True)),
+                ('difficulty_rank', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('calories_kcal', models.PositiveIntegerField(blank=True, null=True)),
+                ('protein_g', models.PositiveIntegerField(blank=True, null=True)),
+                ('carbs_g', models.PositiveIntegerField(blank=True, null=True)),
+                ('fat_g', models.PositiveIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    Like = apps.get_model('api', 'Like')
+    SavedRecipe = apps.get_model('api', 'SavedRecipe')
+
+    def count_of(model):
+        counts = model.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe').annotate(n=Count('pk'))
+        return Coalesce(Subquery(counts.values('n')), 0)
+
+    Recipe.objects.update(like_count=count_of(Like), save_count=count_of(SavedRecipe))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_recipefeatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='like_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='save_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
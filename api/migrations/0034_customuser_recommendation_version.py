@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_recipe_like_count_save_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='recommendation_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
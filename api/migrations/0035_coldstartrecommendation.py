@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_customuser_recommendation_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColdStartRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('global', 'Global'), ('cuisine', 'Cuisine'), ('diet', 'Dietary restriction')], max_length=10)),
+                ('key', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cold_start_lists', to='api.recipe')),
+            ],
+            options={
+                'unique_together': {('kind', 'key', 'rank')},
+            },
+        ),
+    ]
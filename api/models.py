@@ -4,6 +4,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from cloudinary.models import CloudinaryField
+from .parsing import parse_minutes, parse_difficulty, parse_first_int, normalize_ingredient_name, ingredient_pieces
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, username, phone, password=None, **extra_fields):
@@ -35,12 +36,24 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     is_active = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
+    # Bumped whenever the user's saves, likes or preferences change; part of
+    # the key of their cached recommendations (api/result_cache.py)
+    recommendation_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = CustomUserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            # Never write back a version that may have been bumped since this
+            # instance was loaded
+            kwargs['update_fields'] = {
+                f.name for f in self._meta.concrete_fields if not f.primary_key
+            } - {'recommendation_version'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
     
@@ -100,9 +113,31 @@ class Recipe(models.Model):
     notes = models.TextField(blank=True, null=True)
     tags = models.ManyToManyField(Tag, related_name='recipes')
     major_ingredients = models.ManyToManyField(MajorIngredient, related_name="recipes", blank=True)
-    
-    def like_count(self):
-        return self.likes.count()
+
+    # Parsed from total_time / difficulty_level on save, for sorting and filtering in SQL
+    total_minutes = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    difficulty_rank = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True)
+
+    # Maintained with F() updates where likes and saves are written; see
+    # `manage.py reconcile_recipe_counters`
+    like_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+    save_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+
+    COUNTER_FIELDS = {'like_count', 'save_count'}
+
+    def save(self, *args, **kwargs):
+        self.total_minutes = parse_minutes(self.total_time)
+        self.difficulty_rank = parse_difficulty(self.difficulty_level)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'total_minutes', 'difficulty_rank'}
+        elif not self._state.adding and not kwargs.get('force_insert'):
+            # Never write back counters that may have changed since this
+            # instance was loaded
+            kwargs['update_fields'] = {
+                f.name for f in self._meta.concrete_fields if not f.primary_key
+            } - self.COUNTER_FIELDS
+        super().save(*args, **kwargs)
 
     def is_liked_by_user(self, user):
         if user.is_authenticated:
@@ -117,9 +152,37 @@ class Ingredient(models.Model):
     ingredient = models.CharField(max_length=100)
     quantity = models.CharField(max_length=50)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        IngredientName.record(ingredient_pieces(self.ingredient))
+
     def __str__(self):
         return f"{self.ingredient} - {self.quantity}"
 
+class IngredientName(models.Model):
+    # An ingredient name as written in Ingredient.ingredient (one comma
+    # separated piece of it) and its normalize_ingredient_name() form
+    name = models.CharField(max_length=100, unique=True)
+    normalized = models.CharField(max_length=150)
+
+    @classmethod
+    def record(cls, names):
+        cls.objects.bulk_create(
+            [cls(name=name, normalized=normalize_ingredient_name(name)) for name in set(names)],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def lookup(cls, names=None):
+        """{name: normalized} for every recorded name, or for those of `names` only."""
+        queryset = cls.objects.all()
+        if names is not None:
+            queryset = queryset.filter(name__in=set(names))
+        return dict(queryset.values_list('name', 'normalized'))
+
+    def __str__(self):
+        return f"{self.name} -> {self.normalized}"
+
 class Instruction(models.Model):
     recipe = models.ForeignKey(Recipe, related_name="instructions", on_delete=models.CASCADE)
     step = models.TextField()
@@ -134,6 +197,22 @@ class NutritionalInformation(models.Model):
     carbs = models.CharField(max_length=50)
     fat = models.CharField(max_length=50)
 
+    # Parsed from the text fields above on save
+    calories_kcal = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    protein_g = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    carbs_g = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    fat_g = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.calories_kcal = parse_first_int(self.calories)
+        self.protein_g = parse_first_int(self.protein)
+        self.carbs_g = parse_first_int(self.carbs)
+        self.fat_g = parse_first_int(self.fat)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'calories_kcal', 'protein_g', 'carbs_g', 'fat_g'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Calories: {self.calories}, Protein: {self.protein}"
 
@@ -193,6 +272,96 @@ class SavedRecipe(models.Model):
 
 
 
+class RecipeFeatures(models.Model):
+    # A recipe's preprocessed recommender inputs (see api/features.py), kept
+    # current by the signals in api/signals.py
+    recipe = models.OneToOneField(Recipe, primary_key=True, related_name="features", on_delete=models.CASCADE)
+    description = models.TextField(blank=True)
+    ingredients = models.TextField(blank=True)
+    instructions = models.TextField(blank=True)
+    equipment = models.TextField(blank=True)
+    cuisine = models.CharField(max_length=100, blank=True)
+    course = models.CharField(max_length=100, blank=True)
+    dietary_restrictions = models.TextField(blank=True)
+    total_minutes = models.PositiveIntegerField(null=True, blank=True)
+    difficulty_rank = models.PositiveSmallIntegerField(null=True, blank=True)
+    calories_kcal = models.PositiveIntegerField(null=True, blank=True)
+    protein_g = models.PositiveIntegerField(null=True, blank=True)
+    carbs_g = models.PositiveIntegerField(null=True, blank=True)
+    fat_g = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Features of recipe {self.recipe_id}"
+
+
+
+class UserTasteProfile(models.Model):
+    user = models.OneToOneField(CustomUser, related_name="taste_profile", on_delete=models.CASCADE)
+    # Version of the recipe index the vector columns refer to
+    index_version = models.CharField(max_length=32)
+    # Sum of the saved recipes' profile vectors, stored sparse as {"indices": [...], "values": [...]}
+    vector = models.JSONField(default=dict)
+    saved_count = models.PositiveIntegerField(default=0)
+    total_time_sum = models.FloatField(default=0)
+    difficulty_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Taste profile for {self.user.username}"
+
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(Recipe, related_name="similar_recipes", on_delete=models.CASCADE)
+    neighbour = models.ForeignKey(Recipe, related_name="neighbour_of", on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('recipe', 'rank')  # Also the index used to read a recipe's neighbours in order
+
+    def __str__(self):
+        return f"{self.recipe_id} -> {self.neighbour_id} (#{self.rank})"
+
+
+
+class UserRecommendation(models.Model):
+    user = models.ForeignKey(CustomUser, related_name="recommendations", on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, related_name="recommended_to", on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'rank')
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.recipe_id} (#{self.rank})"
+
+
+
+class ColdStartRecommendation(models.Model):
+    # Most popular recipes overall and per cuisine and dietary restriction,
+    # served to users with no saved recipes (see api/precompute.py)
+    GLOBAL = "global"
+    CUISINE = "cuisine"
+    DIETARY_RESTRICTION = "diet"
+    KINDS = [(GLOBAL, "Global"), (CUISINE, "Cuisine"), (DIETARY_RESTRICTION, "Dietary restriction")]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    key = models.PositiveIntegerField(default=0)  # Cuisine or DietaryRestriction id, 0 for the global list
+    recipe = models.ForeignKey(Recipe, related_name="cold_start_lists", on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('kind', 'key', 'rank')  # Also the index used to read a list in order
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} -> {self.recipe_id} (#{self.rank})"
+
+
+
 class ProfileImage(models.Model):
     image = models.ImageField(upload_to='profile_images/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,55 @@
+import re
+from functools import lru_cache
+import inflect
+from django.conf import settings
+
+
+# Free-text recipe fields to numbers and canonical names. No model imports, so
+# migrations can use these.
+
+NUMBER_RE = re.compile(r"\d+")
+PARENTHESES_RE = re.compile(r"\([^)]*\)")
+
+DIFFICULTY_RANKS = {"Medium": 2, "Hard": 3}
+
+
+def parse_minutes(text):
+    """"1 hour 10 minutes" -> 70, "2 hours" -> 120, "45 minutes" -> 45; None without a number."""
+    numbers = NUMBER_RE.findall(text or "")
+    if not numbers:
+        return None
+    if "hour" in text and "minute" in text:
+        return int(numbers[0]) * 60 + (int(numbers[1]) if len(numbers) > 1 else 0)
+    if "hour" in text:
+        return int(numbers[0]) * 60
+    return int(numbers[0])
+
+
+def parse_difficulty(text):
+    """"Easy" (or anything else) -> 1, "Medium" -> 2, "Hard" -> 3."""
+    return DIFFICULTY_RANKS.get(text, 1)
+
+
+def parse_first_int(text):
+    """"250 kcal" -> 250, "12g" -> 12; None without a number."""
+    match = NUMBER_RE.search(text or "")
+    return int(match.group()) if match else None
+
+
+_inflect = inflect.engine()
+
+
+@lru_cache(maxsize=settings.INGREDIENT_NAME_CACHE_SIZE)
+def normalize_ingredient_name(name):
+    """" Chopped Tomatoes" -> "chopped tomato". Memoised: the same names come up on every request."""
+    words = name.strip().lower().split()
+
+    # Only singularize last word (usually the noun)
+    if words:
+        words[-1] = _inflect.singular_noun(words[-1]) or words[-1]
+    return " ".join(words)
+
+
+def ingredient_pieces(text):
+    """The comma separated names in an ingredient string, with parenthesised notes dropped."""
+    return PARENTHESES_RE.sub("", text or "").split(",")
@@ -0,0 +1,272 @@
+import numpy as np
+import scipy.sparse as sp
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from sklearn.preprocessing import normalize
+from .candidates import preference_ids
+from .models import ColdStartRecommendation, Recipe, SavedRecipe, SimilarRecipe, UserPreference, UserRecommendation
+from .recipe_index import get_recipe_index
+
+
+def build_similar_recipes(recipe_ids=None, top_n=None, min_similarity=0.3, chunk_size=256):
+    """
+    Fill the SimilarRecipe table from the recipe index, scoring `chunk_size`
+    recipes against the catalog per matrix product. With recipe_ids only those
+    recipes' rows are recomputed. Returns the number of rows written.
+    """
+    index = get_recipe_index()
+    if index is None:
+        return 0
+    top_n = top_n or settings.SIMILAR_RECIPES_TOP_K
+
+    if recipe_ids is None:
+        positions = list(range(len(index)))
+    else:
+        positions = index.positions_of(recipe_ids).tolist()
+
+    written = 0
+    for start in range(0, len(positions), chunk_size):
+        chunk = positions[start:start + chunk_size]
+        rows = []
+        for pos, (best, scores) in zip(chunk, index.neighbours(chunk, top_n, min_similarity)):
+            for rank, (neighbour, score) in enumerate(zip(best, scores)):
+                rows.append(SimilarRecipe(
+                    recipe_id=int(index.ids[pos]),
+                    neighbour_id=int(index.ids[neighbour]),
+                    score=float(score),
+                    rank=rank,
+                ))
+
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=index.ids[chunk].tolist()).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+        written += len(rows)
+    return written
+
+
+def stale_similar_recipe_ids():
+    """Recipes without precomputed neighbours (new, edited, or never built)."""
+    return list(Recipe.objects.filter(similar_recipes__isnull=True).values_list('id', flat=True))
+
+
+def precomputed_similar_recipes(recipe_id, top_n):
+    """
+    Return the ids of the stored neighbours of a recipe in rank order, or None
+    if they have to be computed live.
+    """
+    if top_n > settings.SIMILAR_RECIPES_TOP_K:
+        return None
+    recipe_ids = list(SimilarRecipe.objects.filter(recipe_id=recipe_id).order_by('rank').values_list(
+        'neighbour_id', flat=True
+    )[:top_n])
+    return recipe_ids or None
+
+
+def saved_recipe_matrix(index, user_ids=None):
+    """
+    Sparse users x recipes matrix of SavedRecipe rows, in index row order.
+    Returns (user_ids, matrix); recipes missing from the index are skipped.
+    """
+    saved = SavedRecipe.objects.all()
+    if user_ids is not None:
+        saved = saved.filter(user_id__in=user_ids)
+    pairs = np.asarray(list(saved.values_list('user_id', 'recipe_id')), dtype=np.int64).reshape(-1, 2)
+    positions = index.positions.lookup(pairs[:, 1])
+    pairs, positions = pairs[positions >= 0], positions[positions >= 0]
+
+    users, rows = np.unique(pairs[:, 0], return_inverse=True)
+    matrix = sp.csr_matrix(
+        (np.ones(len(pairs)), (rows, positions)),
+        shape=(len(users), len(index)),
+    )
+    return users.tolist(), matrix
+
+
+def recipe_preference_columns(index):
+    """
+    (cuisine id of each index row, -1 if none; (index rows, dietary
+    restriction ids) of the recipes' restrictions), read in two queries.
+    """
+    pairs = np.asarray([
+        (recipe_id, -1 if cuisine_id is None else cuisine_id)
+        for recipe_id, cuisine_id in Recipe.objects.values_list('id', 'cuisine_id')
+    ], dtype=np.int64).reshape(-1, 2)
+    positions = index.positions.lookup(pairs[:, 0])
+    cuisines = np.full(len(index), -1, dtype=np.int64)
+    cuisines[positions[positions >= 0]] = pairs[positions >= 0, 1]
+
+    pairs = np.asarray(list(Recipe.dietary_restrictions.through.objects.values_list(
+        'recipe_id', 'dietaryrestriction_id'
+    )), dtype=np.int64).reshape(-1, 2)
+    positions = index.positions.lookup(pairs[:, 0])
+    return cuisines, (positions[positions >= 0], pairs[positions >= 0, 1])
+
+
+def preference_masks(index, user_ids, columns=None):
+    """
+    {user_id: boolean mask over the index rows} of the recipes satisfying each
+    user's preferences, for the users that set any (the rules of
+    preference_candidates). Every user's preferences come from one query;
+    `columns` is recipe_preference_columns(index), read here if not given.
+    """
+    restrictions, cuisines = defaultdict(set), defaultdict(set)
+    for user_id, restriction_id, cuisine_id in UserPreference.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'dietary_restrictions', 'preferred_cuisines'
+    ):
+        if restriction_id is not None:
+            restrictions[user_id].add(restriction_id)
+        if cuisine_id is not None:
+            cuisines[user_id].add(cuisine_id)
+
+    recipe_cuisines, (restriction_rows, restriction_ids) = columns or recipe_preference_columns(index)
+    masks = {}
+    for user_id in restrictions.keys() | cuisines.keys():
+        mask = np.ones(len(index), dtype=bool)
+        if restrictions[user_id]:
+            matching = np.zeros(len(index), dtype=bool)
+            matching[restriction_rows[np.isin(restriction_ids, list(restrictions[user_id]))]] = True
+            mask &= matching
+        if cuisines[user_id]:
+            mask &= np.isin(recipe_cuisines, list(cuisines[user_id]))
+        masks[user_id] = mask
+    return masks
+
+
+def build_user_recommendations(user_ids=None, top_n=None, min_similarity=0.3, chunk_size=512):
+    """
+    Fill the UserRecommendation table for every user with saved recipes.
+
+    Each user's profile is the sum of their saved recipes' profile vectors (the
+    same direction as the mean start() uses), and `chunk_size` users are scored
+    per matrix product. Saved recipes are excluded, and ties on similarity are
+    broken by difficulty and then total time distance, as in start(), and
+    recipes outside a user's preferences are left out.
+    Returns the number of rows written.
+    """
+    index = get_recipe_index()
+    if index is None:
+        return 0
+    top_n = top_n or settings.USER_RECOMMENDATIONS_TOP_K
+
+    users, saved = saved_recipe_matrix(index, user_ids)
+    counts = np.asarray(saved.sum(axis=1)).ravel()
+    profiles = normalize(saved @ index.profile_matrix)
+    avg_time = (saved @ index.corpus.total_time.astype(np.float64)) / counts
+    avg_difficulty = (saved @ index.corpus.difficulty.astype(np.float64)) / counts
+
+    columns = recipe_preference_columns(index)
+    written = 0
+    for start in range(0, len(users), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        similarity = (profiles[chunk] @ index.profile_matrix.T).toarray()
+        saved_chunk = saved[chunk]
+        allowed = preference_masks(index, users[chunk], columns)
+
+        rows = []
+        for row, user_id in enumerate(users[chunk]):
+            user_row = start + row
+            mask = similarity[row] >= min_similarity
+            mask[saved_chunk[row].indices] = False
+            if user_id in allowed:
+                mask &= allowed[user_id]
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > top_n:
+                # Keep everything tied with the top_n-th similarity so the
+                # tie-breakers below see the full tie
+                cutoff = np.partition(similarity[row][candidates], -top_n)[-top_n]
+                candidates = candidates[similarity[row][candidates] >= cutoff]
+
+            sims = similarity[row][candidates]
+            time_distance = np.abs(index.corpus.total_time[candidates] - avg_time[user_row])
+            difficulty_distance = np.abs(index.corpus.difficulty[candidates] - avg_difficulty[user_row])
+            order = np.lexsort((time_distance, difficulty_distance, -sims))[:top_n]
+
+            for rank, pos in enumerate(order):
+                rows.append(UserRecommendation(
+                    user_id=user_id,
+                    recipe_id=int(index.ids[candidates[pos]]),
+                    score=float(sims[pos]),
+                    rank=rank,
+                ))
+
+        with transaction.atomic():
+            UserRecommendation.objects.filter(user_id__in=users[chunk]).delete()
+            UserRecommendation.objects.bulk_create(rows)
+        written += len(rows)
+
+    if user_ids is None:
+        # Users who no longer have saved recipes
+        UserRecommendation.objects.filter(user__saved_recipes__isnull=True).delete()
+    return written
+
+
+def precomputed_recommendations(user):
+    """Ids of the user's stored recommendations in rank order, or None."""
+    recipe_ids = list(
+        UserRecommendation.objects.filter(user=user).order_by('rank').values_list('recipe_id', flat=True)
+    )
+    return recipe_ids or None
+
+
+def build_cold_start_lists(top_n=None):
+    """
+    Fill the ColdStartRecommendation table with the top_n most popular recipes
+    (likes plus saves, ties by id) overall, per cuisine and per dietary
+    restriction. Returns the number of rows written.
+    """
+    top_n = top_n or settings.COLD_START_TOP_K
+    recipes = Recipe.objects.annotate(popularity=F('like_count') + F('save_count')).order_by('-popularity', 'id')
+    restrictions = defaultdict(list)
+    for recipe_id, restriction_id in Recipe.dietary_restrictions.through.objects.values_list(
+        'recipe_id', 'dietaryrestriction_id'
+    ):
+        restrictions[recipe_id].append(restriction_id)
+
+    lists = defaultdict(list)
+    for recipe_id, cuisine_id, popularity in recipes.values_list('id', 'cuisine_id', 'popularity'):
+        keys = [(ColdStartRecommendation.GLOBAL, 0)]
+        if cuisine_id is not None:
+            keys.append((ColdStartRecommendation.CUISINE, cuisine_id))
+        keys += [(ColdStartRecommendation.DIETARY_RESTRICTION, rid) for rid in restrictions[recipe_id]]
+        for key in keys:
+            if len(lists[key]) < top_n:
+                lists[key].append((recipe_id, popularity))
+
+    rows = [
+        ColdStartRecommendation(kind=kind, key=key, recipe_id=recipe_id, score=float(popularity), rank=rank)
+        for (kind, key), ranked in lists.items()
+        for rank, (recipe_id, popularity) in enumerate(ranked)
+    ]
+    with transaction.atomic():
+        ColdStartRecommendation.objects.all().delete()
+        ColdStartRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def cold_start_recommendations(user, top_n=None):
+    """
+    Ids of the most popular recipes for a user with no saved recipes, read
+    from the stored lists: the lists of their dietary restrictions narrowed to
+    their cuisines, else those of their cuisines, else the global list.
+    Returns None if the lists have not been built.
+    """
+    top_n = top_n or settings.COLD_START_TOP_K
+    restriction_ids, cuisine_ids = preference_ids(user)
+    if restriction_ids:
+        rows = ColdStartRecommendation.objects.filter(
+            kind=ColdStartRecommendation.DIETARY_RESTRICTION, key__in=restriction_ids
+        )
+        if cuisine_ids:
+            rows = rows.filter(recipe__cuisine_id__in=cuisine_ids)
+    elif cuisine_ids:
+        rows = ColdStartRecommendation.objects.filter(kind=ColdStartRecommendation.CUISINE, key__in=cuisine_ids)
+    else:
+        rows = ColdStartRecommendation.objects.filter(kind=ColdStartRecommendation.GLOBAL)
+
+    # A recipe can be on several of the user's lists
+    recipe_ids = list(dict.fromkeys(rows.order_by('-score', 'recipe_id').values_list('recipe_id', flat=True)))
+    if not recipe_ids and not ColdStartRecommendation.objects.filter(kind=ColdStartRecommendation.GLOBAL).exists():
+        return None
+    return recipe_ids[:top_n]
@@ -0,0 +1,628 @@
+import copy
+import datetime
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from .ann import LSHIndex
+from .corpus import RecipeCorpus, RecipePositions
+from .embeddings import Embeddings
+from .hashing import HashingTfidfVectorizer
+from .features import load_recipe_features
+from .locks import file_lock
+from .models import RecipeFeatures, SimilarRecipe
+
+
+# Order of the columns in RecipeIndex.numeric / RecipeIndex.scaled
+NUMERIC_FIELDS = ["Total_time", "calories", "protein", "carbs", "fat"]
+
+SIMILARITY_WEIGHT = 0.7
+NUMERIC_WEIGHT = 0.1
+
+
+def combine_fields(row):
+    return " ".join([
+        row["Description"],
+        " ".join(row["Ingredients"]),
+        " ".join(row["Ingredients"]),
+        row["Cuisine"],
+        row["Dietary Restrictions"],
+        " ".join(row["Instructions"]),
+        " ".join(row["Equipment"]),
+        " ".join(row["Course"]),
+        " ".join(row["Course"])
+    ])
+
+
+def combined_text(df):
+    """combine_fields for a whole DataFrame at once."""
+    # Series.str.join on a string joins its characters, like " ".join(str)
+    ingredients = df["Ingredients"].str.join(" ")
+    course = df["Course"].str.join(" ")
+    return (
+        df["Description"] + " " + ingredients + " " + ingredients + " " +
+        df["Cuisine"] + " " + df["Dietary Restrictions"] + " " +
+        df["Instructions"].str.join(" ") + " " + df["Equipment"].str.join(" ") + " " +
+        course + " " + course
+    )
+
+
+def profile_text(df):
+    # Same text start() builds for user profiles
+    return (
+        df['Ingredients'].astype(str) + ' ' +
+        df['Ingredients'].astype(str) + ' ' +
+        df['Dietary Restrictions'].astype(str) + ' ' +
+        df['Dietary Restrictions'].astype(str) + ' ' +
+        df['Cuisine'].astype(str)
+    )
+
+
+def recipe_features(df):
+    """Text and per-recipe column inputs of the index for a preprocessed recipe DataFrame."""
+    return {
+        "text": combined_text(df).tolist(),
+        "profile_text": profile_text(df).tolist(),
+        "ingredients": df["Ingredients"].tolist(),
+        "corpus": RecipeCorpus.from_frame(df),
+    }
+
+
+def top_k(candidates, scores, k):
+    """Return the candidates with the k highest scores, best first."""
+    if k <= 0 or len(candidates) == 0:
+        return candidates[:0], scores[:0]
+    if len(candidates) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        candidates, scores = candidates[part], scores[part]
+    order = np.argsort(-scores, kind="stable")
+    return candidates[order], scores[order]
+
+
+def _update_rows(vectorizer, matrix, keep, texts):
+    """(vectorizer, matrix) after dropping the rows not in `keep` and appending the rows of `texts`."""
+    if isinstance(vectorizer, HashingTfidfVectorizer):
+        # Document frequencies change; leave the served index's vectorizer alone
+        vectorizer = copy.deepcopy(vectorizer)
+        return vectorizer, vectorizer.update(matrix[keep], matrix[~keep], texts)
+    rows = matrix[keep]
+    if texts:
+        rows = sp.vstack([rows, vectorizer.transform(texts)], format="csr")
+    return vectorizer, rows
+
+
+class RecipeIndex:
+    """
+    float32 TF-IDF matrices over a RecipeCorpus, plus its min-max scaled
+    time/nutrition features.
+
+    `matrix` is the similar-recipe text (combine_fields) and `profile_matrix`
+    the user-profile text used by start(). Rows of both are L2 normalised by
+    the vectorizers, so a dot product between two rows is their cosine
+    similarity. `version` changes whenever rows change (refit or update()),
+    since stored taste profiles are sums of rows.
+
+    With RECIPE_INDEX_VECTORIZER = "hashing" the three spaces use
+    HashingTfidfVectorizer instead: update() then only rescales existing
+    rows, so the index never needs refitting.
+
+    `embeddings` holds dense LSA vectors (Embeddings) of `matrix` and
+    `profile_matrix`, the search="dense" backend, fitted with the vectorizers
+    and extended by projecting new rows on the existing components.
+
+    `ingredient_postings` is the TF-IDF matrix of the normalised ingredient
+    names in CSC form: column j lists the recipes containing term j with their
+    weights, i.e. an inverted index from ingredient terms to posting lists.
+    """
+
+    FORMAT_VERSION = 6
+    EMBEDDED = ["matrix", "profile_matrix"]
+
+    def __init__(self, corpus, vectorizer, matrix, profile_vectorizer, profile_matrix,
+                 ingredient_vectorizer, ingredient_matrix):
+        self.format_version = self.FORMAT_VERSION
+        self.version = uuid.uuid4().hex
+        self.corpus = corpus
+        self.vectorizer = vectorizer
+        self.matrix = sp.csr_matrix(matrix, dtype=np.float32)
+        self.profile_vectorizer = profile_vectorizer
+        self.profile_matrix = sp.csr_matrix(profile_matrix, dtype=np.float32)
+        self.ingredient_vectorizer = ingredient_vectorizer
+        self.ingredient_postings = sp.csc_matrix(ingredient_matrix, dtype=np.float32)
+        self.embeddings = {}
+        self.pending_updates = 0
+        self._reindex()
+
+    @property
+    def ids(self):
+        return self.corpus.ids
+
+    def _reindex(self):
+        self._ann = {}
+        self.positions = RecipePositions(self.ids)
+        numeric = self.corpus.numeric
+        if len(numeric):
+            mins = numeric.min(axis=0)
+            span = numeric.max(axis=0) - mins
+        else:
+            mins = np.zeros(len(NUMERIC_FIELDS), dtype=np.float32)
+            span = np.ones(len(NUMERIC_FIELDS), dtype=np.float32)
+        # Same zero-range handling as MinMaxScaler
+        span[span == 0] = 1.0
+        self.scaled = (numeric - mins) / span
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls):
+        df = load_recipe_features()
+        if df.empty:
+            return None
+        return cls.from_features(recipe_features(df))
+
+    @property
+    def mode(self):
+        return "hashing" if isinstance(self.vectorizer, HashingTfidfVectorizer) else "tfidf"
+
+    @classmethod
+    def from_features(cls, features, mode=None):
+        """Fit the vectorizers ("tfidf" or "hashing", default RECIPE_INDEX_VECTORIZER) on recipe_features() output."""
+        mode = mode or settings.RECIPE_INDEX_VECTORIZER
+        if mode == "hashing":
+            n_features = settings.RECIPE_INDEX_HASH_FEATURES
+            vectorizer = HashingTfidfVectorizer(n_features)
+            profile_vectorizer = HashingTfidfVectorizer(n_features, stop_words='english')
+            ingredient_vectorizer = HashingTfidfVectorizer(n_features)
+        elif mode == "tfidf":
+            vectorizer = TfidfVectorizer(dtype=np.float32)
+            profile_vectorizer = TfidfVectorizer(stop_words='english', dtype=np.float32)
+            ingredient_vectorizer = TfidfVectorizer(dtype=np.float32)
+        else:
+            raise ValueError(f"Unknown recipe index vectorizer: {mode}")
+        index = cls(
+            features["corpus"],
+            vectorizer, vectorizer.fit_transform(features["text"]),
+            profile_vectorizer, profile_vectorizer.fit_transform(features["profile_text"]),
+            ingredient_vectorizer, ingredient_vectorizer.fit_transform(features["ingredients"]),
+        )
+        index.fit_embeddings()
+        return index
+
+    def fit_embeddings(self, dimensions=None, dtype=None):
+        """(Re)fit the dense embeddings; defaults from RECOMMENDER_EMBEDDINGS, 0 dimensions drops them."""
+        options = settings.RECOMMENDER_EMBEDDINGS
+        dimensions = options['DIMENSIONS'] if dimensions is None else dimensions
+        dtype = dtype or options['DTYPE']
+        self.embeddings = {}
+        if dimensions:
+            for space in self.EMBEDDED:
+                embeddings = Embeddings.fit(getattr(self, space), dimensions, dtype)
+                if embeddings is not None:
+                    self.embeddings[space] = embeddings
+
+    def _fetch_rows(self, recipe_ids):
+        df = load_recipe_features(recipe_ids)
+        if df.empty:
+            return None
+        return recipe_features(df)
+
+    def update(self, recipe_ids):
+        """
+        Replace the rows of the given recipes (appending new ones and dropping
+        deleted ones) using the existing vocabulary, without refitting.
+        Returns False if none of the recipes are in the index or the database.
+        """
+        recipe_ids = [int(rid) for rid in recipe_ids]
+        features = self._fetch_rows(recipe_ids)
+
+        keep = ~np.isin(self.ids, recipe_ids)
+        if features is None and keep.all():
+            return False
+
+        corpus = self.corpus.take(keep)
+        if features is not None:
+            corpus = RecipeCorpus.concat([corpus, features["corpus"]])
+        else:
+            features = {"text": [], "profile_text": [], "ingredients": []}
+        self.vectorizer, matrix = _update_rows(self.vectorizer, self.matrix, keep, features["text"])
+        self.profile_vectorizer, profile_matrix = _update_rows(
+            self.profile_vectorizer, self.profile_matrix, keep, features["profile_text"]
+        )
+        self.ingredient_vectorizer, ingredient_matrix = _update_rows(
+            self.ingredient_vectorizer, self.ingredient_postings.tocsr(), keep, features["ingredients"]
+        )
+
+        self.corpus, self.matrix, self.profile_matrix = corpus, matrix, profile_matrix
+        self.ingredient_postings = sp.csc_matrix(ingredient_matrix)
+        # Hashing rescales every row, so then all of them are projected again
+        kept = keep if self.mode == "tfidf" else np.zeros_like(keep)
+        self.embeddings = {
+            space: embeddings.replace_rows(kept, getattr(self, space)[int(kept.sum()):])
+            for space, embeddings in self.embeddings.items()
+        }
+        # Stored taste profiles are sums of the old rows; a new version makes
+        # them rebuild from the current ones
+        self.version = uuid.uuid4().hex
+        self.pending_updates += len(recipe_ids)
+        self._reindex()
+        return True
+
+    def needs_rebuild(self):
+        if self.mode == "hashing":
+            return False
+        # Words that first appear in updated recipes are not in the vocabulary
+        # until the vectorizer is refit, so rebuild once enough rows changed.
+        return self.pending_updates > max(1, len(self) * settings.RECIPE_INDEX_REBUILD_RATIO)
+
+    def positions_of(self, recipe_ids):
+        """Sorted index rows of the given recipe ids; ids missing from the index are skipped."""
+        rows = self.positions.lookup(np.fromiter(recipe_ids, dtype=np.int64))
+        return np.sort(rows[rows >= 0])
+
+    def score(self, positions, candidates=None, dense=False):
+        """
+        Score the recipes at `positions` against `candidates` (default: the
+        whole catalog) with the weighting used by recommend_similar_recipes.
+        With dense=True the text similarity comes from the embeddings.
+
+        Returns (similarity, score), both of shape (len(positions), len(candidates)).
+        """
+        scaled = self.scaled if candidates is None else self.scaled[candidates]
+        if dense:
+            embeddings = self.embeddings["matrix"]
+            similarity = embeddings.similarity(embeddings.decode(positions), candidates)
+        else:
+            matrix = self.matrix if candidates is None else self.matrix[candidates]
+            similarity = (self.matrix[positions] @ matrix.T).toarray()
+        base = self.scaled[positions]
+        score = similarity * SIMILARITY_WEIGHT
+        for col in range(len(NUMERIC_FIELDS)):
+            score += (1 - np.abs(scaled[:, col][None, :] - base[:, col][:, None])) * NUMERIC_WEIGHT
+        return similarity, score
+
+    def ann(self, space):
+        """
+        LSH index over `space` ("matrix" or "profile_matrix"), built on first
+        use and dropped whenever rows change.
+        """
+        if space not in self._ann:
+            options = settings.RECOMMENDER_ANN
+            self._ann[space] = LSHIndex(getattr(self, space), n_tables=options['TABLES'], n_bits=options['BITS'])
+        return self._ann[space]
+
+    def neighbours(self, positions, top_n=5, min_similarity=0.3, search="exact"):
+        """
+        Return a (positions, scores) pair of the top_n neighbours for each of
+        `positions`, skipping the recipe itself and anything below min_similarity.
+        With search="ann" only the recipes sharing an LSH bucket are scored,
+        and with search="dense" similarity is measured on the embeddings
+        (exact search if they are disabled).
+        """
+        if search == "dense" and "matrix" in self.embeddings:
+            return self._neighbours(positions, top_n, min_similarity, dense=True)
+        if search == "ann":
+            lsh = self.ann("matrix")
+            probes = settings.RECOMMENDER_ANN['PROBES']
+            return [
+                self._neighbours([pos], top_n, min_similarity, lsh.query(self.matrix[pos], probes))[0]
+                for pos in positions
+            ]
+        return self._neighbours(positions, top_n, min_similarity)
+
+    def _neighbours(self, positions, top_n, min_similarity, candidates=None, dense=False):
+        similarity, score = self.score(positions, candidates, dense=dense)
+        if candidates is None:
+            candidates = np.arange(len(self))
+        results = []
+        for row, pos in enumerate(positions):
+            mask = (similarity[row] >= min_similarity) & (candidates != pos)
+            results.append(top_k(candidates[mask], score[row][mask], top_n))
+        return results
+
+    def match_ingredients(self, text, limit=20, offset=0):
+        """
+        Cosine similarity of a pantry query against every recipe's ingredients,
+        accumulated over the posting lists of the query's terms only. Returns
+        (ids, scores) of the results ranked offset .. offset + limit.
+        """
+        query = self.ingredient_vectorizer.transform([text])
+        postings = self.ingredient_postings
+        rows, weights = [], []
+        for term, query_weight in zip(query.indices, query.data):
+            start, end = postings.indptr[term], postings.indptr[term + 1]
+            rows.append(postings.indices[start:end])
+            weights.append(postings.data[start:end] * query_weight)
+        if not rows:
+            return self.ids[:0], np.zeros(0)
+
+        candidates, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        best, best_scores = top_k(candidates, scores, offset + limit)
+        return self.ids[best[offset:]], best_scores[offset:]
+
+    MATRICES = ["matrix", "profile_matrix", "ingredient_postings"]
+
+    def save(self, directory):
+        """
+        Write the index to `directory`: every array as its own .npy file (so
+        load() can memory-map it) and the vectorizers and small metadata with
+        joblib.
+        """
+        os.makedirs(directory)
+        arrays = {f"corpus_{name}": array for name, array in self.corpus.arrays().items()}
+        arrays["scaled"] = self.scaled
+        arrays["positions_order"] = self.positions.order
+        arrays["positions_sorted_ids"] = self.positions.sorted_ids
+        for name in self.MATRICES:
+            matrix = getattr(self, name)
+            # Loaded matrices are read-only, so scipy must never need to sort them in place
+            matrix.sort_indices()
+            arrays[f"{name}_data"] = matrix.data
+            arrays[f"{name}_indices"] = matrix.indices
+            arrays[f"{name}_indptr"] = matrix.indptr
+        for space, embeddings in self.embeddings.items():
+            arrays[f"{space}_svd_components"] = embeddings.components
+            arrays[f"{space}_svd_vectors"] = embeddings.vectors
+            if embeddings.scales is not None:
+                arrays[f"{space}_svd_scales"] = embeddings.scales
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+        joblib.dump({
+            "format_version": self.format_version,
+            "version": self.version,
+            "pending_updates": self.pending_updates,
+            "vectorizer": self.vectorizer,
+            "profile_vectorizer": self.profile_vectorizer,
+            "ingredient_vectorizer": self.ingredient_vectorizer,
+            "cuisines": self.corpus.cuisines,
+            "courses": self.corpus.courses,
+            "shapes": {name: getattr(self, name).shape for name in self.MATRICES},
+            "embeddings": {space: embeddings.scales is not None for space, embeddings in self.embeddings.items()},
+        }, os.path.join(directory, "meta.joblib"))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        Open an index written by save(). With mmap_mode="r" the arrays stay in
+        the files and are paged in on demand, so every process that opens the
+        same directory shares one copy through the page cache. Returns None if
+        it was written by an older release.
+        """
+        meta = joblib.load(os.path.join(directory, "meta.joblib"))
+        if meta["format_version"] != cls.FORMAT_VERSION:
+            return None
+
+        def array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        index = cls.__new__(cls)
+        index.format_version = meta["format_version"]
+        index.version = meta["version"]
+        index.pending_updates = meta["pending_updates"]
+        index.vectorizer = meta["vectorizer"]
+        index.profile_vectorizer = meta["profile_vectorizer"]
+        index.ingredient_vectorizer = meta["ingredient_vectorizer"]
+        index.corpus = RecipeCorpus.from_arrays(
+            {name: array(f"corpus_{name}") for name in RecipeCorpus.ARRAYS}, meta["cuisines"], meta["courses"]
+        )
+        index.scaled = array("scaled")
+        index.positions = RecipePositions.from_arrays(array("positions_order"), array("positions_sorted_ids"))
+        for name, matrix_type in zip(cls.MATRICES, [sp.csr_matrix, sp.csr_matrix, sp.csc_matrix]):
+            parts = (array(f"{name}_data"), array(f"{name}_indices"), array(f"{name}_indptr"))
+            setattr(index, name, matrix_type(parts, shape=meta["shapes"][name], copy=False))
+        index.embeddings = {
+            space: Embeddings(
+                array(f"{space}_svd_components"), array(f"{space}_svd_vectors"),
+                array(f"{space}_svd_scales") if quantized else None,
+            )
+            for space, quantized in meta["embeddings"].items()
+        }
+        index._ann = {}
+        return index
+
+    def similar(self, recipe_id, top_n=5, min_similarity=0.3, search="exact"):
+        """Return (ids, scores) of the top_n recipes most similar to recipe_id."""
+        pos = self.positions.get(int(recipe_id))
+        if pos is None:
+            return self.ids[:0], np.zeros(0)
+        best, best_scores = self.neighbours([pos], top_n, min_similarity, search)[0]
+        return self.ids[best], best_scores
+
+
+_lock = threading.RLock()
+_loaded = {"index": None, "name": None}
+
+# Saved indexes kept on disk: the current one and the one before it, which
+# other workers may still be opening
+KEEP_SAVED = 2
+# Recipe writes this long before a background rebuild started are applied to
+# it again, for transactions that were still open when it read the catalog
+REBUILD_OVERLAP = datetime.timedelta(minutes=5)
+
+
+@contextmanager
+def _writing():
+    # Read-modify-write of the saved index: this process's lock first, then
+    # the lock file shared with every other worker
+    with _lock, file_lock("index"):
+        yield
+
+
+def current_path():
+    """File naming the directory of the current index under RECIPE_INDEX_DIR."""
+    return os.path.join(settings.RECIPE_INDEX_DIR, "CURRENT")
+
+
+def saved_index_name():
+    """Directory name of the current saved index; changes with every save_index(), in any process."""
+    try:
+        with open(current_path()) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _remove_old_indexes(current):
+    root = settings.RECIPE_INDEX_DIR
+    saved = sorted(
+        (entry for entry in os.scandir(root) if entry.is_dir() and entry.name.startswith("index-")),
+        key=lambda entry: entry.stat().st_mtime_ns,
+    )
+    for entry in saved[:-KEEP_SAVED]:
+        if entry.name != current:
+            # Processes that mapped these files keep them until they unmap
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def point_current(name):
+    """Make the complete index directory `name` under RECIPE_INDEX_DIR the current one."""
+    tmp_path = f"{current_path()}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    # Atomic on POSIX, so other workers switch to the new directory only once
+    # it is complete
+    os.replace(tmp_path, current_path())
+    _remove_old_indexes(name)
+
+
+def save_index(index):
+    root = settings.RECIPE_INDEX_DIR
+    os.makedirs(root, exist_ok=True)
+    name = f"index-{index.version}-{uuid.uuid4().hex[:8]}"
+    index.save(os.path.join(root, name))
+    point_current(name)
+    _loaded["index"] = index
+    _loaded["name"] = name
+
+
+def rebuild_index():
+    with _writing():
+        index = RecipeIndex.build()
+        if index is not None:
+            save_index(index)
+        return index
+
+
+_rebuilding = threading.Event()
+
+
+def schedule_rebuild():
+    """Refit the index in a background thread, at most one per process at a time."""
+    with _lock:
+        if _rebuilding.is_set():
+            return
+        _rebuilding.set()
+    threading.Thread(target=_rebuild_in_background, name="recipe-index-rebuild", daemon=True).start()
+
+
+def _rebuild_in_background():
+    try:
+        # Built without the lock, so recipe writes keep updating the current
+        # index meanwhile; the ones that landed during the build are then
+        # applied to the new index before it replaces the current one
+        started = timezone.now() - REBUILD_OVERLAP
+        index = RecipeIndex.build()
+        if index is None:
+            return
+        with _writing():
+            current = open_saved_index()
+            if current is not None and not current.needs_rebuild():
+                # Another worker rebuilt it meanwhile
+                return
+            changed = set(RecipeFeatures.objects.filter(updated_at__gte=started).values_list('recipe_id', flat=True))
+            if current is not None:
+                # Added or deleted since the build read the catalog
+                changed.update(np.setxor1d(index.ids, current.ids).tolist())
+            if changed:
+                index.update(changed)
+            save_index(index)
+    except Exception as e:
+        print(f"Error rebuilding recipe index: {str(e)}")
+    finally:
+        _rebuilding.clear()
+        connection.close()
+
+
+def open_saved_index():
+    """
+    Memory-map the current saved index, if there is one, without touching the
+    database. Called from ApiConfig.ready() so workers start with the index
+    already open. Returns the index or None.
+    """
+    with _lock:
+        name = saved_index_name()
+        if name is None:
+            return None
+        if _loaded["name"] != name:
+            index = RecipeIndex.load(os.path.join(settings.RECIPE_INDEX_DIR, name))
+            if index is None or index.mode != settings.RECIPE_INDEX_VECTORIZER:
+                return None
+            _loaded["index"] = index
+            _loaded["name"] = name
+        return _loaded["index"]
+
+
+def get_recipe_index():
+    """
+    Return the recipe index, opening the saved one (or building it on first
+    use). Workers pick up indexes saved by other workers via the CURRENT file.
+    """
+    with _lock:
+        index = open_saved_index()
+        if index is None:
+            with _writing():
+                # Another worker may have built it while this one waited
+                index = open_saved_index()
+                if index is None:
+                    # Never built, written by an older release or with the other vectorizer
+                    index = RecipeIndex.build()
+                    if index is not None:
+                        save_index(index)
+        return index
+
+
+def refresh_recipes(recipe_ids):
+    """
+    Bring the index up to date after recipes were added, edited or deleted.
+    Runs once the current transaction commits, after the RecipeFeatures
+    refresh the same writes scheduled.
+    """
+    recipe_ids = [rid for rid in recipe_ids if rid is not None]
+    if not recipe_ids:
+        return
+    transaction.on_commit(lambda: _refresh_recipes(recipe_ids))
+
+
+def _refresh_recipes(recipe_ids):
+    try:
+        with _writing():
+            # Read CURRENT under the lock, so an update another worker just
+            # saved is built on rather than overwritten
+            index = get_recipe_index()
+            if index is None:
+                return
+            # Update a copy so requests reading the current index never see
+            # ids and matrix rows out of step
+            index = copy.copy(index)
+            if not index.update(recipe_ids):
+                return
+            save_index(index)
+        if index.needs_rebuild():
+            # Refitting takes as long as the first build; never in the request
+            schedule_rebuild()
+        # Precomputed neighbours of these recipes are stale now; they are
+        # served live until `build_similar_recipes --refresh` runs
+        SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    except Exception as e:
+        # Never fail the write that triggered the refresh
+        print(f"Error refreshing recipe index: {str(e)}")
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from .models import CustomUser
+from .recipe_index import saved_index_name
+
+
+def _cache():
+    return caches[settings.RECOMMENDER_CACHE['ALIAS']]
+
+
+def catalog_version():
+    """Token that changes whenever the recipe index is saved, i.e. after any recipe write."""
+    return saved_index_name() or "none"
+
+
+def bump_user_version(user_id):
+    """Invalidate the user's cached recommendations (their saves, likes or preferences changed)."""
+    CustomUser.objects.filter(pk=user_id).update(recommendation_version=F('recommendation_version') + 1)
+
+
+def _count(name):
+    cache = _cache()
+    key = f"stats:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cached_ids(key_parts, compute):
+    """
+    Ordered recipe ids cached under `key_parts` (which should include the
+    data-version tokens the result depends on), or compute() stored for the
+    RECOMMENDER_CACHE alias's TTL. Returns (ids, hit).
+    """
+    if not settings.RECOMMENDER_CACHE['ENABLED']:
+        return [int(rid) for rid in compute()], False
+
+    cache = _cache()
+    key = ":".join(str(part) for part in key_parts)
+    ids = cache.get(key)
+    if ids is not None:
+        _count("hits")
+        return ids, True
+
+    ids = [int(rid) for rid in compute()]
+    cache.set(key, ids)
+    _count("misses")
+    return ids, False
+
+
+def cache_stats():
+    cache = _cache()
+    hits, misses = cache.get("stats:hits", 0), cache.get("stats:misses", 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
@@ -5,6 +5,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from django.conf import settings
+from django.db import transaction
 
 from .models import (Recipe, Ingredient, Instruction, NutritionalInformation, 
                      ProfileImage,Equipment, Tag,
@@ -176,7 +177,6 @@ class RecipeSerializer(serializers.ModelSerializer):
         queryset=Course.objects.all(), write_only=True, source='course'
     )
     
-    like_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
 
     image = serializers.ImageField(required=False, allow_null=True)
@@ -185,15 +185,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = '__all__'
 
-    def get_like_count(self, obj):
-        return obj.like_count()
-
     def get_is_liked(self, obj):
+        liked_ids = self.context.get('liked_ids')
+        if liked_ids is not None:
+            return obj.id in liked_ids
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             return obj.is_liked_by_user(request.user)
         return False
 
+    @transaction.atomic
     def create(self, validated_data):
         # Extract nested write_only keys to the actual FK fields
         cuisine = validated_data.pop('cuisine', None)
@@ -0,0 +1,74 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .collaborative import schedule_interactions_refresh
+from .features import schedule_features_refresh
+from .result_cache import bump_user_version
+from .models import (Course, Cuisine, Equipment, Ingredient, Instruction, Like, NutritionalInformation, Recipe,
+                     SavedRecipe, UserPreference, UserRecommendation)
+
+
+# Keep RecipeFeatures in step with the recipes and the parts they are built
+# from, and the item-item model with likes and saves
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_features_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Instruction)
+@receiver(post_save, sender=Equipment)
+@receiver(post_save, sender=NutritionalInformation)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Instruction)
+@receiver(post_delete, sender=Equipment)
+@receiver(post_delete, sender=NutritionalInformation)
+def recipe_part_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_features_refresh([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.dietary_restrictions.through)
+def dietary_restrictions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            schedule_features_refresh([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        schedule_features_refresh(pk_set or [])
+    elif action == "pre_clear":
+        # Clearing from the restriction's side sends no pk_set; the refresh
+        # itself runs when the clear commits
+        schedule_features_refresh(list(instance.recipes.values_list("id", flat=True)))
+
+
+@receiver(post_save, sender=Cuisine)
+@receiver(post_save, sender=Course)
+def recipe_category_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        schedule_features_refresh(list(instance.recipes.values_list("id", flat=True)))
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=SavedRecipe)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=SavedRecipe)
+def interaction_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_interactions_refresh([(instance.user_id, instance.recipe_id)])
+        bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=UserPreference.dietary_restrictions.through)
+@receiver(m2m_changed, sender=UserPreference.preferred_cuisines.through)
+def preferences_changed(sender, instance, action, reverse, **kwargs):
+    # Precomputed recommendations were filtered with the old preferences;
+    # serve live until the next nightly run
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        UserRecommendation.objects.filter(user_id=instance.user_id).delete()
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_delete, sender=UserPreference)
+def preferences_deleted(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
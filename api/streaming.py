@@ -0,0 +1,123 @@
+import heapq
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.functions import Coalesce
+from .corpus import RecipeCorpus
+from .features import iter_recipe_features, load_recipe_features
+from .models import RecipeFeatures
+from .recipe_index import NUMERIC_FIELDS, NUMERIC_WEIGHT, SIMILARITY_WEIGHT, combined_text, profile_text
+
+
+# RecipeFeatures column of each of NUMERIC_FIELDS
+NUMERIC_COLUMNS = ["total_minutes", "calories_kcal", "protein_g", "carbs_g", "fat_g"]
+
+
+def numeric_bounds():
+    """
+    (mins, span) of the catalog's numeric features, as RecipeIndex scales
+    them, from one aggregate query; None for an empty catalog.
+    """
+    bounds = RecipeFeatures.objects.aggregate(
+        **{f"min_{col}": Min(Coalesce(col, 0)) for col in NUMERIC_COLUMNS},
+        **{f"max_{col}": Max(Coalesce(col, 0)) for col in NUMERIC_COLUMNS},
+    )
+    if bounds[f"min_{NUMERIC_COLUMNS[0]}"] is None:
+        return None
+    mins = np.array([bounds[f"min_{col}"] for col in NUMERIC_COLUMNS], dtype=np.float32)
+    span = np.array([bounds[f"max_{col}"] for col in NUMERIC_COLUMNS], dtype=np.float32) - mins
+    span[span == 0] = 1.0
+    return mins, span
+
+
+def _merge(heap, keys, ids, k):
+    # Keep the k largest (key, -id) pairs seen so far; on equal keys the lower
+    # id wins, like the index's stable sorts
+    for pair in zip(keys, (-rid for rid in ids)):
+        if len(heap) < k:
+            heapq.heappush(heap, pair)
+        elif pair > heap[0]:
+            heapq.heapreplace(heap, pair)
+
+
+def stream_similar(index, recipe_id, top_n=5, min_similarity=0.3, chunk_size=None):
+    """
+    recommend_similar_recipes' exact ranking, computed by streaming
+    RecipeFeatures in chunks through the index's fitted vectorizer instead of
+    reading the index matrices. Memory is bounded by chunk_size, at the cost
+    of re-vectorising the catalog. Returns (ids, scores).
+    """
+    chunk_size = chunk_size or settings.RECOMMENDER_STREAM_CHUNK_SIZE
+    base = load_recipe_features([recipe_id])
+    bounds = numeric_bounds()
+    if base.empty or bounds is None or top_n <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    mins, span = bounds
+    base_vector = index.vectorizer.transform(combined_text(base))
+    base_scaled = (RecipeCorpus.from_frame(base).numeric - mins) / span
+
+    heap = []
+    for df in iter_recipe_features(chunk_size):
+        ids = df["ID"].to_numpy()
+        similarity = (index.vectorizer.transform(combined_text(df)) @ base_vector.T).toarray().ravel()
+        scaled = (RecipeCorpus.from_frame(df).numeric - mins) / span
+        score = similarity * SIMILARITY_WEIGHT
+        for col in range(len(NUMERIC_FIELDS)):
+            score += (1 - np.abs(scaled[:, col] - base_scaled[0, col])) * NUMERIC_WEIGHT
+
+        mask = (similarity >= min_similarity) & (ids != int(recipe_id))
+        ids, score = ids[mask], score[mask]
+        if len(ids) > top_n:
+            # Only this chunk's own top_n can enter the running top_n
+            best = np.argpartition(-score, top_n - 1)[:top_n]
+            ids, score = ids[best], score[best]
+        _merge(heap, score.tolist(), ids.tolist(), top_n)
+
+    best = sorted(heap, reverse=True)
+    return np.array([-rid for _, rid in best], dtype=np.int64), np.array([s for s, _ in best])
+
+
+def stream_profile(index, vector, saved_ids, avg_total_time, avg_difficulty, min_similarity=0.3,
+                   candidate_ids=None, limit=None, chunk_size=None):
+    """
+    The first `limit` rows of recommend_for_profile's exact ranking, computed
+    by streaming RecipeFeatures in chunks through the index's profile
+    vectorizer (see stream_similar).
+    """
+    chunk_size = chunk_size or settings.RECOMMENDER_STREAM_CHUNK_SIZE
+    limit = limit or settings.USER_RECOMMENDATIONS_TOP_K
+    norm = np.sqrt(vector.multiply(vector).sum())
+    if norm == 0:
+        return pd.DataFrame()
+    saved_ids = np.fromiter(saved_ids, dtype=np.int64)
+    allowed = None if candidate_ids is None else np.fromiter(candidate_ids, dtype=np.int64)
+
+    # Keys are negated so that larger is better: similarity descending, then
+    # difficulty and time distance ascending, as recommend_for_profile sorts
+    heap = []
+    for df in iter_recipe_features(chunk_size):
+        ids = df["ID"].to_numpy()
+        similarity = (index.profile_vectorizer.transform(profile_text(df)) @ vector.T).toarray().ravel() / norm
+        mask = (similarity >= min_similarity) & ~np.isin(ids, saved_ids)
+        if allowed is not None:
+            mask &= np.isin(ids, allowed)
+        if not mask.any():
+            continue
+        corpus = RecipeCorpus.from_frame(df[mask])
+        ids, similarity = ids[mask], similarity[mask]
+        time_distance = np.abs(corpus.total_time - avg_total_time)
+        difficulty_distance = np.abs(corpus.difficulty - avg_difficulty)
+        order = np.lexsort((time_distance, difficulty_distance, -similarity))[:limit]
+        _merge(heap, zip(similarity[order].tolist(), (-difficulty_distance[order]).tolist(),
+                         (-time_distance[order]).tolist()), ids[order].tolist(), limit)
+
+    if not heap:
+        return pd.DataFrame()
+    best = sorted(heap, reverse=True)
+    return pd.DataFrame({
+        "ID": np.array([-rid for _, rid in best], dtype=np.int64),
+        "Similarity": [key[0] for key, _ in best],
+        "difficulty_distance": [-key[1] for key, _ in best],
+        "time_distance": [-key[2] for key, _ in best],
+    })
@@ -0,0 +1,83 @@
+import numpy as np
+import scipy.sparse as sp
+from django.db import transaction
+from .models import SavedRecipe, UserTasteProfile
+from .recipe_index import get_recipe_index
+
+
+def _to_row(vector, n_features):
+    indices = np.asarray(vector.get("indices", []), dtype=np.int64)
+    values = np.asarray(vector.get("values", []), dtype=np.float64)
+    rows = np.zeros(len(indices), dtype=np.int64)
+    return sp.csr_matrix((values, (rows, indices)), shape=(1, n_features))
+
+
+def _from_row(row):
+    row = sp.csr_matrix(row)
+    # Adding and removing the same recipe leaves float noise behind
+    row.data[np.abs(row.data) < 1e-12] = 0
+    row.eliminate_zeros()
+    return {"indices": row.indices.tolist(), "values": row.data.tolist()}
+
+
+def _rebuild(profile, index):
+    saved_ids = SavedRecipe.objects.filter(user_id=profile.user_id).values_list('recipe_id', flat=True)
+    positions = index.positions_of(saved_ids)
+
+    profile.index_version = index.version
+    profile.vector = _from_row(index.profile_matrix[positions].sum(axis=0))
+    profile.saved_count = len(positions)
+    profile.total_time_sum = float(index.corpus.total_time[positions].sum())
+    profile.difficulty_sum = float(index.corpus.difficulty[positions].sum())
+    profile.save()
+
+
+def profile_vector(profile, index):
+    """The stored profile as a 1 x vocabulary sparse row of the index's profile space."""
+    return _to_row(profile.vector, index.profile_matrix.shape[1])
+
+
+def get_taste_profile(user, index):
+    """
+    Return the user's taste profile, recomputing it from SavedRecipe if it was
+    built against other rows (the index was refit or updated since).
+    """
+    profile, _ = UserTasteProfile.objects.get_or_create(user=user, defaults={"index_version": ""})
+    if profile.index_version != index.version:
+        _rebuild(profile, index)
+    return profile
+
+
+def update_taste_profile(user, recipe_id, saved):
+    """
+    Add (saved=True) or subtract (saved=False) one recipe from the user's stored
+    profile. Called after the SavedRecipe row was created or deleted.
+    """
+    try:
+        index = get_recipe_index()
+        if index is None:
+            return
+        with transaction.atomic():
+            profile, _ = UserTasteProfile.objects.select_for_update().get_or_create(
+                user=user, defaults={"index_version": ""}
+            )
+            if profile.index_version != index.version:
+                _rebuild(profile, index)
+                return
+
+            pos = index.positions.get(int(recipe_id))
+            if pos is None:
+                return
+            sign = 1 if saved else -1
+            profile.saved_count = max(0, profile.saved_count + sign)
+            if profile.saved_count == 0:
+                profile.vector, profile.total_time_sum, profile.difficulty_sum = {}, 0, 0
+            else:
+                row = profile_vector(profile, index) + sign * index.profile_matrix[pos]
+                profile.vector = _from_row(row)
+                profile.total_time_sum += sign * float(index.corpus.total_time[pos])
+                profile.difficulty_sum += sign * float(index.corpus.difficulty[pos])
+            profile.save()
+    except Exception as e:
+        # Never fail the save/unsave that triggered the update
+        print(f"Error updating taste profile: {str(e)}")
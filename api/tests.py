@@ -1,3 +1,619 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from .AI import recommend_for_profile, recommend_similar_recipes, start
+from .ann import LSHIndex
+from .artifacts import publish_index_artifact, sync_index_artifact
+from .collaborative import ItemItemModel
+from .embeddings import Embeddings
+from .hashing import HashingTfidfVectorizer
+from .benchmark import seed_synthetic_catalog, synthetic_recipe_frame
+from .features import load_recipe_features, refresh_recipe_features
+from .models import (Course, Cuisine, CustomUser, DietaryRestriction, Ingredient, IngredientName, Like, Recipe,
+                     RecipeFeatures, SavedRecipe, SimilarRecipe, UserPreference, UserRecommendation)
+from .precompute import build_cold_start_lists, build_similar_recipes, build_user_recommendations
+from .recipe_index import (RecipeIndex, combine_fields, combined_text, get_recipe_index, open_saved_index,
+                           recipe_features, refresh_recipes, save_index, saved_index_name)
+from .result_cache import catalog_version
+from .streaming import stream_profile, stream_similar
+from .utils import Preprocess, VectorizedPreprocess, normalize_ingredient_name
 
-# Create your tests here.
+
+# Without DATABASE_URL the default database is Django's dummy backend
+requires_database = unittest.skipIf(
+    settings.DATABASES['default'].get('ENGINE', 'django.db.backends.dummy').endswith('dummy'),
+    "needs a database (set DATABASE_URL)",
+)
+
+
+def synthetic_corpus(n_docs=3000, n_terms=2000, n_topics=30, seed=0):
+    """L2 normalised bag-of-words rows drawn from overlapping topics, like TF-IDF recipe vectors."""
+    rng = np.random.default_rng(seed)
+    topics = [rng.choice(n_terms, 20, replace=False) for _ in range(n_topics)]
+    rows, cols = [], []
+    for doc in range(n_docs):
+        terms = np.concatenate([rng.choice(topics[rng.integers(n_topics)], 15), rng.choice(n_terms, 3)])
+        rows.extend([doc] * len(terms))
+        cols.extend(terms)
+    matrix = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_docs, n_terms))
+    return normalize(matrix)
+
+
+class LSHRecallTests(SimpleTestCase):
+    k = 10
+
+    def search(self, matrix, query, candidates):
+        candidates = candidates[candidates != query]
+        similarity = (matrix[candidates] @ matrix[query].T).toarray().ravel()
+        return candidates[np.argsort(-similarity, kind="stable")[:self.k]]
+
+    def test_recall_at_k_against_exact_search(self):
+        matrix = synthetic_corpus()
+        queries = range(0, matrix.shape[0], 30)
+        lsh = LSHIndex(matrix, n_tables=16, n_bits=8)
+
+        exact = {q: set(self.search(matrix, q, np.arange(matrix.shape[0]))) for q in queries}
+
+        report = {}
+        for probes in (0, 2, 6):
+            hits, scanned = 0, 0
+            for q in queries:
+                candidates = lsh.query(matrix[q], n_probes=probes)
+                scanned += len(candidates)
+                hits += len(exact[q] & set(self.search(matrix, q, candidates)))
+            report[probes] = {
+                "recall": hits / (self.k * len(queries)),
+                "scanned": scanned / (len(queries) * matrix.shape[0]),
+            }
+
+        self.assertGreaterEqual(report[2]["recall"], 0.8)
+        self.assertGreaterEqual(report[6]["recall"], report[0]["recall"])
+        # The point of the index: score a fraction of the catalog
+        self.assertLess(report[2]["scanned"], 0.5)
+
+
+class VectorizedPreprocessTests(SimpleTestCase):
+
+    def test_matches_row_wise_preprocess(self):
+        raw = synthetic_recipe_frame(500, seed=3)
+        expected = Preprocess().preprocess_recipes(raw.copy())
+        actual = VectorizedPreprocess().preprocess_recipes(raw.copy())
+
+        self.assertEqual(list(actual.columns), list(expected.columns))
+        for column in expected.columns:
+            self.assertEqual(list(actual[column]), list(expected[column]), column)
+
+    def test_combined_text_matches_combine_fields(self):
+        df = VectorizedPreprocess().preprocess_recipes(synthetic_recipe_frame(200, seed=4))
+        self.assertEqual(combined_text(df).tolist(), df.apply(combine_fields, axis=1).tolist())
+
+
+class ItemItemModelTests(SimpleTestCase):
+
+    def interactions(self, n_users, n_items, seed):
+        rng = np.random.default_rng(seed)
+        matrix = sp.random(n_users, n_items, density=0.05, random_state=seed, format="csr")
+        matrix.data = rng.choice([1.0, 2.0, 3.0], len(matrix.data))
+        return matrix
+
+    def test_incremental_update_matches_rebuild(self):
+        matrix = self.interactions(200, 80, seed=1)
+        model = ItemItemModel(np.arange(200), np.arange(80), matrix, top_k=100, chunk_size=32)
+
+        rng = np.random.default_rng(2)
+        weights = {(int(u), int(r)): float(rng.choice([0.0, 1.0, 2.0])) for u, r in rng.integers(0, 80, (40, 2))}
+        # A new user and a new recipe
+        weights[(500, 3)] = 1.0
+        weights[(7, 900)] = 2.0
+        self.assertTrue(model.update(weights))
+
+        expected = ItemItemModel(model.user_ids, model.recipe_ids, model.interactions, top_k=100)
+        np.testing.assert_allclose(model.similarity.toarray(), expected.similarity.toarray())
+        self.assertFalse(model.update(weights))
+
+    def test_top_k_per_recipe(self):
+        model = ItemItemModel(np.arange(300), np.arange(60), self.interactions(300, 60, seed=3), top_k=5)
+        self.assertLessEqual(np.diff(model.similarity.indptr).max(), 5)
+        self.assertEqual(model.similarity.diagonal().sum(), 0)
+
+
+class HashingTfidfVectorizerTests(SimpleTestCase):
+
+    def texts(self, n, seed):
+        df = VectorizedPreprocess().preprocess_recipes(synthetic_recipe_frame(n, seed=seed))
+        return combined_text(df).tolist()
+
+    def test_matches_tfidf_up_to_collisions(self):
+        texts = self.texts(300, seed=5)
+        hashed = HashingTfidfVectorizer(2 ** 20).fit_transform(texts)
+        exact = TfidfVectorizer().fit_transform(texts)
+        np.testing.assert_allclose((hashed @ hashed.T).toarray(), (exact @ exact.T).toarray(), atol=1e-5)
+
+    def test_update_matches_fit(self):
+        texts = self.texts(300, seed=6)
+        vectorizer = HashingTfidfVectorizer(2 ** 12)
+        matrix = vectorizer.fit_transform(texts[:250])
+        keep = np.ones(250, dtype=bool)
+        keep[[3, 40, 41]] = False
+        matrix = vectorizer.update(matrix[keep], matrix[~keep], texts[250:])
+
+        expected = HashingTfidfVectorizer(2 ** 12).fit_transform([t for t, k in zip(texts, keep) if k] + texts[250:])
+        np.testing.assert_allclose(matrix.toarray(), expected.toarray(), atol=1e-5)
+
+
+class EmbeddingsTests(SimpleTestCase):
+
+    def test_full_rank_matches_sparse_cosine(self):
+        # Empty extra columns, so 60 components span every row
+        matrix = sp.hstack([synthetic_corpus(n_docs=300, n_terms=60, seed=7), sp.csr_matrix((300, 10))])
+        matrix = sp.csr_matrix(matrix, dtype=np.float32)
+        exact = (matrix @ matrix.T).toarray()
+        for dtype, tolerance in [("float32", 1e-4), ("int8", 2e-2)]:
+            embeddings = Embeddings.fit(matrix, 60, dtype)
+            dense = embeddings.similarity(embeddings.decode(np.arange(300)))
+            np.testing.assert_allclose(dense, exact, atol=tolerance, err_msg=dtype)
+
+    def test_replace_rows_projects_on_existing_components(self):
+        matrix = synthetic_corpus(n_docs=200, n_terms=80, seed=8).astype(np.float32)
+        embeddings = Embeddings.fit(matrix[:150], 16)
+        keep = np.ones(150, dtype=bool)
+        keep[:10] = False
+        updated = embeddings.replace_rows(keep, matrix[150:])
+        np.testing.assert_allclose(updated.vectors, embeddings.project(matrix[10:]), atol=1e-6)
+
+
+class IndexArtifactTests(SimpleTestCase):
+
+    def test_publish_then_sync_on_another_node(self):
+        df = VectorizedPreprocess().preprocess_recipes(synthetic_recipe_frame(200))
+        index = RecipeIndex.from_features(recipe_features(df))
+        with tempfile.TemporaryDirectory() as root:
+            storage = dict(settings.RECIPE_INDEX_ARTIFACTS, OPTIONS={'location': os.path.join(root, "storage")})
+            with override_settings(RECIPE_INDEX_ARTIFACTS=storage):
+                with override_settings(RECIPE_INDEX_DIR=os.path.join(root, "builder")):
+                    save_index(index)
+                    manifest = publish_index_artifact()
+
+                with override_settings(RECIPE_INDEX_DIR=os.path.join(root, "node")):
+                    self.assertEqual(sync_index_artifact()["name"], manifest["name"])
+                    self.assertIsNone(sync_index_artifact())
+                    synced = open_saved_index()
+                    self.assertEqual(synced.version, index.version)
+                    self.assertEqual((synced.matrix != index.matrix).nnz, 0)
+
+                # A corrupted archive is never switched to
+                archive = os.path.join(root, "storage", f"{manifest['name']}.tar.gz")
+                with open(archive, "r+b") as f:
+                    f.seek(64)
+                    f.write(b"corrupt")
+                with override_settings(RECIPE_INDEX_DIR=os.path.join(root, "other-node")):
+                    self.assertIsNone(sync_index_artifact())
+                    self.assertIsNone(open_saved_index())
+
+    def test_publish_keeps_at_least_the_new_artifact(self):
+        with self.assertRaises(ValueError):
+            publish_index_artifact(keep=0)
+
+    def test_sync_before_anything_was_published(self):
+        with tempfile.TemporaryDirectory() as root:
+            storage = dict(settings.RECIPE_INDEX_ARTIFACTS, OPTIONS={'location': os.path.join(root, "storage")})
+            with override_settings(RECIPE_INDEX_ARTIFACTS=storage, RECIPE_INDEX_DIR=os.path.join(root, "node")):
+                self.assertIsNone(sync_index_artifact())
+
+
+class CatalogTestCase(TestCase):
+    """A seeded synthetic catalog with RecipeFeatures, and an empty RECIPE_INDEX_DIR per test."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe_ids, cls.usernames = seed_synthetic_catalog(150, users=5)
+        refresh_recipe_features(cls.recipe_ids, names=IngredientName.lookup())
+
+    def setUp(self):
+        index_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(RECIPE_INDEX_DIR=index_dir))
+
+
+@requires_database
+class StreamingTests(CatalogTestCase):
+
+    def test_stream_similar_matches_exact(self):
+        index = get_recipe_index()
+        for rid in self.recipe_ids[:10]:
+            ids, scores = stream_similar(index, rid, top_n=10, min_similarity=0.1, chunk_size=40)
+            exact_ids, exact_scores = index.similar(rid, top_n=10, min_similarity=0.1)
+            self.assertEqual(len(exact_ids), 10)
+            self.assertEqual(ids.tolist(), exact_ids.tolist())
+            np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+    def test_stream_profile_matches_exact(self):
+        index = get_recipe_index()
+        saved_ids = self.recipe_ids[:5]
+        saved = index.positions_of(saved_ids)
+        vector = sp.csr_matrix(index.profile_matrix[saved].sum(axis=0))
+        args = (index, vector, saved_ids, index.corpus.total_time[saved].mean(), index.corpus.difficulty[saved].mean())
+        streamed = stream_profile(*args, min_similarity=0.1, limit=20, chunk_size=40)
+        exact = recommend_for_profile(*args, min_similarity=0.1).head(20)
+        self.assertEqual(len(exact), 20)
+        self.assertEqual(streamed["ID"].tolist(), exact["ID"].tolist())
+        np.testing.assert_allclose(streamed["Similarity"], exact["Similarity"], rtol=1e-5)
+
+    def test_stream_never_builds_an_index(self):
+        self.assertTrue(recommend_similar_recipes(self.recipe_ids[0], search="stream").empty)
+        self.assertIsNone(saved_index_name())
+        get_recipe_index()
+        self.assertFalse(recommend_similar_recipes(self.recipe_ids[0], min_similarity=0.1, search="stream").empty)
+
+
+@requires_database
+class PrecomputeTests(CatalogTestCase):
+
+    def test_similar_recipes_match_live_scoring(self):
+        build_similar_recipes()
+        for rid in self.recipe_ids[:10]:
+            stored = SimilarRecipe.objects.filter(recipe_id=rid).order_by('rank')
+            live = recommend_similar_recipes(rid, top_n=settings.SIMILAR_RECIPES_TOP_K)
+            self.assertEqual([row.neighbour_id for row in stored], live["ID"].tolist())
+            np.testing.assert_allclose([row.score for row in stored], live["score"], rtol=1e-5)
+
+    def test_user_recommendations_match_live_scoring(self):
+        # One user narrowed by preferences, so the mask path is covered too
+        user = CustomUser.objects.get(username=self.usernames[0])
+        preferences = UserPreference.objects.create(user=user)
+        preferences.preferred_cuisines.set(Cuisine.objects.filter(name__in=["Italian", "Indian", "Mexican"]))
+        build_user_recommendations()
+
+        for username in self.usernames:
+            user = CustomUser.objects.get(username=username)
+            stored = UserRecommendation.objects.filter(user=user).order_by('rank')
+            live = start(username).head(settings.USER_RECOMMENDATIONS_TOP_K)
+            self.assertGreater(len(live), 0)
+            self.assertEqual([row.recipe_id for row in stored], live["ID"].tolist())
+            np.testing.assert_allclose([row.score for row in stored], live["Similarity"], rtol=1e-5)
+
+
+    def test_nightly_jobs_score_with_the_published_index(self):
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        storage = dict(settings.RECIPE_INDEX_ARTIFACTS, OPTIONS={'location': os.path.join(root, "storage")})
+        self.enterContext(override_settings(RECIPE_INDEX_ARTIFACTS=storage))
+        with override_settings(RECIPE_INDEX_DIR=os.path.join(root, "cron")):
+            with self.assertRaises(CommandError):
+                call_command('build_user_recommendations', '--sync', stdout=io.StringIO())
+            self.assertIsNone(saved_index_name())
+
+        manifest = publish_index_artifact()
+        with override_settings(RECIPE_INDEX_DIR=os.path.join(root, "cron")):
+            call_command('build_similar_recipes', '--refresh', '--sync', stdout=io.StringIO())
+            call_command('build_user_recommendations', '--sync', stdout=io.StringIO())
+            self.assertEqual(saved_index_name(), manifest["index"])
+        self.assertTrue(SimilarRecipe.objects.exists())
+        self.assertEqual(UserRecommendation.objects.values('user').distinct().count(), len(self.usernames))
+
+
+@requires_database
+class RecommendationViewTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.get(username=self.usernames[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_precomputed_recommendations_are_served_with_likes(self):
+        build_user_recommendations()
+        response = self.client.get("/api/recommendations/")
+        self.assertEqual(response.status_code, 200)
+        stored = list(
+            UserRecommendation.objects.filter(user=self.user).order_by('rank').values_list('recipe_id', flat=True)
+        )
+        self.assertEqual([recipe["id"] for recipe in response.json()], stored)
+        liked = set(Like.objects.filter(user=self.user).values_list('recipe_id', flat=True))
+        self.assertEqual([recipe["is_liked"] for recipe in response.json()], [rid in liked for rid in stored])
+
+    def test_live_recommendations_without_a_precomputed_list(self):
+        # Saving the index changes the cache key, so build it up front
+        get_recipe_index()
+        response = self.client.get("/api/recommendations/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual([recipe["id"] for recipe in response.json()], start(self.user.username)["ID"].tolist())
+        self.assertEqual(self.client.get("/api/recommendations/")["X-Cache"], "HIT")
+
+    def assertNextRequestMisses(self):
+        # A new request loads the user, and with it their current version
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/recommendations/")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/recommendations/")["X-Cache"], "HIT")
+
+    def test_saves_and_likes_invalidate_cached_recommendations(self):
+        get_recipe_index()
+        self.client.get("/api/recommendations/")
+        seen = set(SavedRecipe.objects.filter(user=self.user).values_list('recipe_id', flat=True)) | set(
+            Like.objects.filter(user=self.user).values_list('recipe_id', flat=True))
+        unseen = [rid for rid in self.recipe_ids if rid not in seen]
+
+        for write in (lambda: self.client.post(f"/api/save-recipe/{unseen[0]}/"),
+                      lambda: self.client.post("/api/like-recipe/", {"recipe": unseen[1]}, format="json")):
+            version = CustomUser.objects.get(pk=self.user.pk).recommendation_version
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertLess(write().status_code, 300)
+            self.assertGreater(CustomUser.objects.get(pk=self.user.pk).recommendation_version, version)
+            self.assertNextRequestMisses()
+
+    def test_recipe_edits_invalidate_cached_recommendations(self):
+        get_recipe_index()
+        self.client.get("/api/recommendations/")
+        version = catalog_version()
+        recipe = Recipe.objects.get(pk=self.recipe_ids[0])
+        recipe.title = "Lemon rice"
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+            refresh_recipes([recipe.id])
+        self.assertNotEqual(catalog_version(), version)
+        self.assertNextRequestMisses()
+
+    def test_precomputed_similar_recipes(self):
+        build_similar_recipes()
+        rid = self.recipe_ids[0]
+        response = self.client.get(f"/api/similar-recipes/{rid}/?top_n=5")
+        self.assertEqual(response.status_code, 200)
+        stored = SimilarRecipe.objects.filter(recipe_id=rid).order_by('rank').values_list('neighbour_id', flat=True)
+        self.assertEqual([recipe["id"] for recipe in response.json()], list(stored[:5]))
+
+    def test_batch_similar_matches_single_requests(self):
+        seeds = self.recipe_ids[:3]
+        missing = max(self.recipe_ids) + 1000
+        ids = ",".join(str(rid) for rid in [*seeds, missing, seeds[0]])
+        response = self.client.get(f"/api/similar-recipes/batch/?ids={ids}&top_n=5")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([result["recipe_id"] for result in results], [*seeds, missing])
+        for rid, result in zip(seeds, results):
+            live = recommend_similar_recipes(rid, top_n=5)["ID"].tolist()
+            self.assertEqual([recipe["id"] for recipe in result["similar"]], live)
+        self.assertEqual(results[3]["similar"], [])
+
+        too_many = ",".join(str(rid) for rid in self.recipe_ids[:settings.SIMILAR_RECIPES_BATCH_MAX + 1])
+        self.assertEqual(self.client.get(f"/api/similar-recipes/batch/?ids={too_many}").status_code, 400)
+
+    def test_cold_start_users(self):
+        build_cold_start_lists()
+        newcomer = CustomUser.objects.create(username="newcomer", email="newcomer@example.com", password="!")
+        self.client.force_authenticate(newcomer)
+        response = self.client.get("/api/recommendations/")
+        self.assertEqual(response.status_code, 200)
+        popular = Recipe.objects.annotate(popularity=F('like_count') + F('save_count')).order_by('-popularity', 'id')
+        self.assertEqual([recipe["id"] for recipe in response.json()],
+                         list(popular.values_list('id', flat=True)[:settings.COLD_START_TOP_K]))
+
+        # Preferences no recipe satisfies leave an empty list
+        preferences = UserPreference.objects.create(user=newcomer)
+        preferences.preferred_cuisines.set([Cuisine.objects.create(name="Nowhere")])
+        response = self.client.get("/api/recommendations/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"message": "No recommendations available."})
+
+
+@requires_database
+class RecipeCounterTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # The seeded likes and saves bypass the views' counter updates
+        call_command('reconcile_recipe_counters', stdout=io.StringIO())
+        self.client = APIClient()
+        self.user = CustomUser.objects.get(username=self.usernames[0])
+        self.client.force_authenticate(self.user)
+        interacted = Like.objects.filter(user=self.user).values('recipe_id').union(
+            SavedRecipe.objects.filter(user=self.user).values('recipe_id')
+        )
+        self.recipe = Recipe.objects.exclude(id__in=[row['recipe_id'] for row in interacted]).first()
+
+    def assertCounts(self, likes, saves):
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.like_count, self.recipe.save_count), (likes, saves))
+        self.assertEqual(Like.objects.filter(recipe=self.recipe).count(), likes)
+        self.assertEqual(SavedRecipe.objects.filter(recipe=self.recipe).count(), saves)
+
+    def test_counters_follow_likes_and_saves(self):
+        likes, saves = self.recipe.like_count, self.recipe.save_count
+        self.client.post(f"/api/save-recipe/{self.recipe.id}/")
+        self.client.post(f"/api/save-recipe/{self.recipe.id}/")
+        self.assertEqual(self.client.post("/api/like-recipe/", {"recipe": self.recipe.id}).status_code, 201)
+        self.assertEqual(self.client.post("/api/like-recipe/", {"recipe": self.recipe.id}).status_code, 400)
+        self.assertCounts(likes + 1, saves + 1)
+
+        self.client.post(f"/api/remove-saved-recipe/{self.recipe.id}/")
+        self.client.post(f"/api/remove-saved-recipe/{self.recipe.id}/")
+        self.assertEqual(self.client.post("/api/unlike-recipe/", {"recipe": self.recipe.id}).status_code, 200)
+        self.assertEqual(self.client.post("/api/unlike-recipe/", {"recipe": self.recipe.id}).status_code, 404)
+        self.assertCounts(likes, saves)
+
+        # Nothing left for the reconciliation to fix
+        call_command('reconcile_recipe_counters', stdout=io.StringIO())
+        self.assertCounts(likes, saves)
+
+    def test_concurrent_unlikes_decrement_once(self):
+        likes = self.recipe.like_count
+        self.client.post("/api/like-recipe/", {"recipe": self.recipe.id})
+        like = Like.objects.get(user=self.user, recipe=self.recipe)
+        self.client.post("/api/unlike-recipe/", {"recipe": self.recipe.id})
+        # A second request that read the like before the first deleted it
+        with mock.patch.object(Like.objects, "get", return_value=like):
+            self.assertEqual(self.client.post("/api/unlike-recipe/", {"recipe": self.recipe.id}).status_code, 200)
+        self.assertCounts(likes, self.recipe.save_count)
+
+
+@requires_database
+class IndexDeletionTests(CatalogTestCase):
+
+    def assertDeletionLeavesIndex(self):
+        index = get_recipe_index()
+        build_similar_recipes()
+        rid = self.recipe_ids[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(id=rid).delete()
+            refresh_recipes([rid])
+
+        updated = get_recipe_index()
+        self.assertIsNot(updated, index)
+        self.assertNotIn(rid, updated.positions)
+        self.assertEqual(len(updated), len(index) - 1)
+        self.assertEqual(updated.matrix.shape[0], len(updated))
+        for embeddings in updated.embeddings.values():
+            self.assertEqual(len(embeddings.vectors), len(updated))
+        self.assertFalse(SimilarRecipe.objects.filter(recipe_id=rid).exists())
+
+    def test_delete_with_tfidf(self):
+        with override_settings(RECIPE_INDEX_VECTORIZER="tfidf"):
+            self.assertDeletionLeavesIndex()
+
+    def test_delete_with_hashing(self):
+        with override_settings(RECIPE_INDEX_VECTORIZER="hashing"):
+            self.assertDeletionLeavesIndex()
+
+
+@requires_database
+class RecipeSyncTests(CatalogTestCase):
+    """The signals keep RecipeFeatures current; refresh_recipes (called by the views and admin) the index."""
+
+    def write(self, change):
+        # `change` returns the recipe it wrote. Commit callbacks run in
+        # order: the features refresh its signals scheduled, then the index's
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_recipes([change()])
+        return get_recipe_index()
+
+    def assertIndexed(self, index, recipe_id):
+        row = index.matrix[index.positions[recipe_id]]
+        expected = index.vectorizer.transform(combined_text(load_recipe_features([recipe_id])))
+        np.testing.assert_allclose(row.toarray(), expected.toarray(), rtol=1e-5, atol=1e-6)
+
+    def test_added_recipe(self):
+        index = get_recipe_index()
+
+        def add():
+            recipe = Recipe.objects.create(
+                title="Lemon rice", description="Rice with lemons", preparation_time="10 minutes",
+                cooking_time="20 minutes", total_time="30 minutes", servings="2", difficulty_level="Easy",
+                cuisine=Cuisine.objects.get(name="Indian"), course=Course.objects.first(),
+            )
+            Ingredient.objects.create(recipe=recipe, ingredient="basmati rice", quantity="1 cup")
+            Ingredient.objects.create(recipe=recipe, ingredient="lemons", quantity="2")
+            recipe.dietary_restrictions.add(DietaryRestriction.objects.get(name="Vegan"))
+            return recipe.id
+
+        updated = self.write(add)
+        recipe = Recipe.objects.get(title="Lemon rice")
+        features = RecipeFeatures.objects.get(recipe=recipe)
+        self.assertIn("lemon", features.ingredients)
+        self.assertIn("vegan", features.dietary_restrictions.lower())
+        self.assertEqual((features.cuisine, features.total_minutes), ("indian", 30))
+        self.assertEqual(len(updated), len(index) + 1)
+        self.assertIndexed(updated, recipe.id)
+
+    def test_edited_recipe(self):
+        recipe = Recipe.objects.get(id=self.recipe_ids[0])
+        index = get_recipe_index()
+        before = RecipeFeatures.objects.get(recipe=recipe)
+        restriction = DietaryRestriction.objects.exclude(recipes=recipe).first()
+
+        def edit():
+            recipe.description = "Smoky mushrooms"
+            recipe.save()
+            ingredient = recipe.ingredients.first()
+            ingredient.ingredient = "mushrooms"
+            ingredient.save()
+            recipe.ingredients.exclude(pk=ingredient.pk).first().delete()
+            recipe.dietary_restrictions.add(restriction)
+            return recipe.id
+
+        updated = self.write(edit)
+        features = RecipeFeatures.objects.get(recipe=recipe)
+        self.assertNotEqual(features.ingredients, before.ingredients)
+        self.assertIn("mushroom", features.ingredients)
+        self.assertIn(restriction.name.lower(), features.dietary_restrictions.lower())
+        self.assertEqual(len(updated), len(index))
+        self.assertNotEqual(updated.version, index.version)
+        self.assertIndexed(updated, recipe.id)
+
+        # Clearing from the restriction's side
+        with self.captureOnCommitCallbacks(execute=True):
+            restriction.recipes.clear()
+        features.refresh_from_db()
+        self.assertNotIn(restriction.name.lower(), features.dietary_restrictions.lower())
+
+    def test_deleted_recipe(self):
+        index = get_recipe_index()
+        rid = self.recipe_ids[0]
+
+        def delete():
+            Recipe.objects.filter(id=rid).delete()
+            return rid
+
+        updated = self.write(delete)
+        self.assertFalse(RecipeFeatures.objects.filter(recipe_id=rid).exists())
+        self.assertNotIn(rid, updated.positions)
+        self.assertEqual(len(updated), len(index) - 1)
+
+
+@requires_database
+class IngredientSearchTests(CatalogTestCase):
+    query = "basmati rice,lemons,garlic cloves"
+
+    def query_text(self):
+        # As RecipeSimilarityView normalises the posted ingredients
+        return " ".join(normalize_ingredient_name(i) for i in self.query.split(",")).lower()
+
+    def brute_force_scores(self, index):
+        """{recipe id: cosine of the query with the recipe's ingredients}, over the catalog row by row."""
+        features = load_recipe_features()
+        rows = index.ingredient_vectorizer.transform(recipe_features(features)["ingredients"])
+        query = index.ingredient_vectorizer.transform([self.query_text()])
+        return dict(zip(features["ID"].tolist(), cosine_similarity(rows, query).ravel()))
+
+    def test_inverted_index_matches_brute_force(self):
+        index = get_recipe_index()
+        brute = self.brute_force_scores(index)
+        ranked = sorted((score for score in brute.values() if score > 0), reverse=True)
+        k = 20
+        ids, scores = index.match_ingredients(self.query_text(), limit=k)
+        self.assertEqual(len(ids), k)
+        np.testing.assert_allclose(scores, ranked[:k], rtol=1e-5)
+        np.testing.assert_allclose([brute[rid] for rid in ids.tolist()], scores, rtol=1e-5)
+        # Recipes tied with the k-th score may come in any order; all above it are the same
+        cutoff = ranked[k - 1] + 1e-6
+        self.assertEqual({rid for rid in ids.tolist() if brute[rid] > cutoff},
+                         {rid for rid, score in brute.items() if score > cutoff})
+
+    def test_generate_recipe_pages(self):
+        index = get_recipe_index()
+        brute = self.brute_force_scores(index)
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.get(username=self.usernames[0]))
+        pages = [
+            [recipe["id"] for recipe in client.post(
+                "/api/generate-recipe/", {"ingredients": self.query, "page": page, "page_size": 5}, format="json"
+            ).json()]
+            for page in (1, 2)
+        ]
+        for page, ids in enumerate(pages):
+            expected, _ = index.match_ingredients(self.query_text(), limit=5, offset=page * 5)
+            self.assertEqual(ids, expected.tolist())
+        self.assertGreaterEqual(min(brute[rid] for rid in pages[0]), max(brute[rid] for rid in pages[1]) - 1e-6)
+
+        response = client.post("/api/generate-recipe/", {"ingredients": self.query, "page": "x"}, format="json")
+        self.assertEqual(response.status_code, 400)
@@ -11,7 +11,9 @@ from .views import (RegisterUserView,LoginView,UserProfileView,AddRecipeView,Goo
                     UserPreferenceDeleteView,UserPreferencePartialUpdateView,RecipeSimilarityView,CheckResetCodeAPIView,
                     UpdateRecipeView,AllPreferencesListView,RecipeByMajorIngredientView,FilteredRecipeListView,
                     CuisineListView,CourseListView,DietaryRestrictionListView,RequestPasswordResetAPIView,
-                    LogoutView,MajorIngredientListView,LikeRecipeView,UnlikeRecipeView,TagListView)
+                    LogoutView,MajorIngredientListView,LikeRecipeView,UnlikeRecipeView,TagListView,
+                    recommendation_cache_stats,get_similar_recipes_batch,
+                    recommendation_index_version)
 urlpatterns = [
     path('hello/', hello_world, name='hello'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -41,9 +43,12 @@ urlpatterns = [
     path('preferences/all/', AllPreferencesListView.as_view(), name='all-preferences'),
     path('major-ingredients/', MajorIngredientListView.as_view(), name='major-ingredient-list'),
     path('recommendations/', get_recommendations, name='get_recommendations'),
+    path('recommendations/cache-stats/', recommendation_cache_stats, name='recommendation-cache-stats'),
+    path('recommendations/index-version/', recommendation_index_version, name='recommendation-index-version'),
     path('recipe_by_major_ings/', RecipeByMajorIngredientView.as_view(), name='recipes-by-major-ingredient'),
     path('like-recipe/', LikeRecipeView.as_view(), name='like-recipe'),
     path('unlike-recipe/', UnlikeRecipeView.as_view(), name='unlike-recipe'),
+    path('similar-recipes/batch/', get_similar_recipes_batch, name='get-similar-recipes-batch'),
     path('similar-recipes/<int:recipe_id>/', get_similar_recipes, name='get-similar-recipes'),
     path('liked-recipes/', LikedRecipesView.as_view(), name='liked-recipes'),
     path('recipes/sorted/', SortedRecipeListView.as_view(), name='sorted-recipe-list'),
@@ -1,17 +1,14 @@
 import pandas as pd
 import re
-from .models import Recipe,CustomUser,SavedRecipe,Ingredient
 import numpy as np # Replace with your actual app name
-import inflect
+from .parsing import (parse_minutes,parse_difficulty,normalize_ingredient_name,DIFFICULTY_RANKS,NUMBER_RE,
+                      PARENTHESES_RE)
 import random
 from django.core.mail import send_mail
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
-p = inflect.engine()
-
-
 class Preprocess:
 
     def __preprocess_ingredients(self,x):
@@ -27,31 +24,13 @@ class Preprocess:
         return [" ".join(i.split(",")).lower() for i in x]
 
     def preprocess_time(self,x):
-        time=[]
-        for i in x:
-            if "hour" in i and "minute" in i:
-                res=int(re.findall(r"\d+",i)[0])*60+int(re.findall(r"\d+",i)[1])
-            elif "hour" in i and not "minute" in i:
-                res=int(re.findall(r"\d+",i)[0])*60
-            else:
-                res=int(re.findall(r"\d+",i)[0])
-            time.append(res)
-        return time
+        return [parse_minutes(i) for i in x]
 
     def __preprocess_cuisine(self,x):
         return [i.name.lower() for i in x]
 
     def preprocess_difflevel(self,x):
-        diff=[]
-        for i in x:
-            if i=="Medium":
-                res=2
-            elif i=="Hard":
-                res=3
-            else:
-                res=1
-            diff.append(res)
-        return diff
+        return [parse_difficulty(i) for i in x]
     
     
     def __preprocess_instructions(self,x):
@@ -102,163 +81,69 @@ class Preprocess:
         return df
 
 
-def get_recipe_info_by_id_or_user(recipe_id=None, username=None):
-    try:
-        # Case 1: Get recipe by ID
-        if recipe_id is not None:
-            recipe = Recipe.objects.get(id=recipe_id)
-
-            ingredient_list = ",".join([
-                f"{ing.ingredient}" for ing in recipe.ingredients.all()
-            ])
-            instructions = [inst.step for inst in recipe.instructions.all()]
-            equipment = [eq.name for eq in recipe.equipment.all()]
-            nutritional_info = {}
-
-            if hasattr(recipe, "nutritional_information"):
-                ni = recipe.nutritional_information
-                nutritional_info = {
-                    "calories": ni.calories,
-                    "protein": ni.protein,
-                    "carbs": ni.carbs,
-                    "fat": ni.fat
-                }
-
-            data = [{
-                "ID": recipe.id,
-                "Title": recipe.title,
-                "Description": recipe.description,
-                "Total_time": recipe.total_time,
-                "Difficulty Level": recipe.difficulty_level,
-                "Cuisine": recipe.cuisine,
-                "Course": recipe.course,
-                "Dietary Restrictions": [dr.name for dr in recipe.dietary_restrictions.all()],
-                "Ingredients": ingredient_list,
-                "Instructions": instructions,
-                "Equipment": equipment,
-                "Nutritional Info": nutritional_info
-            }]
-            return pd.DataFrame(data)
-
-        # Case 2: Get all saved recipes for a user
-        elif username is not None:
-            user = CustomUser.objects.get(username=username)
-            saved_recipes = SavedRecipe.objects.filter(user=user)
-
-            recipe_rows = []
-            for saved_recipe in saved_recipes:
-                recipe = saved_recipe.recipe
-
-                ingredient_list = ",".join(
-                    [f"{ing.ingredient}" for ing in recipe.ingredients.all()]
-                )
-                instructions = [inst.step for inst in recipe.instructions.all()]
-                equipment = [eq.name for eq in recipe.equipment.all()]
-                nutritional_info = {}
-                if hasattr(recipe, "nutritional_information"):
-                    ni = recipe.nutritional_information
-                    nutritional_info = {
-                        "calories": ni.calories,
-                        "protein": ni.protein,
-                        "carbs": ni.carbs,
-                        "fat": ni.fat
-                    }
-
-                recipe_rows.append([
-                    recipe.id,
-                    recipe.title,
-                    recipe.description,
-                    recipe.total_time,
-                    recipe.difficulty_level,
-                    recipe.cuisine,
-                    recipe.course,
-                    recipe.dietary_restrictions,
-                    ingredient_list,
-                    instructions,
-                    equipment,
-                    nutritional_info
-                ])
-
-            columns = [
-                "ID", "Title", "Description", "Total_time",
-                "Difficulty Level", "Cuisine", "Course",
-                "Dietary Restrictions", "Ingredients",
-                "Instructions", "Equipment", "Nutritional Info"
-            ]
-            return pd.DataFrame(recipe_rows, columns=columns)
-
-        else:
-            print("Either recipe_id or username must be provided.")
-            return pd.DataFrame()
-
-    except Recipe.DoesNotExist:
-        print("Recipe not found.")
-        return pd.DataFrame()
-    except CustomUser.DoesNotExist:
-        print("User not found.")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return pd.DataFrame()
-
-# Function to get all recipes with the same fields as in get_recipe_info_by_id
-def get_all_recipes():
-    try:
-        recipes = Recipe.objects.all()
-        recipe_rows = []
-
-        for recipe in recipes:
-            data = {
-                "ID":recipe.id,
-                "Title": recipe.title,
-                "Description": recipe.description,
-                "Total_time": recipe.total_time,
-                "Difficulty Level": recipe.difficulty_level,
-                "Cuisine": recipe.cuisine,
-                "Course": recipe.course,
-                "Dietary Restrictions": [dr.name for dr in recipe.dietary_restrictions.all()],
-                "Ingredients":",".join([
-                f"{ing.ingredient}"
-                for ing in recipe.ingredients.all()
-            ]),
-                "Instructions": [inst.step for inst in recipe.instructions.all()],
-                "Equipment": [eq.name for eq in recipe.equipment.all()],
-                "Nutritional Info": {},
-            }
-
-            # Add nutritional info if exists
-            if hasattr(recipe, "nutritional_information"):
-                ni = recipe.nutritional_information
-                data["Nutritional Info"] = {
-                    "calories": ni.calories,
-                    "protein": ni.protein,
-                    "carbs": ni.carbs,
-                    "fat": ni.fat
-                }
-
-            # Append recipe data to rows
-            recipe_rows.append(data)
-
-        # Create DataFrame
-        df = pd.DataFrame(recipe_rows)
-
-        return df
-
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return pd.DataFrame()  
-
-
-def normalize_ingredient_name(name):
-
-    name = name.strip().lower()
-    words = name.split()
+WORD_RE = re.compile(r"[a-zA-Z0-9]+")
+NUTRITION_FIELDS = ["calories", "protein", "carbs", "fat"]
+
+
+class VectorizedPreprocess(Preprocess):
+    """
+    Same output as Preprocess.preprocess_recipes, built on pandas .str
+    operations with precompiled patterns instead of per-row Python loops.
+    Ingredient pieces are normalised once per distinct piece, read from
+    `names` (IngredientName.lookup()) when given. The Total_time and
+    Nutritional Info columns are optional.
+    """
+
+    def __init__(self, names=None):
+        self.names = names or {}
+
+    def _ingredients(self, x):
+        pieces = x.str.replace(PARENTHESES_RE, "", regex=True).str.split(",").explode()
+        normalized = {
+            piece: self.names[piece] if piece in self.names else normalize_ingredient_name(piece)
+            for piece in pieces.unique()
+        }
+        return pieces.map(normalized).groupby(level=0, sort=False).agg(" ".join).str.lower()
+
+    def preprocess_time(self, x):
+        x = pd.Series(x, dtype=object)
+        numbers = x.str.findall(NUMBER_RE)
+        first = numbers.str[0].astype(int)
+        second = numbers.str[1].fillna(0).astype(int)
+        has_hour = x.str.contains("hour", regex=False)
+        has_minute = x.str.contains("minute", regex=False)
+        return np.where(has_hour & has_minute, first * 60 + second,
+                        np.where(has_hour, first * 60, first)).tolist()
+
+    def preprocess_difflevel(self, x):
+        return pd.Series(x, dtype=object).map(DIFFICULTY_RANKS).fillna(1).astype(int).tolist()
+
+    def _nutritional_info(self, x):
+        info = pd.DataFrame(list(x), columns=NUTRITION_FIELDS)
+        for field in NUTRITION_FIELDS:
+            info[field] = info[field].str.findall(NUMBER_RE).str[0].astype(int)
+        return info.to_dict("records")
+
+    def preprocess_recipes(self, df):
+        df = df.reset_index(drop=True)
+        df["Description"] = df["Description"].str.findall(WORD_RE).str.join(" ")
+        df["Ingredients"] = self._ingredients(df["Ingredients"])
+        if "Total_time" in df.columns:
+            df["Total_time"] = self.preprocess_time(df["Total_time"])
+        df["Cuisine"] = pd.Series([i.name for i in df["Cuisine"]], dtype=object).str.lower()
+        df["Course"] = pd.Series([i.name for i in df["Course"]], dtype=object).str.lower()
+        df["Difficulty Level"] = self.preprocess_difflevel(df["Difficulty Level"])
+        if "Dietary Restrictions" in df.columns and df["Dietary Restrictions"].notna().any():
+            restrictions = df["Dietary Restrictions"]
+            is_list = restrictions.map(lambda value: isinstance(value, list))
+            df["Dietary Restrictions"] = restrictions.str.join(" ").str.lower().where(is_list, restrictions)
 
-    # Only singularize last word (usually the noun)
-    if words:
-        words[-1] = p.singular_noun(words[-1]) or words[-1]
-    return " ".join(words)
+        df["Instructions"] = df["Instructions"].str.join(" ").str.findall(WORD_RE).str.join(" ").str.lower()
+        df["Equipment"] = df["Equipment"].str.join(" ").str.lower()
+        if "Nutritional Info" in df.columns:
+            df["Nutritional Info"] = self._nutritional_info(df["Nutritional Info"])
 
+        return df
 
 
 def generate_verification_code():
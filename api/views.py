@@ -1,10 +1,11 @@
+from functools import wraps
 from django.shortcuts import render
 from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, APIException
 from rest_framework.parsers import MultiPartParser, JSONParser, FormParser
 from rest_framework import generics, permissions
 from .models import (CustomUser,ProfileImage,UserPreference,DietaryRestriction,Cuisine,MajorIngredient,Like,Course,Tag)
@@ -17,8 +18,8 @@ from .serializers import (UserSerializer,LoginSerializer,ProfileImageSerializer,
 from rest_framework.permissions import AllowAny
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .models import Recipe,SavedRecipe
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .models import Recipe,SavedRecipe,UserRecommendation
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from google.oauth2 import id_token
@@ -27,12 +28,22 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.db.models.functions import Lower
-from django.db.models import Case, When
+from django.db.models import F
+from django.db import transaction
+from django.utils.decorators import method_decorator
 from .utils import (
-    Preprocess,normalize_ingredient_name,generate_verification_code,send_verification_email,
+    normalize_ingredient_name,generate_verification_code,send_verification_email,
     generate_reset_code,send_reset_email
     )
-from .AI import start,recommend_similar_recipes,generate_recipe_by_ings
+from .AI import (start,start_hybrid,recommend_similar_recipes,recommend_similar_batch,rank_recipes_by_ings,
+                 serialize_recipes)
+from .executor import run_recommender,RecommenderBusy,RecommenderTimeout
+from .recipe_index import open_saved_index,refresh_recipes,saved_index_name
+from .artifacts import served_artifact
+from .precompute import precomputed_similar_recipes,precomputed_recommendations,cold_start_recommendations
+from .taste_profiles import update_taste_profile
+from .candidates import filter_by_preferences
+from .result_cache import cache_stats, cached_ids, catalog_version
 
 
 def hello_world(request):
@@ -267,6 +278,7 @@ class AddRecipeView(generics.CreateAPIView):
         recipe = serializer.save()
 
         self.assign_major_ingredients(recipe)
+        refresh_recipes([recipe.id])
 
     def assign_major_ingredients(self, recipe):
         major_names = MajorIngredient.objects.values_list('name', flat=True)
@@ -291,13 +303,23 @@ class UpdateRecipeView(generics.UpdateAPIView):
         
         return super().update(request, *args, **kwargs)
 
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        refresh_recipes([recipe.id])
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def save_recipe(request, recipe_id):
     recipe = get_object_or_404(Recipe, id=recipe_id)  # Handle invalid ID
-    saved_recipe, created = SavedRecipe.objects.get_or_create(user=request.user, recipe=recipe)
+    with transaction.atomic():
+        saved_recipe, created = SavedRecipe.objects.get_or_create(user=request.user, recipe=recipe)
+        if created:
+            Recipe.objects.filter(pk=recipe.pk).update(save_count=F('save_count') + 1)
     if created:
+        update_taste_profile(request.user, recipe.id, saved=True)
+        # Precomputed list is stale; serve live until the next nightly run
+        UserRecommendation.objects.filter(user=request.user).delete()
         return JsonResponse({"message": "Recipe saved successfully"})
     return JsonResponse({"message": "Recipe already saved"})
 
@@ -308,7 +330,13 @@ def remove_saved_recipe(request, recipe_id):
     if not recipe:
         return JsonResponse({"error": "Recipe not found"}, status=404)
 
-    SavedRecipe.objects.filter(user=request.user, recipe=recipe).delete()
+    with transaction.atomic():
+        deleted, _ = SavedRecipe.objects.filter(user=request.user, recipe=recipe).delete()
+        if deleted:
+            Recipe.objects.filter(pk=recipe.pk).update(save_count=F('save_count') - 1)
+    if deleted:
+        update_taste_profile(request.user, recipe.id, saved=False)
+        UserRecommendation.objects.filter(user=request.user).delete()
     return JsonResponse({"message": "Recipe removed from saved list"})
 
 @api_view(['GET'])
@@ -509,58 +537,152 @@ class MajorIngredientListView(generics.ListAPIView):
 
 # views.pyfrom .models import Recipe
 
+SEARCH_BACKENDS = ("exact", "ann", "dense", "stream")
+
+
+def recommender_view(view):
+    """
+    Error handling shared by the views that run the recommenders: 400 for an
+    unknown ?search= backend, 503 (with Retry-After) when the recommender pool
+    is full, 504 when a call timed out and 500 for anything else.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.GET.get("search") not in (None, *SEARCH_BACKENDS):
+            return Response({"error": "search must be 'exact', 'ann', 'dense' or 'stream'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return view(request, *args, **kwargs)
+        except APIException:
+            raise
+        except RecommenderBusy:
+            return Response({"error": "Recommender is busy, try again shortly."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+        except RecommenderTimeout:
+            return Response({"error": "Recommender timed out."}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return wrapped
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@recommender_view
 def get_recommendations(request):
-    try:
-        username = request.user.username
-        df = start(username)
+    username = request.user.username
+    search = request.GET.get("search")
+    mode = request.GET.get("mode") or settings.RECOMMENDER_MODE
+    if mode not in ("content", "hybrid"):
+        return Response({"error": "mode must be 'content' or 'hybrid'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Users with nothing to build a profile from get the precomputed
+    # popularity lists (hybrid mode can still use their likes)
+    if not SavedRecipe.objects.filter(user=request.user).exists() and (
+        mode == "content" or not Like.objects.filter(user=request.user).exists()
+    ):
+        recipe_ids = cold_start_recommendations(request.user)
+        if recipe_ids is not None:
+            if not recipe_ids:
+                return Response({"message": "No recommendations available."}, status=404)
+            return Response(serialize_recipes(recipe_ids, request=request), status=status.HTTP_200_OK)
+
+    if mode == "hybrid":
+        # Likes and saves change the CF part between nightly runs, so
+        # hybrid lists are always scored live
+        recommender = start_hybrid
+    else:
+        # Nightly precomputed list; users without one are scored live
+        recipe_ids = precomputed_recommendations(request.user)
+        if recipe_ids is not None:
+            return Response(serialize_recipes(recipe_ids, request=request), status=status.HTTP_200_OK)
+        recommender = start
+
+    # Live results are cached until the user's saves, likes or preferences
+    # or the catalog change
+    key = ("recommendations", request.user.pk, request.user.recommendation_version, catalog_version(),
+           mode, search or "")
+    recipe_ids, hit = cached_ids(key, lambda: result_ids(run_recommender(recommender, username, search=search)))
+    if not recipe_ids:
+        return Response({"message": "No recommendations available."}, status=404,
+                        headers={"X-Cache": "HIT" if hit else "MISS"})
+
+    return Response(serialize_recipes(recipe_ids, request=request), status=status.HTTP_200_OK,
+                    headers={"X-Cache": "HIT" if hit else "MISS"})
+
+
+def result_ids(df):
+    """Ordered recipe ids of a recommender DataFrame."""
+    return [] if df.empty else df["ID"].tolist()
 
-        if df.empty:
-            return Response({"message": "No recommendations available."}, status=404)
 
-        # Get list of IDs from DataFrame in order
-        recipe_ids = df['ID'].tolist()
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def recommendation_cache_stats(request):
+    return Response(cache_stats(), status=status.HTTP_200_OK)
 
-        # Fetch recipes and map them to a dictionary with ID as key
-        recipes = Recipe.objects.filter(id__in=recipe_ids)
-        recipe_dict = {recipe.id: recipe for recipe in recipes}
 
-        # Maintain the order from the recommendation DataFrame
-        ordered_recipes = [recipe_dict[rid] for rid in recipe_ids if rid in recipe_dict]
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def recommendation_index_version(request):
+    """The recipe index this worker serves, and the artifact it was synced from."""
+    index = open_saved_index()
+    return Response({
+        "index": saved_index_name(),
+        "version": index.version if index is not None else None,
+        "artifact": served_artifact(),
+    }, status=status.HTTP_200_OK)
 
-        # Serialize the ordered recipes
-        serializer = RecipeSerializer(ordered_recipes, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@api_view(["GET"])
+@recommender_view
+def get_similar_recipes_batch(request):
+    """?ids=1,2,3 -> the top_n similar recipes of each seed, in the order given."""
+    search = request.GET.get("search")
+    try:
+        top_n = int(request.GET.get("top_n", 5))
+        recipe_ids = [int(rid) for rid in request.GET.get("ids", "").split(",") if rid.strip()]
+    except ValueError:
+        return Response({"error": "ids must be comma-separated recipe IDs and top_n a number."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not recipe_ids:
+        return Response({"error": "ids is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(recipe_ids) > settings.SIMILAR_RECIPES_BATCH_MAX:
+        return Response({"error": f"At most {settings.SIMILAR_RECIPES_BATCH_MAX} ids per request."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    neighbours = run_recommender(recommend_similar_batch, recipe_ids, top_n=top_n, search=search)
+
+    # Every result recipe in one prefetched query
+    similar_ids = list(dict.fromkeys(rid for ids in neighbours.values() for rid in ids))
+    recipes = {recipe["id"]: recipe for recipe in serialize_recipes(similar_ids, request=request)}
+    return Response([
+        {"recipe_id": rid, "similar": [recipes[n] for n in neighbours[rid] if n in recipes]}
+        for rid in dict.fromkeys(recipe_ids)
+    ], status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
+@recommender_view
 def get_similar_recipes(request, recipe_id):
     top_n = int(request.GET.get("top_n", 5))
+    search = request.GET.get("search")
 
-    try:
-        # Get recommended DataFrame
-        recommended_df = recommend_similar_recipes(recipe_id, top_n=top_n)
-
-        if recommended_df.empty:
-            return Response({"message": "No similar recipes found."}, status=status.HTTP_404_NOT_FOUND)
-
-        # Extract ordered list of recommended recipe IDs
-        recommended_ids = recommended_df["ID"].tolist()
+    # Precomputed neighbours are a single indexed query
+    recommended_ids = precomputed_similar_recipes(recipe_id, top_n)
+    if recommended_ids is not None:
+        return Response(serialize_recipes(recommended_ids, request=request), status=status.HTTP_200_OK)
 
-        # Fetch recipes and preserve order using Case/When
-        preserved_order = Case(*[When(id=pk, then=pos) for pos, pk in enumerate(recommended_ids)])
-        recipes = Recipe.objects.filter(id__in=recommended_ids).order_by(preserved_order)
+    # Live neighbours are cached until the catalog changes
+    key = ("similar", recipe_id, catalog_version(), top_n, search or "")
+    recommended_ids, hit = cached_ids(key, lambda: result_ids(
+        run_recommender(recommend_similar_recipes, recipe_id, top_n=top_n, search=search)
+    ))
+    if not recommended_ids:
+        return Response({"message": "No similar recipes found."}, status=status.HTTP_404_NOT_FOUND,
+                        headers={"X-Cache": "HIT" if hit else "MISS"})
 
-        # Serialize and return
-        serializer = RecipeSerializer(recipes, many=True,context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(serialize_recipes(recommended_ids, request=request), status=status.HTTP_200_OK,
+                    headers={"X-Cache": "HIT" if hit else "MISS"})
 
 
 class LikeRecipeView(generics.CreateAPIView):
@@ -582,7 +704,9 @@ class LikeRecipeView(generics.CreateAPIView):
         if Like.objects.filter(user=self.request.user, recipe=recipe).exists():
             raise ValidationError("You have already liked this recipe.")
 
-        serializer.save(user=self.request.user, recipe=recipe)
+        with transaction.atomic():
+            serializer.save(user=self.request.user, recipe=recipe)
+            Recipe.objects.filter(pk=recipe.pk).update(like_count=F('like_count') + 1)
 
 
 
@@ -600,7 +724,11 @@ class UnlikeRecipeView(APIView):
         except Like.DoesNotExist:
             return Response({"detail": "You have not liked this recipe."}, status=status.HTTP_404_NOT_FOUND)
 
-        like.delete()
+        with transaction.atomic():
+            # A concurrent unlike may have deleted it already; only one decrements
+            deleted, _ = Like.objects.filter(pk=like.pk).delete()
+            if deleted:
+                Recipe.objects.filter(pk=like.recipe_id).update(like_count=F('like_count') - 1)
         return Response({"detail": "Recipe unliked successfully."}, status=status.HTTP_200_OK)
     
 
@@ -688,32 +816,42 @@ class FilteredRecipeListView(APIView):
 class SortedRecipeListView(APIView):
     def post(self, request):
         ids = request.data.get("ids", [])
-        sort_by = request.data.get("sort_by", None)  # "time" or "difficulty"
+        sort_by = request.data.get("sort_by", None)  # "time", "difficulty" or "popularity"
 
         if not isinstance(ids, list) or not ids:
             return Response({"error": "Please provide a non-empty list of recipe IDs."},
                             status=status.HTTP_400_BAD_REQUEST)
 
         recipes = Recipe.objects.filter(id__in=ids)
-        recipe_list = list(recipes)
-        p=Preprocess()
 
-        if sort_by == "time":
-            total_times = [r.total_time for r in recipe_list]
-            time_values = p.preprocess_time(total_times)
-            sorted_data = sorted(zip(recipe_list, time_values), key=lambda x: x[1])
-            sorted_recipes = [item[0] for item in sorted_data]
+        # Optional range filters on the parsed numeric columns
+        try:
+            min_time, max_time, max_difficulty, limit = [
+                None if request.data.get(key) is None else int(request.data.get(key))
+                for key in ("min_time", "max_time", "max_difficulty", "limit")
+            ]
+        except (TypeError, ValueError):
+            return Response({"error": "min_time, max_time, max_difficulty and limit must be integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
+        if min_time is not None:
+            recipes = recipes.filter(total_minutes__gte=min_time)
+        if max_time is not None:
+            recipes = recipes.filter(total_minutes__lte=max_time)
+        if max_difficulty is not None:
+            recipes = recipes.filter(difficulty_rank__lte=max_difficulty)
+
+        if sort_by == "time":
+            recipes = recipes.order_by(F("total_minutes").asc(nulls_last=True), "id")
         elif sort_by == "difficulty":
-            difficulties = [r.difficulty_level for r in recipe_list]
-            diff_values = p.preprocess_difflevel(difficulties)
-            sorted_data = sorted(zip(recipe_list, diff_values), key=lambda x: x[1])
-            sorted_recipes = [item[0] for item in sorted_data]
+            recipes = recipes.order_by(F("difficulty_rank").asc(nulls_last=True), "id")
+        elif sort_by == "popularity":
+            recipes = recipes.order_by("-like_count", "-save_count", "id")
 
-        else:
-            sorted_recipes = recipe_list
+        if limit is not None:
+            recipes = recipes[:max(limit, 0)]
 
-        serializer = RecipeSerializer(sorted_recipes, many=True, context={"request": request})
+        serializer = RecipeSerializer(recipes, many=True, context={"request": request})
         return Response(serializer.data)
 
 
@@ -735,34 +873,38 @@ class RecipeFilteredByUserPreferenceView(APIView):
         queryset = Recipe.objects.filter(id__in=recipe_ids)
 
         # Apply user preferences filtering
-        if preferences.dietary_restrictions.exists():
-            queryset = queryset.filter(dietary_restrictions__in=preferences.dietary_restrictions.all())
-
-        if preferences.preferred_cuisines.exists():
-            queryset = queryset.filter(cuisine__in=preferences.preferred_cuisines.all())
+        queryset = filter_by_preferences(queryset, preferences)
 
         # Optional nutrient filtering can be added if recipe links to nutrients
 
-        queryset = queryset.distinct()
         serializer = RecipeSerializer(queryset, many=True, context={'request': request})
         return Response(serializer.data)
 
 
 class RecipeSimilarityView(APIView):
+    @method_decorator(recommender_view)
     def post(self, request):
         user_ingredients = request.data.get('ingredients')  
         if not user_ingredients:
             return Response({"error": "Missing ingredients"}, status=400)
         if "," in user_ingredients:
             user_ingredients=user_ingredients.split(",")
-            user_ingredients="".join([normalize_ingredient_name(i) for i in user_ingredients]).lower()
+            user_ingredients=" ".join([normalize_ingredient_name(i) for i in user_ingredients]).lower()
         else:
             user_ingredients=normalize_ingredient_name(user_ingredients)
 
-            
-        
-        recipes = generate_recipe_by_ings([user_ingredients], request=request)
-        return Response(recipes)
+        try:
+            page = max(int(request.data.get('page', request.query_params.get('page', 1))), 1)
+            page_size = int(request.data.get('page_size', request.query_params.get('page_size',
+                                                                                  settings.GENERATE_RECIPE_PAGE_SIZE)))
+        except (TypeError, ValueError):
+            return Response({"error": "page and page_size must be integers"}, status=400)
+        page_size = min(max(page_size, 1), settings.GENERATE_RECIPE_MAX_PAGE_SIZE)
+
+        recipe_ids = run_recommender(rank_recipes_by_ings, [user_ingredients],
+                                     limit=page_size, offset=(page - 1) * page_size)
+
+        return Response(serialize_recipes(recipe_ids, request=request))
 
 # Cuisine List View
 class CuisineListView(generics.ListAPIView):
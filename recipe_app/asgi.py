@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_app.settings')
+# Only web workers open the recipe index and follow index artifacts on
+# start-up, not manage.py commands or cron jobs (see ApiConfig.ready())
+os.environ['RECIPE_API_WEB_WORKER'] = '1'
 
 application = get_asgi_application()
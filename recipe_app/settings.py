@@ -155,6 +155,116 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'api.CustomUser'
 
+# Recommender index (see api/recipe_index.py)
+RECIPE_INDEX_DIR = os.getenv('RECIPE_INDEX_DIR', os.path.join(BASE_DIR, 'recipe_index'))
+# Refit the vectorizer once this fraction of the catalog changed since the last build
+RECIPE_INDEX_REBUILD_RATIO = 0.1
+# "tfidf" fits a vocabulary per build; "hashing" hashes terms into
+# RECIPE_INDEX_HASH_FEATURES columns with running IDF counts, so recipe writes
+# are applied to the index without ever refitting (api/hashing.py)
+RECIPE_INDEX_VECTORIZER = os.getenv('RECIPE_INDEX_VECTORIZER', 'tfidf')
+RECIPE_INDEX_HASH_FEATURES = 2 ** 15
+# Index artifacts shared between instances (api/artifacts.py):
+# `manage.py publish_recipe_index` uploads the index to this storage and
+# workers with POLL_SECONDS > 0 hot-swap to each new one. The publisher and
+# the web service only see each other's artifacts through a shared storage:
+# set RECIPE_INDEX_ARTIFACT_STORAGE=storages.backends.s3.S3Storage and
+# RECIPE_INDEX_ARTIFACT_BUCKET (credentials come from the usual AWS_*
+# variables). The default FileSystemStorage only works on a single machine.
+RECIPE_INDEX_ARTIFACT_STORAGE = os.getenv(
+    'RECIPE_INDEX_ARTIFACT_STORAGE', 'django.core.files.storage.FileSystemStorage'
+)
+RECIPE_INDEX_ARTIFACTS = {
+    'BACKEND': RECIPE_INDEX_ARTIFACT_STORAGE,
+    'OPTIONS': {
+        'bucket_name': os.getenv('RECIPE_INDEX_ARTIFACT_BUCKET'),
+        'location': os.getenv('RECIPE_INDEX_ARTIFACT_LOCATION', 'recipe-index'),
+    } if RECIPE_INDEX_ARTIFACT_STORAGE.startswith('storages.backends.s3') else {
+        'location': os.getenv('RECIPE_INDEX_ARTIFACT_LOCATION', os.path.join(BASE_DIR, 'recipe_index_artifacts')),
+    },
+    'KEEP': 5,  # Artifacts kept in the storage
+    'POLL_SECONDS': int(os.getenv('RECIPE_INDEX_ARTIFACT_POLL_SECONDS', '0')),
+}
+# Neighbours stored per recipe by `manage.py build_similar_recipes`
+SIMILAR_RECIPES_TOP_K = 20
+# Seed recipes accepted per /similar-recipes/batch/ request
+SIMILAR_RECIPES_BATCH_MAX = 20
+# Recommendations stored per user by `manage.py build_user_recommendations`
+USER_RECOMMENDATIONS_TOP_K = 50
+# Recipes per popularity list stored by `manage.py build_cold_start_lists`
+COLD_START_TOP_K = 50
+# Distinct ingredient names kept by the in-process normalize_ingredient_name memo
+INGREDIENT_NAME_CACHE_SIZE = 8192
+# Results per page of /generate-recipe/
+GENERATE_RECIPE_PAGE_SIZE = 20
+GENERATE_RECIPE_MAX_PAGE_SIZE = 100
+# "exact", "ann", "dense" or "stream" per endpoint; a ?search= query parameter
+# overrides it per request. "stream" ranks like "exact" but reads the catalog
+# from the database in chunks of RECOMMENDER_STREAM_CHUNK_SIZE recipes, so peak
+# memory is bounded by the chunk size instead of the catalog (api/streaming.py).
+RECOMMENDER_SEARCH = {
+    'similar': 'exact',
+    'recommendations': 'exact',
+}
+RECOMMENDER_STREAM_CHUNK_SIZE = 1000
+# Worker processes that run recommender computations off the request thread
+# (api/executor.py). 0 runs them inline. Pair with threaded gunicorn workers so
+# requests can wait on the pool concurrently.
+RECOMMENDER_POOL = {
+    'WORKERS': int(os.getenv('RECOMMENDER_POOL_WORKERS', 0)),
+    'MAX_PENDING': int(os.getenv('RECOMMENDER_POOL_MAX_PENDING', 16)),
+    'TIMEOUT': float(os.getenv('RECOMMENDER_POOL_TIMEOUT', 10)),
+}
+# Approximate search (api/ann.py). More tables/probes: higher recall, slower
+# queries; more bits: smaller buckets, faster queries, lower recall.
+RECOMMENDER_ANN = {
+    'TABLES': 16,
+    'BITS': 8,
+    'PROBES': 2,
+}
+# Dense LSA embeddings for search="dense" (api/embeddings.py): a TruncatedSVD
+# of the similar-recipe and profile TF-IDF spaces to DIMENSIONS components,
+# stored as "float32" or "int8" (one scale per recipe, 4x smaller). Fitted
+# with the index; 0 disables them. `manage.py compare_embeddings` reports
+# their memory, latency and ranking agreement with the sparse path.
+RECOMMENDER_EMBEDDINGS = {
+    'DIMENSIONS': 128,
+    'DTYPE': 'float32',
+}
+
+# Item-item collaborative filtering over likes and saves (api/collaborative.py).
+# HYBRID_WEIGHT is the CF share of the blended score in ?mode=hybrid.
+RECOMMENDER_CF = {
+    'TOP_K': 50,
+    'LIKE_WEIGHT': 1.0,
+    'SAVE_WEIGHT': 2.0,
+    'HYBRID_WEIGHT': 0.3,
+}
+# "content" or "hybrid" for /recommendations/; a ?mode= query parameter overrides it
+RECOMMENDER_MODE = 'content'
+# Cache of live /recommendations/ and /similar-recipes/ results (api/result_cache.py),
+# keyed by user or recipe plus data-version tokens so writes invalidate them.
+# LocMemCache is per process; point the alias at a shared backend to share
+# results (and hit/miss counters) between gunicorn workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recommendations',
+        # TTL in seconds; also bounds how long other users' likes take to
+        # reach cached hybrid results
+        'TIMEOUT': 600,
+        # Once full, the least recently used quarter of the entries is evicted
+        'OPTIONS': {'MAX_ENTRIES': 10000, 'CULL_FREQUENCY': 4},
+    },
+}
+RECOMMENDER_CACHE = {
+    'ALIAS': 'recommendations',
+    'ENABLED': True,
+}
+
 from datetime import timedelta
 
 SIMPLE_JWT = {